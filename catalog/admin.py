@@ -1,18 +1,151 @@
-from django.contrib import admin
-from .models import Product, Category
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db.models import Sum
+from . import bulk
+from .choices import get_category_labels
+from .models import CategoryStats, Job, Product, Category
+from .pagination import CappedCountPaginator
+from .search import search_products
+
+DEFAULT_COUNT_LIMIT = 10000
+
+
+def is_performance_mode():
+    return getattr(settings, 'CATALOG_ADMIN_PERFORMANCE_MODE', True)
+
+
+def get_count_limit():
+    return getattr(settings, 'CATALOG_ADMIN_COUNT_LIMIT', DEFAULT_COUNT_LIMIT)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Режим производительности списка (CATALOG_ADMIN_PERFORMANCE_MODE): без
+    счётчика "всего" и без полного COUNT(*) - число строк берётся из
+    get_known_count() или считается до CATALOG_ADMIN_COUNT_LIMIT
+    """
+    # Параметры адреса списка, которые не меняют число строк
+    count_neutral_params = {'o', 'p', '_popup', '_to_field'}
+
+    @property
+    def show_full_result_count(self):
+        return not is_performance_mode()
+
+    def get_known_count(self, request, params):
+        """Число строк для параметров фильтра без подсчёта по таблице или None"""
+        return None
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        if not is_performance_mode():
+            return super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+        params = {name: value for name, value in request.GET.items() if name not in self.count_neutral_params}
+        return CappedCountPaginator(
+            queryset, per_page, known_count=self.get_known_count(request, params), limit=get_count_limit(),
+            orphans=orphans, allow_empty_first_page=allow_empty_first_page,
+        )
+
+
+class CategoryAutocompleteFilter(admin.SimpleListFilter):
+    """Фильтр по категории без списка всех категорий: выбранная и поиск через автодополнение"""
+    title = 'категории'
+    parameter_name = 'category'
+    template = 'admin/catalog/category_autocomplete_filter.html'
+
+    def lookups(self, request, model_admin):
+        return get_category_labels([self.value()]) if self.value() else []
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        # Как у встроенных фильтров по связям: неверный параметр - ?e=1, а не ошибка 500
+        if not self.value().isdigit():
+            raise IncorrectLookupParameters(f'Неверный номер категории: {self.value()}')
+        return queryset.filter(category_id=self.value())
+
+
+class TargetCategoryActionForm(ActionForm):
+    """Панель действий с выбором категории, в которую переносятся товары"""
+    # Автодополнение админки: список категорий в страницу не встраивается,
+    # скрипты виджета список изменений подключает через media формы действий
+    target_category = forms.ModelChoiceField(
+        queryset=Category.objects.all(), required=False, label='Категория',
+        widget=AutocompleteSelect(Product._meta.get_field('category'), admin.site),
+    )
+
+
+def _target_category(modeladmin, request):
+    form = modeladmin.action_form(request.POST)
+    form.fields['action'].choices = modeladmin.get_action_choices(request)
+    category = form.cleaned_data['target_category'] if form.is_valid() else None
+    if category is None:
+        modeladmin.message_user(request, 'Выберите категорию для переноса товаров', messages.WARNING)
+    return category
+
+
+def _deletion_summary(modeladmin, request, model_count):
+    """Страница подтверждения удаления без обхода связанных объектов Collector'ом"""
+    perms_needed = set() if modeladmin.has_delete_permission(request) else {modeladmin.opts.verbose_name}
+    deleted_objects = [f'{name}: {count}' for name, count in model_count.items()]
+    return deleted_objects, model_count, perms_needed, []
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'created_at', 'updated_at']
+class CategoryAdmin(LargeTableAdmin):
+    list_display = ['name', 'product_count', 'created_at', 'updated_at']
+    list_select_related = ['stats']
     search_fields = ['name']
     list_filter = ['created_at']
+    action_form = TargetCategoryActionForm
+    actions = ['delete_moving_products']
+
+    def get_deleted_objects(self, objs, request):
+        pks = [obj.pk for obj in objs]
+        products = Category.objects.filter(pk__in=pks).aggregate(count=Sum('stats__product_count'))['count'] or 0
+        return _deletion_summary(self, request, {
+            Category._meta.verbose_name_plural: len(pks), Product._meta.verbose_name_plural: products,
+        })
+
+    def delete_model(self, request, obj):
+        bulk.delete_category(obj)
+
+    def delete_queryset(self, request, queryset):
+        for category in queryset:
+            bulk.delete_category(category)
+
+    @admin.display(description='Товаров', ordering='stats__product_count')
+    def product_count(self, obj):
+        # Количество из CategoryStats, без COUNT по товарам
+        stats = getattr(obj, 'stats', None)
+        return stats.product_count if stats else 0
+
+    @admin.action(description='Удалить выбранные категории, перенеся товары в категорию', permissions=['delete'])
+    def delete_moving_products(self, request, queryset):
+        target = _target_category(self, request)
+        if target is None:
+            return
+        moved = deleted = 0
+        for category in queryset.exclude(pk=target.pk):
+            moved += bulk.delete_category(category, reassign_to=target)
+            deleted += 1
+        self.message_user(request, f'Удалено категорий: {deleted}, товаров перенесено в «{target}»: {moved}')
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(LargeTableAdmin):
     list_display = ['name', 'price', 'category', 'created_at', 'updated_at']
-    list_filter = ['category', 'created_at']
+    list_select_related = ['category']
+    list_filter = [CategoryAutocompleteFilter, 'created_at']
+    autocomplete_fields = ['category']
     search_fields = ['name', 'description']
+    search_help_text = 'Полнотекстовый поиск по названию и описанию (по началу слов)'
     readonly_fields = ['created_at', 'updated_at']
+    action_form = TargetCategoryActionForm
+    actions = ['move_to_category']
     fieldsets = (
         ('Основная информация', {
             'fields': ('name', 'description', 'category')
@@ -27,4 +160,43 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск через FTS-индекс вместо LIKE '%...%' по каждому полю"""
+        if not search_term:
+            return queryset, False
+        return search_products(queryset, search_term, ranked=False), False
+
+    def get_known_count(self, request, params):
+        # Без фильтров или только по категории число товаров есть в CategoryStats
+        if not params:
+            return CategoryStats.objects.aggregate(count=Sum('product_count'))['count'] or 0
+        if params.keys() == {'category'} and params['category'].isdigit():
+            return CategoryStats.objects.filter(category_id=params['category']).values_list(
+                'product_count', flat=True
+            ).first() or 0
+        return None
+
+    def get_deleted_objects(self, objs, request):
+        count = len(objs) if isinstance(objs, list) else objs.count()
+        return _deletion_summary(self, request, {Product._meta.verbose_name_plural: count})
+
+    def delete_queryset(self, request, queryset):
+        # Пачками, статистика категорий обновляется сводкой (catalog/bulk.py)
+        bulk.delete_products(queryset)
+
+    @admin.action(description='Перенести выбранные товары в категорию', permissions=['change'])
+    def move_to_category(self, request, queryset):
+        target = _target_category(self, request)
+        if target is not None:
+            moved = bulk.move_products(queryset, target)
+            self.message_user(request, f'Товаров перенесено в «{target}»: {moved}')
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'key', 'status', 'attempts', 'run_at', 'locked_by', 'created_at']
+    list_filter = ['status', 'name']
+    search_fields = ['key']
+    readonly_fields = ['created_at']
@@ -0,0 +1,88 @@
+"""
+Сервис агрегатной статистики каталога.
+
+Статистика читается из материализованной таблицы CategoryStats
+(O(число категорий) строк, без сканирования товаров), общие показатели
+сворачиваются из строк категорий без дополнительных обращений к базе.
+Динамика цен по месяцам берётся из сводок MonthlyPriceRollup.
+"""
+import asyncio
+
+from django.db.models import Count, Sum, F
+from django.db.models.functions import Coalesce
+
+from .models import Category
+from .price_history import aget_price_trends, get_price_trends
+
+
+def categories_stats_queryset(sort_by='name'):
+    return Category.objects.annotate(
+        product_count=Coalesce(F('stats__product_count'), 0),
+        total_value=F('stats__total_value'),
+        min_price=F('stats__min_price'),
+        max_price=F('stats__max_price')
+    ).order_by(sort_by)
+
+
+def _add_avg_price(categories_stats):
+    for category in categories_stats:
+        category.avg_price = (
+            category.total_value / category.product_count if category.product_count else None
+        )
+    return categories_stats
+
+
+def get_categories_stats(sort_by='name'):
+    """Статистика по категориям (один запрос по CategoryStats)"""
+    return _add_avg_price(list(categories_stats_queryset(sort_by)))
+
+
+async def aget_categories_stats(sort_by='name'):
+    return _add_avg_price([category async for category in categories_stats_queryset(sort_by)])
+
+
+def rollup(categories_stats):
+    """Сворачивает статистику категорий в общие показатели каталога"""
+    total_products = sum(c.product_count for c in categories_stats)
+    total_value = sum((c.total_value for c in categories_stats if c.total_value is not None), 0)
+    min_prices = [c.min_price for c in categories_stats if c.min_price is not None]
+    max_prices = [c.max_price for c in categories_stats if c.max_price is not None]
+
+    return {
+        'total_products': total_products,
+        'total_categories': len(categories_stats),
+        'total_value': total_value,
+        # Средняя по всем товарам, а не среднее средних по категориям
+        'avg_price': total_value / total_products if total_products else 0,
+        'min_price': min(min_prices) if min_prices else 0,
+        'max_price': max(max_prices) if max_prices else 0,
+    }
+
+
+def get_catalog_summary(sort_by='name'):
+    """Общая статистика, статистика по категориям и динамика цен для страницы аналитики"""
+    categories_stats = get_categories_stats(sort_by)
+    summary = rollup(categories_stats)
+    summary['categories_stats'] = categories_stats
+    summary['price_trends'] = get_price_trends()
+    return summary
+
+
+async def aget_catalog_summary(sort_by='name'):
+    """get_catalog_summary() через async ORM"""
+    categories_stats, price_trends = await asyncio.gather(aget_categories_stats(sort_by), aget_price_trends())
+    summary = rollup(categories_stats)
+    summary['categories_stats'] = categories_stats
+    summary['price_trends'] = price_trends
+    return summary
+
+
+def get_catalog_totals():
+    """Итоги для главной страницы: товары, категории, общая стоимость (один запрос)"""
+    totals = Category.objects.aggregate(
+        total_categories=Count('id'),
+        total_products=Coalesce(Sum('stats__product_count'), 0),
+        total_value=Sum('stats__total_value'),
+    )
+    totals['total_value'] = totals['total_value'] or 0
+    return totals
@@ -0,0 +1,425 @@
+"""
+JSON API только для чтения: товары, категории, аналитика, журнал изменений.
+
+Строки читаются через .values() (без создания моделей), параметр fields=
+ограничивает набор колонок, а соединение с категорией выполняется только
+если запрошено поле category_name. Фильтры товаров - те же, что у
+ProductFilterForm. Успешные ответы снабжаются ETag, посчитанным по
+updated_at и числу строк, и на условный запрос отдаётся 304. Last-Modified - только у
+товара: удаление из списка не меняет max(updated_at).
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition, require_safe
+
+from . import changes
+from .analytics import get_catalog_summary
+from .cache import CATEGORY_LIST, CacheScope, get_version
+from .choices import search_categories
+from .forms import AnalyticsFilterForm, CategoryFilterForm, ProductFilterForm
+from .models import CatalogChange, Category, CategoryStats, Product
+from .pagination import InvalidCursor, KeysetPaginator, RankedPaginator
+
+# Имя поля в API -> выражение для .values()
+PRODUCT_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'description': 'description',
+    'price': 'price',
+    'category': 'category_id',
+    'category_name': 'category__name',
+    'image': 'image',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+CATEGORY_FIELDS = ['id', 'name', 'product_count', 'total_value', 'min_price', 'max_price',
+                   'created_at', 'updated_at']
+# Поля статистики категории берутся из CategoryStats
+CATEGORY_STATS = {
+    'product_count': Coalesce(F('stats__product_count'), 0),
+    'total_value': Coalesce(F('stats__total_value'), 0, output_field=CategoryStats._meta.get_field('total_value')),
+    'min_price': F('stats__min_price'),
+    'max_price': F('stats__max_price'),
+}
+ANALYTICS_CATEGORY_FIELDS = ['id', 'name', 'product_count', 'total_value', 'avg_price', 'min_price', 'max_price']
+
+# Поля товара в журнале изменений: без соединения с категорией
+CHANGE_PRODUCT_FIELDS = [name for name, column in PRODUCT_FIELDS.items() if column in changes.PRODUCT_COLUMNS]
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class BadRequest(Exception):
+    """Некорректные параметры запроса API"""
+
+
+def error_response(errors, status=400):
+    return JsonResponse({'errors': errors}, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def parse_fields(request, available):
+    """Список запрошенных полей (?fields=id,name) или все поля"""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise BadRequest({'fields': [f'Неизвестные поля: {", ".join(unknown)}']})
+    return fields
+
+
+def parse_limit(request, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        raise BadRequest({'limit': ['Введите целое число']})
+    return max(1, min(limit, maximum))
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return f'{request.path}?{params.urlencode()}'
+
+
+def make_etag(*parts):
+    return '"{}"'.format(hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest())
+
+
+def _memoized(request, name, producer):
+    """etag_func и last_modified_func читают одно состояние - считаем его раз на запрос"""
+    states = request.__dict__.setdefault('_catalog_api_state', {})
+    if name not in states:
+        states[name] = producer()
+    return states[name]
+
+
+def _condition_funcs(state_func):
+    def get_state(request, *args, **kwargs):
+        return _memoized(request, state_func.__name__, lambda: state_func(request, **kwargs))
+
+    def etag_func(request, *args, **kwargs):
+        state = get_state(request, *args, **kwargs)
+        return make_etag(*state) if state else None
+
+    def last_modified_func(request, *args, **kwargs):
+        state = get_state(request, *args, **kwargs)
+        return state[0] if state else None
+
+    return etag_func, last_modified_func
+
+
+def _drop_validators(response):
+    # Ошибка (400, 404) не должна получать ETag и Last-Modified состояния данных
+    if response.status_code not in (200, 304):
+        for header in ('ETag', 'Last-Modified'):
+            if response.has_header(header):
+                del response.headers[header]
+    return response
+
+
+def conditional(state_func):
+    """
+    condition() по функции состояния: state_func(request, **kwargs) ->
+    (last_modified или None, *прочие части ETag) или None (без условных заголовков).
+    Валидаторы получают только успешные ответы.
+    """
+    etag_func, last_modified_func = _condition_funcs(state_func)
+
+    def decorator(view):
+        conditioned = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            return _drop_validators(conditioned(request, *args, **kwargs))
+        return inner
+    return decorator
+
+
+def aconditional(state_func):
+    """
+    conditional() для async-представлений (condition() и require_safe в Django 4.2
+    оборачивают только синхронные функции). Разрешены только GET и HEAD.
+    """
+    etag_func, last_modified_func = _condition_funcs(state_func)
+
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return HttpResponseNotAllowed(['GET', 'HEAD'])
+            etag, last_modified = await sync_to_async(lambda: (
+                etag_func(request, *args, **kwargs), last_modified_func(request, *args, **kwargs),
+            ))()
+            etag = quote_etag(etag) if etag else None
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                if timestamp and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(timestamp)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return _drop_validators(response)
+        return inner
+    return decorator
+
+
+def serialize_product(row, fields, request):
+    item = {name: row[PRODUCT_FIELDS[name]] for name in fields}
+    if item.get('image'):
+        item['image'] = request.build_absolute_uri(Product._meta.get_field('image').storage.url(item['image']))
+    elif 'image' in item:
+        item['image'] = None
+    return item
+
+
+def _product_filter(request):
+    form = ProductFilterForm(request.GET)
+    if not form.is_valid():
+        raise BadRequest(form.errors.get_json_data())
+    params = dict(form.cleaned_data)
+    # Поиск без сортировки идёт по релевантности - отдельный ключ кэша
+    params['sort_by'] = RankedPaginator.ordering if form.is_relevance_ordered() else form.get_sort_by()
+    category = params.get('category')
+    scope = CacheScope('api_products', params, category_id=category.pk if category else None)
+    return form, scope
+
+
+def products_state(request):
+    """Последнее изменение и число товаров под фильтром (кэшируется до следующего изменения)"""
+    try:
+        form, scope = _product_filter(request)
+        parse_fields(request, PRODUCT_FIELDS)
+        parse_limit(request)
+    except BadRequest:
+        return None
+    queryset = form.filter_queryset(Product.objects.all()).order_by()
+    state = scope.get_or_set({'part': 'state'}, lambda: queryset.aggregate(
+        last_modified=Max('updated_at'), count=Count('id'),
+    ))
+    # Без Last-Modified: удаление товара видно только по числу товаров в ETag.
+    # Версия списка категорий - для category_name: переименование не меняет updated_at товаров
+    return None, state['last_modified'], state['count'], get_version(CATEGORY_LIST), request.GET.urlencode()
+
+
+def product_state(request, pk):
+    """Последнее изменение товара или его категории (category_name)"""
+    row = Product.objects.filter(pk=pk).values_list('updated_at', 'category__updated_at').first()
+    if row is None:
+        return None
+    last_modified = max(row)
+    return last_modified, pk, request.GET.get('fields', '')
+
+
+def categories_state(request):
+    """Категории и их статистика меняются вместе с товарами: учитываем обе таблицы"""
+    def load():
+        categories = Category.objects.aggregate(
+            last_modified=Max('updated_at'), count=Count('id'), products=Sum('stats__product_count'),
+        )
+        products = Product.objects.aggregate(last_modified=Max('updated_at'))
+        last_modified = max(
+            (value for value in (categories['last_modified'], products['last_modified']) if value),
+            default=None,
+        )
+        return last_modified, categories['count'], categories['products']
+    # Без Last-Modified, как у списка товаров: удаления меняют только числа в ETag
+    return (None, *CacheScope('api_catalog_state').get_or_set({}, load), request.GET.urlencode())
+
+
+def prepare_product_list(request):
+    """
+    Разбирает параметры списка товаров (проверка категории - запрос к базе).
+    Возвращает (scope, fields, paginator, cursor, part) или бросает BadRequest.
+    """
+    form, scope = _product_filter(request)
+    fields = parse_fields(request, PRODUCT_FIELDS)
+    limit = parse_limit(request)
+
+    columns = {PRODUCT_FIELDS[name] for name in fields} | {'id'}
+    if form.is_relevance_ordered():
+        # У ранга поиска нет ключа для keyset-условия: страницы по смещению
+        queryset = form.filter_queryset(Product.objects.all()).values(*columns)
+        paginator = RankedPaginator(queryset, limit)
+    else:
+        sort_by = form.get_sort_by()
+        # Для курсора в строке нужно поле сортировки, даже если его не запросили
+        columns.add(sort_by.lstrip('-'))
+        queryset = form.filter_queryset(Product.objects.all()).values(*columns)
+        paginator = KeysetPaginator(queryset, limit, sort_by)
+    cursor = request.GET.get('cursor')
+    part = {'part': 'page', 'cursor': cursor, 'limit': limit, 'fields': ','.join(sorted(columns))}
+    return scope, fields, paginator, cursor, part
+
+
+def product_list_response(request, page, fields):
+    return JsonResponse({
+        'results': [serialize_product(row, fields, request) for row in page.object_list],
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+def invalid_cursor_response():
+    return error_response({'cursor': ['Некорректный курсор страницы']})
+
+
+@require_safe
+@conditional(products_state)
+def product_list_api(request):
+    """
+    Список товаров: фильтры ProductFilterForm, ?fields=, ?limit=, курсор ?cursor=.
+    Страницы без COUNT(*) и OFFSET; порядок - sort_by (по умолчанию сначала новые),
+    у поиска без sort_by - по релевантности (курсор со смещением).
+    """
+    try:
+        scope, fields, paginator, cursor, part = prepare_product_list(request)
+    except BadRequest as e:
+        return error_response(e.args[0])
+    try:
+        page = scope.get_or_set(part, lambda: paginator.page(cursor))
+    except InvalidCursor:
+        return invalid_cursor_response()
+    return product_list_response(request, page, fields)
+
+
+@require_safe
+@conditional(product_state)
+def product_detail_api(request, pk):
+    try:
+        fields = parse_fields(request, PRODUCT_FIELDS)
+    except BadRequest as e:
+        return error_response(e.args[0])
+    row = Product.objects.filter(pk=pk).values(*{PRODUCT_FIELDS[name] for name in fields}).first()
+    if row is None:
+        raise Http404('Товар не найден')
+    return JsonResponse(serialize_product(row, fields, request), json_dumps_params={'ensure_ascii': False})
+
+
+@require_safe
+@conditional(categories_state)
+def category_list_api(request):
+    """Категории со статистикой из CategoryStats (?fields=, ?sort_by= как у CategoryFilterForm)"""
+    try:
+        fields = parse_fields(request, CATEGORY_FIELDS)
+    except BadRequest as e:
+        return error_response(e.args[0])
+    form = CategoryFilterForm(request.GET)
+    sort_by = (form.is_valid() and form.cleaned_data.get('sort_by')) or 'name'
+
+    # Соединяем с CategoryStats, только если нужны её поля (в ответе или для сортировки)
+    stats = {name for name in fields if name in CATEGORY_STATS}
+    if sort_by.lstrip('-') in CATEGORY_STATS:
+        stats.add(sort_by.lstrip('-'))
+    rows = Category.objects.annotate(
+        **{name: CATEGORY_STATS[name] for name in stats}
+    ).order_by(sort_by, 'id').values(*fields)
+    return JsonResponse({'results': list(rows)}, json_dumps_params={'ensure_ascii': False})
+
+
+@require_safe
+def category_autocomplete_api(request):
+    """Поиск категорий по части названия (?q=, ?limit=) для выбора категории в формах"""
+    try:
+        limit = parse_limit(request)
+    except BadRequest as e:
+        return error_response(e.args[0])
+    results = search_categories(request.GET.get('q', '').strip(), limit)
+    return JsonResponse({'results': results}, json_dumps_params={'ensure_ascii': False})
+
+
+def analytics_sort(request):
+    form = AnalyticsFilterForm(request.GET)
+    return (form.is_valid() and form.cleaned_data.get('sort_by')) or 'name'
+
+
+def analytics_response(summary):
+    data = {name: value for name, value in summary.items() if name != 'categories_stats'}
+    data['categories'] = [
+        {name: getattr(category, name) for name in ANALYTICS_CATEGORY_FIELDS}
+        for category in summary['categories_stats']
+    ]
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+@require_safe
+@conditional(categories_state)
+def analytics_api(request):
+    """Итоги каталога и статистика категорий (тот же кэш, что у страницы аналитики)"""
+    sort_by = analytics_sort(request)
+    summary = CacheScope('analytics', {'sort_by': sort_by}).get_or_set(
+        {}, lambda: get_catalog_summary(sort_by)
+    )
+    return analytics_response(summary)
+
+
+def parse_change_cursor(request):
+    """Номер изменения из ?cursor= или None (параметр не передан)"""
+    raw = request.GET.get('cursor')
+    if raw is None:
+        return None
+    try:
+        cursor = int(raw)
+    except ValueError:
+        cursor = -1
+    if cursor < 0:
+        raise BadRequest({'cursor': ['Введите неотрицательное целое число']})
+    return cursor
+
+
+def serialize_change(change, objects, request):
+    key = (change['kind'], change['object_id'])
+    data = objects.get(key)
+    if data is not None and change['kind'] == CatalogChange.PRODUCT:
+        data = serialize_product(data, CHANGE_PRODUCT_FIELDS, request)
+    return {
+        'seq': change['pk'],
+        'type': change['kind'],
+        'id': change['object_id'],
+        'action': change['action'],
+        'changed_at': change['changed_at'],
+        # Текущее состояние; None - объект удалён (в том числе позже в журнале)
+        'data': data,
+    }
+
+
+@require_safe
+def change_feed_api(request):
+    """
+    Изменения товаров и категорий после ?cursor= (номер изменения), до ?limit= записей.
+    Без курсора - пустой ответ с текущим номером: с него продолжают после полной выгрузки.
+    """
+    try:
+        cursor = parse_change_cursor(request)
+        limit = parse_limit(request, changes.DEFAULT_LIMIT, changes.MAX_LIMIT)
+    except BadRequest as e:
+        return error_response(e.args[0])
+
+    if cursor is None:
+        page = changes.ChangePage([], {}, changes.head(), False)
+    else:
+        try:
+            page = changes.read_changes(cursor, limit)
+        except changes.CursorExpired as e:
+            # Журнал после курсора удалён: потребителю нужна полная выгрузка
+            return error_response({'cursor': [str(e)]}, status=410)
+    return JsonResponse({
+        'results': [serialize_change(change, page.objects, request) for change in page.changes],
+        'cursor': page.cursor,
+        'has_more': page.has_more,
+        'next': page_url(request, page.cursor),
+    }, json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,155 @@
+"""
+Асинхронные версии представлений чтения для запуска под ASGI.
+
+Синхронное представление под ASGI целиком выполняется в потоке через
+sync_to_async. Здесь обращения к базе идут через async ORM (aget, acount,
+afirst, async for), а независимые запросы - одновременно через
+asyncio.gather. В Django 4.2 async ORM сам использует поток для драйвера
+базы, поэтому выигрыш - в том, что цикл событий не блокируется между
+запросами, а не в параллельном выполнении SQL.
+
+Шаблоны Django синхронные и могут обращаться к базе (варианты
+ModelChoiceField формы фильтров), поэтому ответы - TemplateResponse: их
+отрисовка выполняется обработчиком ASGI в потоке. Условный GET - тот же,
+что у синхронных представлений (ConditionalGetMixin.make_conditional): 304
+отдаётся до отрисовки.
+"""
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.http import Http404, JsonResponse
+from django.template.response import TemplateResponse
+
+from . import api
+from .analytics import aget_catalog_summary
+from .cache import CacheScope
+from .forms import AnalyticsFilterForm
+from .models import Category, Product
+from .pagination import InvalidCursor, KeysetPaginator
+from .views import CategoryProductsView, ProductDetailView, ProductListView
+
+
+class AsyncListMixin:
+    """get() списков на основе ProductListView через async ORM"""
+
+    async def get(self, request, *args, **kwargs):
+        await self.aprepare()
+        self.object_list = self.get_queryset()
+        self._page = await self.apaginate_queryset(self.object_list, self.paginate_by)
+        if self.show_facets:
+            # Фасеты запоминаются в представлении и берутся из него в get_context_data()
+            await sync_to_async(self.get_facets)()
+        response = self.render_to_response(self.get_context_data())
+        # Сообщения читаются из сессии - синхронно
+        return await sync_to_async(self.make_conditional)(request, response)
+
+    async def aprepare(self):
+        # ModelChoiceField проверяет категорию запросом к базе
+        await sync_to_async(self.get_filter_form().is_valid)()
+
+    async def apaginate_queryset(self, queryset, page_size):
+        if self.is_cursor_mode():
+            paginator = KeysetPaginator(queryset, page_size, self.get_filter_form().get_sort_by())
+            cursor = self.request.GET.get(self.cursor_param)
+            try:
+                page = await self.get_cache_scope().aget_or_set(
+                    {'part': 'cursor', 'cursor': cursor, 'per_page': page_size},
+                    lambda: paginator.apage(cursor),
+                )
+            except InvalidCursor:
+                raise Http404('Некорректный курсор страницы')
+        else:
+            paginator = self.get_paginator(queryset, page_size)
+            try:
+                page = await paginator.apage(self.request.GET.get(self.page_kwarg) or 1)
+            except InvalidPage as e:
+                raise Http404(f'Некорректная страница: {e}')
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def paginate_queryset(self, queryset, page_size):
+        # Страница уже выбрана в get()
+        return self._page
+
+
+class AsyncProductListView(AsyncListMixin, ProductListView):
+    """ProductListView через async ORM: COUNT(*) и строки страницы запрашиваются одновременно"""
+
+
+class AsyncCategoryProductsView(AsyncListMixin, CategoryProductsView):
+
+    async def aprepare(self):
+        pk = self.kwargs['pk']
+
+        async def load():
+            try:
+                return await self.get_category_queryset().aget(pk=pk)
+            except Category.DoesNotExist:
+                raise Http404('Категория не найдена')
+
+        self.category = await CacheScope('category_products', category_id=pk).aget_or_set({'part': 'category'}, load)
+        await super().aprepare()
+
+
+category_products_view = AsyncCategoryProductsView.as_view()
+
+
+class AsyncProductDetailView(ProductDetailView):
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        response = self.render_to_response(self.get_context_data(object=self.object))
+        return await sync_to_async(self.make_conditional)(request, response)
+
+    async def aget_object(self):
+        pk = self.kwargs.get(self.pk_url_kwarg)
+
+        async def load():
+            try:
+                return await self.get_queryset().aget(pk=pk)
+            except Product.DoesNotExist:
+                raise Http404('Товар не найден')
+
+        return await CacheScope('product_detail', {'pk': pk}).aget_or_set({}, load)
+
+
+async def analytics_view(request):
+    form = AnalyticsFilterForm(request.GET)
+    sort_by = api.analytics_sort(request)
+    context = await CacheScope('analytics', {'sort_by': sort_by}).aget_or_set(
+        {}, lambda: aget_catalog_summary(sort_by)
+    )
+    context['filter_form'] = form
+    return TemplateResponse(request, 'catalog/analytics.html', context)
+
+
+@api.aconditional(api.products_state)
+async def product_list_api(request):
+    try:
+        scope, fields, paginator, cursor, part = await sync_to_async(api.prepare_product_list)(request)
+    except api.BadRequest as e:
+        return api.error_response(e.args[0])
+    try:
+        page = await scope.aget_or_set(part, lambda: paginator.apage(cursor))
+    except InvalidCursor:
+        return api.invalid_cursor_response()
+    return api.product_list_response(request, page, fields)
+
+
+@api.aconditional(api.product_state)
+async def product_detail_api(request, pk):
+    try:
+        fields = api.parse_fields(request, api.PRODUCT_FIELDS)
+    except api.BadRequest as e:
+        return api.error_response(e.args[0])
+    row = await Product.objects.filter(pk=pk).values(*{api.PRODUCT_FIELDS[name] for name in fields}).afirst()
+    if row is None:
+        raise Http404('Товар не найден')
+    return JsonResponse(api.serialize_product(row, fields, request), json_dumps_params={'ensure_ascii': False})
+
+
+@api.aconditional(api.categories_state)
+async def analytics_api(request):
+    sort_by = api.analytics_sort(request)
+    summary = await CacheScope('analytics', {'sort_by': sort_by}).aget_or_set(
+        {}, lambda: aget_catalog_summary(sort_by)
+    )
+    return api.analytics_response(summary)
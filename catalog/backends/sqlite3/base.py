@@ -0,0 +1,33 @@
+"""
+SQLite для нескольких процессов и потоков веб-сервера.
+
+Стандартный бэкенд плюс два параметра в OPTIONS (остальные, как обычно,
+передаются в sqlite3.connect):
+
+- 'pragmas' - PRAGMA, выполняемые при каждом подключении: journal_mode=WAL
+  (чтение не блокирует запись), synchronous=NORMAL, busy_timeout, mmap_size;
+- 'transaction_mode' - 'IMMEDIATE': atomic() начинает транзакцию с BEGIN
+  IMMEDIATE. При обычном BEGIN транзакция, которая сначала читает, а потом
+  пишет, получает "database is locked" сразу, без ожидания busy_timeout,
+  если другое подключение уже пишет.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')
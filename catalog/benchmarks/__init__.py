@@ -0,0 +1,7 @@
+"""
+Бенчмарки горячих путей каталога.
+
+data - детерминированный генератор каталога (10k/100k/1M товаров),
+cases - набор замеров с бюджетами SQL-запросов, runner - прогон и
+сравнение результатов. Запуск: manage.py run_benchmarks.
+"""
@@ -0,0 +1,162 @@
+"""
+Замеры горячих путей каталога.
+
+Каждый замер - функция, выполняющая один запрос тестовым клиентом (или
+команду), и бюджет SQL-запросов: прогон, превысивший бюджет, помечается
+как проваленный. Бюджеты рассчитаны на отключённый кэш каталога.
+"""
+import itertools
+from io import StringIO
+
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from catalog.forms import ProductFilterForm
+from catalog.models import Category, Product
+from catalog.pagination import encode_cursor
+
+
+class BenchmarkError(Exception):
+    """Замер не смог выполниться (неожиданный ответ представления)"""
+
+
+class Case:
+    """
+    Один замер: run(client, **kwargs) выполняется repeat раз; setup() перед
+    каждым прогоном (не входит во время) возвращает аргументы для run.
+    """
+
+    def __init__(self, name, run, max_queries, setup=None, repeat=None):
+        self.name = name
+        self.run = run
+        self.max_queries = max_queries
+        self.setup = setup
+        self.repeat = repeat
+
+
+def fetch(client, url, params=None, status=200):
+    response = client.get(url, params or {})
+    if response.status_code != status:
+        raise BenchmarkError(f'{url} {params or ""}: ответ {response.status_code}')
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def post(client, url, data, status=302):
+    response = client.post(url, data)
+    if response.status_code != status:
+        raise BenchmarkError(f'POST {url}: ответ {response.status_code}')
+    return response
+
+
+def _get(url, params=None):
+    return lambda client: fetch(client, url, params)
+
+
+def filter_combinations(category_id):
+    """Фильтры списка товаров: без фильтра, категория, цена, категория + цена, поиск"""
+    return {
+        'all': {},
+        'category': {'category': category_id},
+        'price': {'min_price': '500', 'max_price': '5000'},
+        'category_price': {'category': category_id, 'min_price': '500', 'max_price': '5000'},
+        'search': {'q': 'смартфон'},
+    }
+
+
+def deep_cursor(sort_by, depth):
+    """Курсор страницы, начинающейся примерно с depth-й строки в порядке sort_by"""
+    field = sort_by.lstrip('-')
+    order = [sort_by, '-pk' if sort_by.startswith('-') else 'pk']
+    row = Product.objects.order_by(*order).values(field, 'pk')[depth:depth + 1].first()
+    if row is None:
+        return None
+    return encode_cursor({'o': sort_by, 'd': 'n', 'v': row[field], 'k': row['pk']})
+
+
+def render_grid(products, timeout):
+    """Отрисовка сетки карточек; timeout=0 - без кэша фрагментов"""
+    def run(client):
+        render_to_string('catalog/includes/product_grid.html', {
+            'products': products, 'show_category': True, 'card_cache_timeout': timeout,
+        })
+    return run
+
+
+def build_cases(import_path, per_page=10):
+    """Замеры для текущего содержимого базы"""
+    category_id = Category.objects.order_by('pk').values_list('pk', flat=True).first()
+    product_id = Product.objects.filter(category_id=category_id).order_by('pk').values_list('pk', flat=True).first()
+    total = Product.objects.count()
+    list_url = reverse('product_list')
+    cases = []
+
+    # Список товаров: COUNT(*) + страница + варианты категорий в форме (+ проверка выбранной категории)
+    # + фасеты: два запроса по индексу PriceFacet, при поиске - один сгруппированный по товарам
+    sorts = [sort_by for sort_by, _ in ProductFilterForm.SORT_CHOICES]
+    for (filter_name, params), sort_by in itertools.product(filter_combinations(category_id).items(), sorts):
+        budget = (4 if 'category' in params else 3) + (1 if 'q' in params else 2)
+        cases.append(Case(f'list/{filter_name}/{sort_by}', _get(list_url, {**params, 'sort_by': sort_by}), budget))
+
+    # Глубокие страницы: OFFSET в середине списка и тот же участок через курсор
+    middle = total // 2
+    for sort_by in sorts:
+        page = max(middle // per_page, 1)
+        cases.append(Case(f'list/deep_offset/{sort_by}', _get(list_url, {'sort_by': sort_by, 'page': page}), 5))
+        cursor = deep_cursor(sort_by, middle)
+        if cursor:
+            cases.append(Case(f'list/deep_cursor/{sort_by}',
+                              _get(list_url, {'sort_by': sort_by, 'cursor': cursor}), 4))
+
+    cases += [
+        Case('categories/by_name', _get(reverse('category_list')), 1),
+        Case('categories/by_product_count', _get(reverse('category_list'), {'sort_by': '-product_count'}), 1),
+        Case('analytics', _get(reverse('analytics')), 2),
+        Case('home', _get(reverse('home')), 1),
+        Case('detail', _get(reverse('product_detail', args=[product_id])), 1),
+        Case('category_products', _get(reverse('category_products', args=[category_id])), 2),
+        Case('category_products/cursor',
+             _get(reverse('category_products', args=[category_id]), {'cursor': ''}), 2),
+        Case('api/list', _get(reverse('api_product_list'), {'fields': 'id,name,price'}), 2),
+        Case('export/csv', _get(reverse('product_export'), {'format': 'csv'}), 1, repeat=1),
+    ]
+
+    # Сетка из 100 карточек: каждая отрисовывается заново / берётся из кэша фрагментов
+    cards = list(Product.objects.select_related('category').order_by('-created_at')[:100])
+    cases += [
+        Case('render/grid_100/uncached', render_grid(cards, 0), 0),
+        Case('render/grid_100/fragment_cache', render_grid(cards, 60), 0),
+    ]
+
+    # Изменения - последними, чтобы не влиять на замеры чтения
+    def product_data(name, price='999.00'):
+        return {'name': name, 'description': 'Бенчмарк', 'price': price, 'category': category_id}
+
+    def create_target():
+        return {'pk': Product.objects.create(name='Удаляемый', price=1, category_id=category_id).pk}
+
+    counter = itertools.count()
+    # Создание и изменение цены пишут журнал цен и сводки за день и месяц; каждое
+    # изменение товара - строку журнала изменений (catalog/changes.py): +1 INSERT, при
+    # импорте - вставки пачками по ограничению SQLite в 999 параметров (~250 строк)
+    cases += [
+        Case('write/create',
+             lambda client: post(client, reverse('product_create'), product_data(f'Бенчмарк {next(counter)}')), 11),
+        # Цена меняется при каждом прогоне: замер включает обновление статистики категории
+        Case('write/update',
+             lambda client: post(client, reverse('product_update', args=[product_id]),
+                                 product_data('Обновлённый', f'{1000 + next(counter)}.00')), 14),
+        Case('write/delete',
+             lambda client, pk: post(client, reverse('product_delete', args=[pk]), {}), 10, setup=create_target),
+        Case('import/1000_rows', _import(import_path), 35, repeat=1),
+    ]
+    return cases
+
+
+def _import(path):
+    def run(client):
+        call_command('import_products', path, upsert=True, stdout=StringIO())
+    return run
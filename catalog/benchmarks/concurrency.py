@@ -0,0 +1,144 @@
+"""
+Конкурентная нагрузка на SQLite: потоки со смешанными чтениями и записями.
+
+Каждая конфигурация получает свой временный файл базы с таблицами
+категорий, товаров и статистики (без миграций и сигналов), подключённый
+как отдельный псевдоним в connections. Запись повторяет изменение цены
+товара: чтение строки и два UPDATE в одной транзакции. Ошибки "database is
+locked" считаются, операция не повторяется.
+"""
+import math
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+
+from catalog.models import Category, CategoryStats, Product
+
+CONFIGURATIONS = {
+    # Как было: журнал отката, обычный BEGIN, таймаут sqlite3.connect по умолчанию (5 с)
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {}},
+    'tuned': {'ENGINE': 'catalog.backends.sqlite3', 'OPTIONS': settings.CATALOG_SQLITE_OPTIONS},
+}
+
+CATEGORIES = 10
+
+
+def create_database(alias, engine, options, products, seed):
+    """Временная база с данными; возвращает путь к файлу"""
+    fd, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    connections.settings[alias] = {
+        **connections['default'].settings_dict,
+        'ENGINE': engine, 'NAME': path, 'OPTIONS': options, 'CONN_MAX_AGE': 0, 'TEST': {},
+    }
+    with connections[alias].schema_editor() as editor:
+        for model in (Category, Product, CategoryStats):
+            editor.create_model(model)
+
+    rng = random.Random(seed)
+    categories = Category.objects.using(alias).bulk_create(
+        [Category(name=f'Категория {i}') for i in range(CATEGORIES)]
+    )
+    Product.objects.using(alias).bulk_create([
+        Product(name=f'Товар {i}', price=Decimal(rng.randint(100, 10000)), category=categories[i % CATEGORIES])
+        for i in range(products)
+    ], batch_size=500)
+    CategoryStats.objects.using(alias).bulk_create([CategoryStats(category=category) for category in categories])
+    connections[alias].close()
+    return path
+
+
+def drop_database(alias, path):
+    connections[alias].close()
+    del connections.settings[alias]
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def read(alias, rng):
+    products = Product.objects.using(alias).filter(category__name=f'Категория {rng.randrange(CATEGORIES)}')
+    products.count()
+    list(products.order_by('-created_at')[:10])
+
+
+def write(alias, rng, pk_range):
+    with transaction.atomic(using=alias):
+        product = Product.objects.using(alias).only('price', 'category_id').get(pk=rng.randint(*pk_range))
+        delta = Decimal(rng.randint(-50, 50))
+        Product.objects.using(alias).filter(pk=product.pk).update(price=F('price') + delta)
+        CategoryStats.objects.using(alias).filter(category_id=product.category_id).update(
+            total_value=F('total_value') + delta
+        )
+
+
+def run_load(alias, threads, operations, write_ratio, seed):
+    pk_range = (Product.objects.using(alias).order_by('pk').values_list('pk', flat=True).first(),
+                Product.objects.using(alias).order_by('-pk').values_list('pk', flat=True).first())
+    connections[alias].close()
+    latencies, locked, lock = [], {'read': 0, 'write': 0}, threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        own = []
+        errors = {'read': 0, 'write': 0}
+        barrier.wait()
+        try:
+            for _ in range(operations):
+                kind = 'write' if rng.random() < write_ratio else 'read'
+                started = time.perf_counter()
+                try:
+                    write(alias, rng, pk_range) if kind == 'write' else read(alias, rng)
+                except OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    errors[kind] += 1
+                own.append(time.perf_counter() - started)
+        finally:
+            connections[alias].close()
+        with lock:
+            latencies.extend(own)
+            for kind, count in errors.items():
+                locked[kind] += count
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    total = threads * operations
+    return {
+        'ops': total / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[math.ceil(len(latencies) * 0.95) - 1] * 1000,
+        'locked_reads': locked['read'],
+        'locked_writes': locked['write'],
+        'locked_share': (locked['read'] + locked['write']) / total * 100,
+    }
+
+
+def run_concurrency_benchmark(names, products=2000, threads=8, operations=200, write_ratio=0.2, seed=42):
+    """{конфигурация: результат} для конфигураций из CONFIGURATIONS"""
+    results = {}
+    for name in names:
+        config = CONFIGURATIONS[name]
+        alias = f'concurrency_{name}'
+        path = create_database(alias, config['ENGINE'], config['OPTIONS'], products, seed)
+        try:
+            results[name] = run_load(alias, threads, operations, write_ratio, seed)
+        finally:
+            drop_database(alias, path)
+    return results
@@ -0,0 +1,110 @@
+"""
+Генератор синтетического каталога для бенчмарков.
+
+Данные детерминированы зерном: два прогона с одинаковыми размером и seed
+получают одинаковые названия, цены, категории и даты. Вставка идёт пачками
+через bulk_create, статистика категорий пересчитывается один раз в конце.
+Прежние товары удаляются так же, без загрузки строк и сигналов (reset_catalog).
+"""
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from catalog.cache import bump_version
+from catalog.models import (
+    CatalogChange, Category, DailyPriceRollup, MonthlyPriceRollup, PriceHistory, Product,
+)
+from catalog.stats import rebuild_category_stats
+
+SIZES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+ADJECTIVES = ['Новый', 'Компактный', 'Мощный', 'Удобный', 'Классический', 'Профессиональный',
+              'Лёгкий', 'Прочный', 'Стильный', 'Домашний', 'Детский', 'Спортивный']
+NOUNS = ['смартфон', 'ноутбук', 'мяч', 'рюкзак', 'чайник', 'горшок', 'набор', 'свитер',
+         'роман', 'самокат', 'фонарь', 'коврик', 'планшет', 'стул', 'термос', 'велосипед']
+WORDS = ['отличный', 'выбор', 'для', 'дома', 'работы', 'отдыха', 'качество', 'гарантия',
+         'доставка', 'материал', 'хлопок', 'сталь', 'пластик', 'дерево', 'цвет', 'размер']
+
+# Даты создания товаров распределены по этому периоду до текущего момента
+DATE_SPREAD = timedelta(days=3 * 365)
+
+
+def parse_size(value):
+    """'10k' / '100k' / '1m' или число строкой"""
+    value = str(value).lower()
+    if value in SIZES:
+        return SIZES[value]
+    return int(value)
+
+
+@contextmanager
+def explicit_timestamps():
+    """Отключает auto_now/auto_now_add товара, чтобы даты задавались генератором"""
+    created_at = Product._meta.get_field('created_at')
+    updated_at = Product._meta.get_field('updated_at')
+    saved = created_at.auto_now_add, updated_at.auto_now
+    created_at.auto_now_add = updated_at.auto_now = False
+    try:
+        yield
+    finally:
+        created_at.auto_now_add, updated_at.auto_now = saved
+
+
+def reset_catalog():
+    """
+    Удаляет товары тестовой базы одним DELETE на таблицу (без Collector, который
+    загрузил бы каждый товар, и сигналов на каждую строку) и обнуляет статистику
+    """
+    # Журнал цен ссылается на товары - удаляется раньше них
+    with transaction.atomic():
+        for model in (PriceHistory, DailyPriceRollup, MonthlyPriceRollup, CatalogChange, Product):
+            model.objects.all()._raw_delete(model.objects.db)
+    category_ids = list(Category.objects.values_list('pk', flat=True))
+    rebuild_category_stats(category_ids)
+    bump_version(category_ids)
+
+
+def generate_catalog(products, categories=50, seed=42, batch_size=5000, progress=None):
+    """Создаёт categories категорий и products товаров; возвращает список id категорий"""
+    rng = random.Random(seed)
+    Category.objects.bulk_create(
+        [Category(name=f'Категория {i:03}') for i in range(categories)],
+        ignore_conflicts=True,
+    )
+    category_ids = list(Category.objects.order_by('pk').values_list('pk', flat=True)[:categories])
+    # Неравномерные категории: у части категорий товаров заметно больше
+    cum_weights = list(itertools.accumulate(rng.paretovariate(1.5) for _ in category_ids))
+    now = timezone.now()
+
+    created = 0
+    with explicit_timestamps():
+        while created < products:
+            size = min(batch_size, products - created)
+            batch = []
+            for i in range(created, created + size):
+                created_at = now - DATE_SPREAD * rng.random()
+                batch.append(Product(
+                    name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}',
+                    description=' '.join(rng.choices(WORDS, k=rng.randint(3, 12))),
+                    price=Decimal(max(rng.lognormvariate(7, 1.2), 1)).quantize(Decimal('0.01')),
+                    category_id=rng.choices(category_ids, cum_weights=cum_weights)[0],
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+            with transaction.atomic():
+                Product.objects.bulk_create(batch, batch_size=batch_size)
+            created += size
+            if progress:
+                progress(created)
+
+    rebuild_category_stats(category_ids)
+    return category_ids
@@ -0,0 +1,106 @@
+"""Прогон замеров, запись результатов в JSON и сравнение двух прогонов"""
+import csv
+import json
+import math
+import platform
+import statistics
+import time
+
+import django
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from catalog.models import Category
+
+from .cases import BenchmarkError
+
+
+class BenchmarkRunner:
+    def __init__(self, client, repeat=5, warmup=1):
+        self.client = client
+        self.repeat = repeat
+        self.warmup = warmup
+
+    def run_case(self, case):
+        timings = []
+        queries = 0
+        repeat = case.repeat or self.repeat
+        warmup = self.warmup if case.repeat is None else 0
+        for i in range(warmup + repeat):
+            kwargs = case.setup() if case.setup else {}
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                case.run(self.client, **kwargs)
+                elapsed = time.perf_counter() - started
+            if i >= warmup:
+                timings.append(elapsed * 1000)
+                queries = max(queries, len(ctx.captured_queries))
+        timings.sort()
+        return {
+            'median_ms': statistics.median(timings),
+            'min_ms': timings[0],
+            'p95_ms': timings[math.ceil(len(timings) * 0.95) - 1],
+            'runs': len(timings),
+            'queries': queries,
+            'max_queries': case.max_queries,
+            'ok': queries <= case.max_queries,
+        }
+
+    def run(self, cases, progress=None):
+        results = {}
+        for case in cases:
+            try:
+                results[case.name] = self.run_case(case)
+            except BenchmarkError as e:
+                results[case.name] = {'error': str(e), 'ok': False}
+            if progress:
+                progress(case.name, results[case.name])
+        return results
+
+
+def environment(products, categories, seed):
+    return {
+        'products': products,
+        'categories': categories,
+        'seed': seed,
+        'database': connection.vendor,
+        'django': django.get_version(),
+        'python': platform.python_version(),
+        'timestamp': timezone.now().isoformat(),
+    }
+
+
+def write_import_file(path, rows):
+    """CSV для замера импорта: rows товаров в существующих категориях"""
+    names = list(Category.objects.order_by('pk').values_list('name', flat=True)[:10])
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'description', 'price', 'category'])
+        for i in range(rows):
+            writer.writerow([f'Импорт {i}', 'Товар из бенчмарка импорта', f'{100 + i % 900}.00', names[i % len(names)]])
+
+
+def save_results(path, meta, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(old, new):
+    """
+    Строки сравнения двух прогонов: (замер, старая медиана, новая медиана,
+    изменение в процентах, запросов было, запросов стало).
+    """
+    rows = []
+    for name in sorted(set(old['results']) | set(new['results'])):
+        before = old['results'].get(name, {})
+        after = new['results'].get(name, {})
+        old_ms, new_ms = before.get('median_ms'), after.get('median_ms')
+        change = (new_ms - old_ms) / old_ms * 100 if old_ms and new_ms is not None else None
+        rows.append((name, old_ms, new_ms, change, before.get('queries'), after.get('queries')))
+    return rows
@@ -0,0 +1,145 @@
+"""
+Массовые операции с товарами: удаление, перенос в другую категорию и
+удаление категории с переносом или удалением её товаров.
+
+delete() через Collector (DeleteView, каскад при удалении категории)
+загружает в память каждый товар, потому что у товаров есть сигналы, и
+выполняет их по строке. Здесь товары обрабатываются пачками по pk: на
+пачку - запрос id, один сгруппированный запрос сводки (число, сумма и
+границы цен, диапазоны фасетов по категориям), DELETE или UPDATE по
+списку id, обновление CategoryStats/PriceFacet сводкой вместо сигналов,
+запись пачки в журнал изменений и задач удаления копий изображений
+(по одной вставке).
+Каждая пачка - отдельная транзакция: прерванная операция оставляет
+статистику согласованной, повторный запуск продолжает с оставшихся товаров.
+"""
+from collections import Counter, namedtuple
+
+from django.db import router, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from . import changes, facets, price_history, stats, tasks
+from .cache import bump_version
+from .models import CatalogChange, PriceHistory, Product
+
+# Число id в запросе пачки; SQLite старых версий ограничивает число параметров 999
+DEFAULT_CHUNK_SIZE = 500
+
+# Сводка товаров пачки в одной категории; buckets - {диапазон индекса фасетов: число товаров}
+Batch = namedtuple('Batch', 'count total min_price max_price buckets')
+
+
+def _summarize(pks):
+    """{category_id: Batch} для товаров пачки"""
+    rows = Product.objects.filter(pk__in=pks).values(
+        'category_id', bucket=facets.index_bucket_expression(facets.get_price_edges())
+    ).annotate(count=Count('pk'), total=Sum('price'), low=Min('price'), high=Max('price')).order_by()
+    parts = {}
+    for row in rows:
+        parts.setdefault(row['category_id'], []).append(
+            Batch(row['count'], row['total'], row['low'], row['high'], {row['bucket']: row['count']})
+        )
+    return {category_id: _merge(batches) for category_id, batches in parts.items()}
+
+
+def _merge(batches):
+    buckets = Counter()
+    for batch in batches:
+        buckets.update(batch.buckets)
+    return Batch(
+        sum(batch.count for batch in batches),
+        sum(batch.total for batch in batches),
+        min(batch.min_price for batch in batches),
+        max(batch.max_price for batch in batches),
+        dict(buckets),
+    )
+
+
+def _process(queryset, apply, chunk_size, progress):
+    total = queryset.count() if progress else None
+    using = router.db_for_write(Product)
+    done = last = 0
+    while True:
+        with transaction.atomic(using=using):
+            pks = list(queryset.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+            summary = _summarize(pks)
+            affected = apply(pks, summary, using)
+            bump_version(affected)
+        done += len(pks)
+        last = pks[-1]
+        if progress:
+            progress(done, total)
+    return done
+
+
+def delete_products(queryset, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Удаляет товары queryset пачками; progress(удалено, всего) после каждой пачки. Возвращает число удалённых"""
+
+    def apply(pks, summary, using):
+        # Сигнал post_delete не вызывается: копии изображений удаляются задачами пачки
+        images = set(Product.objects.filter(pk__in=pks).exclude(image='').values_list('image', flat=True))
+        tasks.enqueue_many('delete_renditions', [([image], f'delete_renditions:{image}') for image in sorted(images)])
+        # _raw_delete - один DELETE без Collector; журнал цен ссылается на товары, удаляется первым
+        PriceHistory.objects.filter(product_id__in=pks)._raw_delete(using)
+        Product.objects.filter(pk__in=pks)._raw_delete(using)
+        changes.record(CatalogChange.PRODUCT, pks, CatalogChange.DELETED, using)
+        for category_id, batch in summary.items():
+            stats.products_removed(category_id, batch)
+        return list(summary)
+
+    return _process(queryset, apply, chunk_size, progress)
+
+
+def move_products(queryset, category, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Переносит товары queryset в категорию пачками. Возвращает число перенесённых"""
+
+    def apply(pks, summary, using):
+        # update() не обновляет auto_now: updated_at меняется явно (ключи кэша карточек)
+        Product.objects.filter(pk__in=pks).update(category=category, updated_at=timezone.now())
+        changes.record(CatalogChange.PRODUCT, pks, CatalogChange.UPDATED, using)
+        for category_id, batch in summary.items():
+            stats.products_removed(category_id, batch)
+        stats.products_added(category.pk, _merge(list(summary.values())))
+        return [*summary, category.pk]
+
+    return _process(queryset.exclude(category=category), apply, chunk_size, progress)
+
+
+def touch_products_by_image(image_names):
+    """
+    Обновляет updated_at товаров с этими изображениями после создания копий:
+    карточки кэшируются по updated_at и иначе показывали бы оригинал до
+    истечения кэша. Возвращает число обновлённых товаров.
+    """
+    image_names = list(image_names)
+    if not image_names:
+        return 0
+    using = router.db_for_write(Product)
+    with transaction.atomic(using=using):
+        rows = list(Product.objects.filter(image__in=image_names).values_list('pk', 'category_id'))
+        if rows:
+            pks = [pk for pk, _ in rows]
+            Product.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+            changes.record(CatalogChange.PRODUCT, pks, CatalogChange.UPDATED, using)
+            bump_version({category_id for _, category_id in rows})
+    return len(rows)
+
+
+def delete_category(category, reassign_to=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Удаляет категорию, предварительно перенеся её товары в reassign_to или
+    удалив их пачками. Возвращает число перенесённых или удалённых товаров.
+    """
+    products = Product.objects.filter(category=category)
+    if reassign_to is not None:
+        count = move_products(products, reassign_to, chunk_size, progress)
+        # Иначе каскад по PriceHistory.category удалил бы историю цен перенесённых товаров
+        price_history.reassign_category(category.pk, reassign_to.pk, router.db_for_write(PriceHistory))
+    else:
+        count = delete_products(products, chunk_size, progress)
+    # Товаров уже нет: статистика, фасеты и сводки цен удаляются каскадом без загрузки строк
+    category.delete()
+    return count
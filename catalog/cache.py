@@ -0,0 +1,160 @@
+"""
+Версионированный read-through кэш страниц каталога.
+
+У каталога в целом и у каждой категории есть счётчик версии. Сигналы
+Product/Category увеличивают его, а версия входит в ключ кэша, поэтому
+устаревшие записи просто перестают читаться и вытесняются по таймауту -
+без перебора ключей.
+"""
+import hashlib
+import json
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+
+GLOBAL_VERSION_KEY = 'catalog:version'
+CATEGORY_VERSION_KEY = 'catalog:version:category:{}'
+# Область версии списка категорий (варианты выбора в формах): её меняют
+# только изменения категорий, а не товаров
+CATEGORY_LIST = 'list'
+
+_MISSING = object()
+
+
+def is_enabled():
+    return getattr(settings, 'CATALOG_CACHE_ENABLED', True)
+
+
+def get_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def get_card_timeout():
+    """Время хранения карточек товаров в {% cache %}; 0 (не кэшировать) при отключённом кэше"""
+    if not is_enabled():
+        return 0
+    return getattr(settings, 'CATALOG_CARD_CACHE_TIMEOUT', 24 * 60 * 60)
+
+
+def _version_key(category_id=None):
+    if category_id is None:
+        return GLOBAL_VERSION_KEY
+    return CATEGORY_VERSION_KEY.format(category_id)
+
+
+def _initial_version():
+    # Версия от текущего времени: если ключ версии вытеснят из кэша,
+    # новая версия всё равно окажется больше всех прежних
+    return int(time.time() * 1000)
+
+
+def get_version(category_id=None):
+    """Текущая версия каталога (или категории)"""
+    key = _version_key(category_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(category_id=None):
+    """get_version() для async-представлений"""
+    key = _version_key(category_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, _initial_version(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def bump_version(category_ids=()):
+    """
+    Инвалидирует кэш каталога и указанных категорий.
+
+    Версия увеличивается сразу и ещё раз после коммита транзакции, чтобы
+    запись, закэшированная конкурентным запросом до коммита, тоже устарела.
+    """
+    keys = [GLOBAL_VERSION_KEY] + [_version_key(pk) for pk in set(category_ids) if pk is not None]
+    _bump(keys)
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def _normalize_value(value):
+    if isinstance(value, models.Model):
+        return value.pk
+    if isinstance(value, Decimal):
+        # 10, 10.0 и 10.00 дают один ключ
+        return format(value.normalize(), 'f')
+    return str(value)
+
+
+def normalize_params(params):
+    """Нормализует параметры (например cleaned_data формы) для ключа кэша"""
+    return sorted(
+        (name, _normalize_value(value))
+        for name, value in params.items()
+        if value not in (None, '')
+    )
+
+
+def make_key(name, params, version):
+    payload = json.dumps(normalize_params(params), ensure_ascii=False)
+    digest = hashlib.md5(payload.encode()).hexdigest()
+    return f'catalog:{name}:{version}:{digest}'
+
+
+class CacheScope:
+    """
+    Ключи одного представления: имя + нормализованные параметры + версия.
+
+    category_id задаёт область инвалидации: записи зависят только от версии
+    этой категории, а не от версии всего каталога.
+    """
+
+    def __init__(self, name, params=None, category_id=None):
+        self.name = name
+        self.params = dict(params or {})
+        self.category_id = category_id
+        self._version = None
+
+    @property
+    def version(self):
+        if self._version is None:
+            self._version = get_version(self.category_id)
+        return self._version
+
+    def get_or_set(self, part, producer):
+        """Читает значение из кэша или вычисляет producer() и сохраняет его"""
+        if not is_enabled():
+            return producer()
+        key = make_key(self.name, {**self.params, **part}, self.version)
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = producer()
+            cache.set(key, value, get_timeout())
+        return value
+
+    async def aget_or_set(self, part, producer):
+        """get_or_set() для async-представлений: producer - корутинная функция"""
+        if not is_enabled():
+            return await producer()
+        if self._version is None:
+            self._version = await aget_version(self.category_id)
+        key = make_key(self.name, {**self.params, **part}, self._version)
+        value = await cache.aget(key, _MISSING)
+        if value is _MISSING:
+            value = await producer()
+            await cache.aset(key, value, get_timeout())
+        return value
@@ -0,0 +1,140 @@
+"""
+Журнал изменений каталога для инкрементальной синхронизации.
+
+Каждое создание, изменение и удаление товара или категории добавляет
+строку CatalogChange в той же транзакции; её id - монотонный номер в
+журнале. Потребитель хранит курсор - номер последнего полученного
+изменения - и запрашивает следующие (GET /api/changes/?cursor=N или
+manage.py export_changes --cursor N), получая текущее состояние изменённых
+объектов и метки удалённых, а не весь каталог.
+
+Сигналы записывают изменения по одному объекту; массовые операции
+(catalog/bulk.py, импорт) сигналов не вызывают и записывают изменения
+пачки одной вставкой.
+
+Начало синхронизации: запрос без курсора возвращает текущий номер, после
+чего потребитель выгружает каталог целиком и продолжает с этого номера
+(изменения за время выгрузки придут повторно - применение идемпотентно).
+Старые записи удаляет manage.py prune_changes и запоминает последний
+удалённый номер (CatalogChangePrune); курсор меньше него отклоняется
+(CursorExpired) - нужна полная выгрузка.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import CatalogChange, CatalogChangePrune, Category, Product
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+DEFAULT_RETENTION_DAYS = 30
+
+# Колонки текущего состояния объектов в ответе (.values())
+PRODUCT_COLUMNS = ['id', 'name', 'description', 'price', 'category_id', 'image', 'created_at', 'updated_at']
+CATEGORY_COLUMNS = ['id', 'name', 'created_at', 'updated_at']
+MODELS = {
+    CatalogChange.PRODUCT: (Product, PRODUCT_COLUMNS),
+    CatalogChange.CATEGORY: (Category, CATEGORY_COLUMNS),
+}
+
+# changes - последние изменения объектов в пачке по возрастанию номера;
+# objects - {(тип, id): строка} для неудалённых; cursor - номер для следующего запроса
+ChangePage = namedtuple('ChangePage', 'changes objects cursor has_more')
+
+
+class CursorExpired(Exception):
+    """Изменения после курсора уже удалены из журнала"""
+
+
+def get_delay():
+    return getattr(settings, 'CATALOG_CHANGES_DELAY', 0)
+
+
+def get_retention_days():
+    return getattr(settings, 'CATALOG_CHANGES_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+
+
+def record(kind, object_ids, action, using=None):
+    """Записывает изменения объектов одного типа одной вставкой"""
+    object_ids = list(object_ids)
+    now = timezone.now()
+    manager = CatalogChange.objects.db_manager(using)
+    if len(object_ids) == 1:
+        # Сигналы пишут по одному объекту: простой INSERT - bulk_create вне транзакции
+        # открыл бы свою (BEGIN/COMMIT) на каждое изменение
+        manager.create(kind=kind, object_id=object_ids[0], action=action, changed_at=now)
+    elif object_ids:
+        manager.bulk_create([
+            CatalogChange(kind=kind, object_id=object_id, action=action, changed_at=now) for object_id in object_ids
+        ])
+
+
+def head():
+    """Номер последнего изменения (0 - журнал пуст и не очищался)"""
+    # После очистки всего журнала начинать нужно с отметки очистки, а не с 0
+    return CatalogChange.objects.aggregate(head=Max('pk'))['head'] or pruned_through()
+
+
+def read_changes(cursor, limit=DEFAULT_LIMIT):
+    """
+    До limit записей журнала после cursor. Несколько изменений одного объекта
+    в пачке сворачиваются в последнее; состояние объектов - одним запросом на тип.
+    """
+    queryset = CatalogChange.objects.filter(pk__gt=cursor).order_by('pk')
+    if get_delay():
+        # На PostgreSQL номер выдаётся при вставке, а видна строка после коммита: транзакция
+        # с меньшим номером может закоммититься позже. Свежие записи отдаются с задержкой
+        queryset = queryset.filter(changed_at__lte=timezone.now() - timedelta(seconds=get_delay()))
+    rows = list(queryset.values('pk', 'kind', 'object_id', 'action', 'changed_at')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        _check_cursor(cursor)
+        return ChangePage([], {}, cursor, False)
+    if rows[0]['pk'] > cursor + 1:
+        _check_cursor(cursor)
+
+    latest = {}
+    for row in rows:
+        latest.pop((row['kind'], row['object_id']), None)
+        latest[(row['kind'], row['object_id'])] = row
+    changes = list(latest.values())
+
+    objects = {}
+    for kind, (model, columns) in MODELS.items():
+        ids = [change['object_id'] for change in changes
+               if change['kind'] == kind and change['action'] != CatalogChange.DELETED]
+        if ids:
+            objects.update(((kind, row['id']), row) for row in model.objects.filter(pk__in=ids).values(*columns))
+    return ChangePage(changes, objects, rows[-1]['pk'], has_more)
+
+
+def pruned_through():
+    """Последний номер, удалённый prune_changes (0 - журнал не очищался)"""
+    return CatalogChangePrune.objects.aggregate(through=Max('pruned_through'))['through'] or 0
+
+
+def _check_cursor(cursor):
+    # Пропуск номеров после курсора - либо очистка журнала, либо откаченные транзакции
+    # (на PostgreSQL последовательность не возвращает номера): различаем по отметке очистки
+    through = pruned_through()
+    if cursor < through:
+        raise CursorExpired(f'Изменения после {cursor} удалены из журнала (по номер {through})')
+
+
+def prune(days=None):
+    """Удаляет записи старше days дней и запоминает последний удалённый номер. Возвращает число удалённых"""
+    days = get_retention_days() if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    with transaction.atomic():
+        through = CatalogChange.objects.filter(changed_at__lt=cutoff).aggregate(through=Max('pk'))['through']
+        if through is None:
+            return 0
+        # По номеру, а не по дате: после отметки не остаётся записей с меньшими номерами
+        deleted = CatalogChange.objects.filter(pk__lte=through).delete()[0]
+        CatalogChangePrune.objects.create(pruned_through=through, deleted=deleted)
+    return deleted
@@ -0,0 +1,49 @@
+"""
+Варианты выбора категории для форм.
+
+Список (pk, название) кэшируется в области версии CATEGORY_LIST, которую
+увеличивают только сигналы Category. Если категорий больше
+CATALOG_CATEGORY_CHOICES_LIMIT, список в страницу не встраивается: виджет
+выводит только выбранную категорию, остальные подгружаются по мере ввода
+через /api/categories/autocomplete/.
+"""
+from django.conf import settings
+
+from .cache import CATEGORY_LIST, CacheScope
+from .models import Category
+
+AUTOCOMPLETE_LIMIT = 20
+
+
+def get_choices_limit():
+    return getattr(settings, 'CATALOG_CATEGORY_CHOICES_LIMIT', 500)
+
+
+def get_category_choices():
+    """(варианты, полный ли список): из базы читается не больше limit + 1 строки"""
+    limit = get_choices_limit()
+
+    def load():
+        rows = list(Category.objects.order_by('name', 'pk').values_list('pk', 'name')[:limit + 1])
+        return rows[:limit], len(rows) <= limit
+
+    return CacheScope('category_choices', {'limit': limit}, category_id=CATEGORY_LIST).get_or_set({}, load)
+
+
+def get_category_labels(pks):
+    """Варианты только для выбранных категорий"""
+    pks = [pk for pk in pks if str(pk).isdigit()]
+    if not pks:
+        return []
+    return list(Category.objects.filter(pk__in=pks).order_by('name').values_list('pk', 'name'))
+
+
+def search_categories(q, limit=AUTOCOMPLETE_LIMIT):
+    """Категории, в названии которых есть q: [{'id', 'name'}, ...] по алфавиту"""
+    def load():
+        queryset = Category.objects.order_by('name', 'pk')
+        if q:
+            queryset = queryset.filter(name__icontains=q)
+        return list(queryset.values('id', 'name')[:limit])
+
+    return CacheScope('category_search', {'q': q, 'limit': limit}, category_id=CATEGORY_LIST).get_or_set({}, load)
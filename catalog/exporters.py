@@ -0,0 +1,136 @@
+"""
+Потоковый экспорт каталога в CSV, JSONL и (если установлен pyarrow) Parquet.
+
+Строки читаются через values_list(...).iterator(chunk_size=...), без
+создания экземпляров моделей, и отдаются генератором кусками - файл
+целиком в памяти не собирается. Колонки совпадают с форматом импорта.
+"""
+import csv
+import io
+import json
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet - необязательная зависимость
+    pyarrow = None
+
+EXPORT_COLUMNS = ['id', 'name', 'description', 'price', 'category', 'created_at', 'updated_at']
+EXPORT_FIELDS = ['id', 'name', 'description', 'price', 'category__name', 'created_at', 'updated_at']
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Сколько строк собирать в один кусок ответа
+ROWS_PER_CHUNK = 500
+
+
+def available_formats():
+    formats = ['csv', 'jsonl']
+    if pyarrow is not None:
+        formats.append('parquet')
+    return formats
+
+
+def export_rows(queryset, chunk_size=2000):
+    """Кортежи значений EXPORT_FIELDS без создания моделей"""
+    return queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def _chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in _chunked(rows, ROWS_PER_CHUNK):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_jsonl(rows):
+    for chunk in _chunked(rows, ROWS_PER_CHUNK):
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False, default=str) + '\n'
+            for row in chunk
+        )
+
+
+class _DrainableSink(io.RawIOBase):
+    """Файлоподобный приёмник для ParquetWriter, из которого забираются записанные байты"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def iter_parquet(rows, row_group_size=50000):
+    if pyarrow is None:
+        raise RuntimeError('Для экспорта в Parquet установите pyarrow')
+    schema = pyarrow.schema([
+        ('id', pyarrow.int64()),
+        ('name', pyarrow.string()),
+        ('description', pyarrow.string()),
+        ('price', pyarrow.decimal128(10, 2)),
+        ('category', pyarrow.string()),
+        ('created_at', pyarrow.timestamp('us', tz='UTC')),
+        ('updated_at', pyarrow.timestamp('us', tz='UTC')),
+    ])
+    sink = _DrainableSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    try:
+        for chunk in _chunked(rows, row_group_size):
+            columns = list(zip(*chunk))
+            writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+WRITERS = {
+    'csv': iter_csv,
+    'jsonl': iter_jsonl,
+    'parquet': iter_parquet,
+}
+
+
+def export_stream(queryset, file_format, chunk_size=2000):
+    """Генератор кусков (str или bytes) выгрузки в нужном формате"""
+    return WRITERS[file_format](export_rows(queryset, chunk_size=chunk_size))
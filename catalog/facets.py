@@ -0,0 +1,256 @@
+"""
+Фасеты списка товаров: число товаров по категориям и гистограмма цен для
+текущего состояния фильтров.
+
+Каждый фасет считается без собственного фильтра: в счётчиках категорий
+учтены поиск и цена, но не выбранная категория, в гистограмме - поиск и
+категория, но не диапазон цен.
+
+Без поиска фасеты читаются из индекса PriceFacet (товаров категории в
+каждом ценовом диапазоне), который обновляется вместе с CategoryStats: два
+запроса по строкам "категория x диапазон", товары не читаются, поэтому
+время не зависит от размера каталога. С поиском или с фильтром цены,
+граница которого не совпадает с границами диапазонов, оба фасета
+считаются одним сгруппированным запросом по отфильтрованным товарам.
+"""
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, PositiveSmallIntegerField, Sum, Value, When
+
+from .models import Category, PriceFacet, Product
+from .search import search_products
+
+# Границы ценовых диапазонов гистограммы; после изменения нужен rebuild_category_stats
+DEFAULT_PRICE_BUCKETS = [100, 500, 1000, 5000, 10000, 50000]
+CATEGORY_LIMIT = 10
+# Цены хранятся с точностью до копейки: диапазон [a, b) в фильтре - это a..b-0.01
+PRICE_STEP = Decimal('0.01')
+
+
+def get_price_edges():
+    return [Decimal(edge) for edge in getattr(settings, 'CATALOG_PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS)]
+
+
+def bucket_of(price, edges=None):
+    """Диапазон гистограммы [граница, следующая граница): 0 - дешевле первой границы"""
+    return bisect_right(edges if edges is not None else get_price_edges(), price)
+
+
+def bucket_expression(edges):
+    return Case(
+        *[When(price__lt=edge, then=Value(i)) for i, edge in enumerate(edges)],
+        default=Value(len(edges)),
+        output_field=PositiveSmallIntegerField(),
+    )
+
+
+# В индексе цена, равная границе, хранится отдельно от интервалов между
+# границами: 0 - до первой границы, 2k + 1 - ровно k-я граница, 2k + 2 -
+# между k-й и следующей. Так и "от 500", и "до 5000" (фильтры включают
+# границу) совпадают с диапазонами индекса.
+
+def index_bucket_count(edges):
+    return 2 * len(edges) + 1
+
+
+def index_bucket_of(price, edges=None):
+    edges = edges if edges is not None else get_price_edges()
+    k = bisect_left(edges, price)
+    if k < len(edges) and edges[k] == price:
+        return 2 * k + 1
+    return 2 * k
+
+
+def index_bucket_expression(edges):
+    whens = []
+    for k, edge in enumerate(edges):
+        whens += [When(price__lt=edge, then=Value(2 * k)), When(price=edge, then=Value(2 * k + 1))]
+    return Case(*whens, default=Value(2 * len(edges)), output_field=PositiveSmallIntegerField())
+
+
+def _index_bound(value, edges, lower):
+    """Крайний диапазон индекса для границы фильтра цены; None - граница не совпадает с диапазонами"""
+    if value in edges:
+        return 2 * edges.index(value) + 1
+    neighbour = value - PRICE_STEP if lower else value + PRICE_STEP
+    if neighbour in edges:
+        k = edges.index(neighbour)
+        return 2 * k + 2 if lower else 2 * k
+    return None
+
+
+# Обслуживание индекса
+
+def create_price_facets(category_id):
+    """Пустые строки всех диапазонов для новой категории"""
+    PriceFacet.objects.bulk_create(
+        [PriceFacet(category_id=category_id, bucket=bucket) for bucket in range(index_bucket_count(get_price_edges()))],
+        ignore_conflicts=True,
+    )
+
+
+def _shift(category_id, price, delta):
+    return PriceFacet.objects.filter(category_id=category_id, bucket=index_bucket_of(price)).update(
+        product_count=F('product_count') + delta
+    )
+
+
+def product_added(category_id, price):
+    if not _shift(category_id, price, 1):
+        # Строки нет (границы диапазонов изменились) - пересчитываем категорию
+        rebuild_price_facets([category_id])
+
+
+def product_removed(category_id, price):
+    _shift(category_id, price, -1)
+
+
+def product_price_changed(category_id, old_price, new_price):
+    if index_bucket_of(old_price) != index_bucket_of(new_price):
+        product_removed(category_id, old_price)
+        product_added(category_id, new_price)
+
+
+def _shift_buckets(category_id, counts, sign):
+    return PriceFacet.objects.filter(category_id=category_id, bucket__in=counts).update(
+        product_count=F('product_count') + Case(
+            *[When(bucket=bucket, then=Value(sign * count)) for bucket, count in counts.items()],
+            default=Value(0),
+        )
+    )
+
+
+def products_added(category_id, counts):
+    """Пачка товаров: {диапазон индекса: число товаров}"""
+    if _shift_buckets(category_id, counts, 1) != len(counts):
+        rebuild_price_facets([category_id])
+
+
+def products_removed(category_id, counts):
+    _shift_buckets(category_id, counts, -1)
+
+
+def compute_price_facets(category_ids=None):
+    """Считает индекс заново по таблице товаров: {(category_id, bucket): число товаров}"""
+    products = Product.objects.all()
+    if category_ids is not None:
+        products = products.filter(category_id__in=category_ids)
+    rows = products.values('category_id', bucket=index_bucket_expression(get_price_edges())).annotate(
+        count=Count('pk')
+    ).order_by()
+    return {(row['category_id'], row['bucket']): row['count'] for row in rows}
+
+
+def rebuild_price_facets(category_ids=None):
+    """Перестраивает индекс фасетов (для всех категорий или для указанных)"""
+    if category_ids is None:
+        category_ids = list(Category.objects.values_list('pk', flat=True))
+    buckets = range(index_bucket_count(get_price_edges()))
+    with transaction.atomic():
+        counts = compute_price_facets(category_ids)
+        PriceFacet.objects.filter(category_id__in=category_ids).delete()
+        PriceFacet.objects.bulk_create([
+            PriceFacet(category_id=category_id, bucket=bucket, product_count=counts.get((category_id, bucket), 0))
+            for category_id in category_ids
+            for bucket in buckets
+        ], batch_size=500)
+
+
+def check_price_facets():
+    """Расхождения индекса с расчётом по товарам: [(category_id, поле, есть, ожидалось)]"""
+    expected = compute_price_facets()
+    actual = {
+        (row.category_id, row.bucket): row.product_count
+        for row in PriceFacet.objects.all()
+    }
+    drift = []
+    for key in sorted(set(expected) | {key for key, count in actual.items() if count}):
+        got, exp = actual.get(key, 0), expected.get(key, 0)
+        if got != exp:
+            drift.append((key[0], f'price_facet[{key[1]}]', got, exp))
+    return drift
+
+
+# Расчёт фасетов для фильтров
+
+def _price_buckets(edges):
+    """Границы диапазонов: [(от, до), ...], None - без границы"""
+    return list(zip([None, *edges], [*edges, None]))
+
+
+def _from_index(category, bucket_range, edges):
+    facets = PriceFacet.objects.all()
+    if bucket_range != (0, index_bucket_count(edges) - 1):
+        facets = facets.filter(bucket__range=bucket_range)
+    categories = facets.values('category_id', 'category__name').annotate(
+        count=Sum('product_count')
+    ).filter(count__gt=0).order_by('-count', 'category__name')[:CATEGORY_LIMIT]
+
+    histogram = PriceFacet.objects.all()
+    if category:
+        histogram = histogram.filter(category=category)
+    prices = [0] * (len(edges) + 1)
+    for bucket, count in histogram.values_list('bucket').annotate(count=Sum('product_count')).order_by():
+        # Цена, равная границе, относится к диапазону, который с неё начинается
+        prices[(bucket + 1) // 2] += count
+
+    return [(row['category_id'], row['category__name'], row['count']) for row in categories], prices
+
+
+def _from_products(q, category, min_price, max_price, edges):
+    # Дополнительные границы по фильтру цены: каждый поддиапазон целиком внутри или вне фильтра
+    low = min_price or Decimal(0)
+    high = max_price + PRICE_STEP if max_price else None
+    sub_edges = sorted({*edges, low, *([high] if high is not None else [])} - {Decimal(0)})
+
+    products = Product.objects.all()
+    if q:
+        products = search_products(products, q, ranked=False)
+    rows = products.values('category_id', 'category__name', sub=bucket_expression(sub_edges)).annotate(
+        count=Count('pk')
+    ).order_by()
+
+    counts, prices = {}, [0] * (len(edges) + 1)
+    for row in rows:
+        start = sub_edges[row['sub'] - 1] if row['sub'] else Decimal(0)
+        if start >= low and (high is None or start < high):
+            key = (row['category_id'], row['category__name'])
+            counts[key] = counts.get(key, 0) + row['count']
+        if not category or row['category_id'] == category.pk:
+            prices[bucket_of(start, edges)] += row['count']
+
+    top = sorted(counts.items(), key=lambda item: (-item[1], item[0][1]))[:CATEGORY_LIMIT]
+    return [(pk, name, count) for (pk, name), count in top], prices
+
+
+def get_facets(q=None, category=None, min_price=None, max_price=None):
+    """
+    {'categories': [{'id', 'name', 'count', 'selected'}],
+     'prices': [{'min', 'max', 'count', 'share', 'selected'}]}
+    """
+    edges = get_price_edges()
+    low = _index_bound(min_price, edges, lower=True) if min_price else 0
+    high = _index_bound(max_price, edges, lower=False) if max_price else index_bucket_count(edges) - 1
+    if not q and low is not None and high is not None:
+        categories, prices = _from_index(category, (low, high), edges)
+    else:
+        categories, prices = _from_products(q, category, min_price, max_price, edges)
+
+    top = max(prices, default=0)
+    return {
+        'categories': [
+            {'id': pk, 'name': name, 'count': count, 'selected': category is not None and pk == category.pk}
+            for pk, name, count in categories
+        ],
+        'prices': [
+            {
+                'min': start, 'max': end, 'count': count,
+                'share': round(count / top * 100) if top else 0,
+                'selected': (min_price or None) == start and (max_price + PRICE_STEP if max_price else None) == end,
+            }
+            for (start, end), count in zip(_price_buckets(edges), prices)
+        ],
+    }
@@ -1,6 +1,79 @@
 from django import forms
 from django.core.validators import MinValueValidator
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse_lazy
+from django.utils.functional import cached_property
+from .choices import get_category_choices, get_category_labels
+from .facets import get_facets
 from .models import Product, Category
+from .search import search_products
+
+
+def clean_product_name(name):
+    """Правило для названия товара: общее для формы и импорта"""
+    if not name or not name.strip():
+        raise forms.ValidationError('Название товара обязательно для заполнения')
+    return name.strip()
+
+
+class CategoryChoiceIterator(ModelChoiceIterator):
+    """Варианты категорий из кэша (catalog/choices.py) вместо запроса по queryset"""
+
+    @cached_property
+    def _choices(self):
+        choices, complete = get_category_choices()
+        if self.field.excluded_pks:
+            choices = [choice for choice in choices if choice[0] not in self.field.excluded_pks]
+        return choices, complete
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        yield from self._choices[0]
+
+    def __len__(self):
+        return len(self._choices[0]) + (self.field.empty_label is not None)
+
+    def is_complete(self):
+        return self._choices[1]
+
+    def selected(self, values):
+        """Пустой вариант и только выбранные категории"""
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        yield from get_category_labels(values)
+
+
+class CategorySelect(forms.Select):
+    """
+    Выбор категории: если категорий больше CATALOG_CATEGORY_CHOICES_LIMIT,
+    выводится только выбранная, остальные подгружаются автодополнением
+    """
+    autocomplete_url = reverse_lazy('api_category_autocomplete')
+
+    def get_context(self, name, value, attrs):
+        choices = self.choices
+        if not isinstance(choices, CategoryChoiceIterator) or choices.is_complete():
+            return super().get_context(name, value, attrs)
+        attrs = {**(attrs or {}), 'data-autocomplete-url': self.autocomplete_url}
+        self.choices = list(choices.selected(self.format_value(value)))
+        try:
+            return super().get_context(name, value, attrs)
+        finally:
+            self.choices = choices
+
+
+class CategoryChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField категорий с кэшированными вариантами"""
+    iterator = CategoryChoiceIterator
+    widget = CategorySelect
+    excluded_pks = frozenset()
+
+    def exclude(self, *pks):
+        """Убирает категории из вариантов: кэшированный список общий и queryset не учитывает"""
+        self.excluded_pks = frozenset(pks)
+        self.queryset = self.queryset.exclude(pk__in=pks)
+
 
 class ProductForm(forms.ModelForm):
     """Форма для создания и редактирования товаров"""
@@ -26,6 +99,7 @@ class ProductForm(forms.ModelForm):
     class Meta:
         model = Product
         fields = ['name', 'description', 'price', 'category', 'image']
+        field_classes = {'category': CategoryChoiceField}
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -35,7 +109,7 @@ class ProductForm(forms.ModelForm):
                 'class': 'form-control', 
                 'rows': 4
             }),
-            'category': forms.Select(attrs={
+            'category': CategorySelect(attrs={
                 'class': 'form-control',
                 'required': 'required'
             }),
@@ -60,10 +134,7 @@ class ProductForm(forms.ModelForm):
 
     def clean_name(self):
         """Валидация названия товара"""
-        name = self.cleaned_data.get('name')
-        if not name or not name.strip():
-            raise forms.ValidationError('Название товара обязательно для заполнения')
-        return name.strip()
+        return clean_product_name(self.cleaned_data.get('name'))
 
 
 class CategoryForm(forms.ModelForm):
@@ -89,13 +160,38 @@ class CategoryForm(forms.ModelForm):
         return name.strip()
 
 
+class CategoryDeleteForm(forms.Form):
+    """Подтверждение удаления категории: товары переносятся в другую категорию или удаляются"""
+    reassign_to = CategoryChoiceField(
+        queryset=Category.objects.all(),
+        required=False,
+        empty_label='Не переносить - удалить товары',
+        widget=CategorySelect(attrs={'class': 'form-select'}),
+        label='Перенести товары в категорию',
+    )
+
+    def __init__(self, *args, category=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if category is not None:
+            self.fields['reassign_to'].exclude(category.pk)
+
+
 class ProductFilterForm(forms.Form):
     """Форма для фильтрации товаров с динамической отправкой"""
-    category = forms.ModelChoiceField(
+    q = forms.CharField(
+        required=False,
+        max_length=200,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Поиск по названию и описанию',
+            'type': 'search'
+        })
+    )
+    category = CategoryChoiceField(
         queryset=Category.objects.all(),
         required=False,
         empty_label="Все категории",
-        widget=forms.Select(attrs={
+        widget=CategorySelect(attrs={
             'class': 'form-control',
             'onchange': 'this.form.submit()'
         })
@@ -141,6 +237,57 @@ class ProductFilterForm(forms.Form):
         })
     )
 
+    DEFAULT_SORT = '-created_at'
+
+    def get_sort_by(self):
+        """Выбранная сортировка (по умолчанию - сначала новые)"""
+        if self.is_valid():
+            return self.cleaned_data.get('sort_by') or self.DEFAULT_SORT
+        return self.DEFAULT_SORT
+
+    def is_relevance_ordered(self):
+        """Поиск без явной сортировки: товары идут по релевантности, а не по get_sort_by()"""
+        return self.is_valid() and bool(self.cleaned_data.get('q')) and not self.cleaned_data.get('sort_by')
+
+    def get_facets(self):
+        """Число товаров по категориям и гистограмма цен для текущих фильтров (catalog/facets.py)"""
+        data = self.cleaned_data if self.is_valid() else {}
+        return get_facets(
+            q=data.get('q'),
+            category=data.get('category'),
+            min_price=data.get('min_price'),
+            max_price=data.get('max_price'),
+        )
+
+    def filter_queryset(self, queryset):
+        """Применяет фильтры и сортировку формы к queryset товаров"""
+        if not self.is_valid():
+            return queryset
+
+        q = self.cleaned_data.get('q')
+        category = self.cleaned_data.get('category')
+        min_price = self.cleaned_data.get('min_price')
+        max_price = self.cleaned_data.get('max_price')
+
+        if q:
+            queryset = search_products(queryset, q)
+        if category:
+            queryset = queryset.filter(category=category)
+        if min_price:
+            queryset = queryset.filter(price__gte=min_price)
+        if max_price:
+            queryset = queryset.filter(price__lte=max_price)
+
+        # При поиске без явной сортировки оставляем порядок по релевантности
+        if self.is_relevance_ordered():
+            return queryset
+        return queryset.order_by(self.get_sort_by())
+
+
+class CategoryProductFilterForm(ProductFilterForm):
+    """Фильтры товаров внутри одной категории: категория задаётся адресом страницы"""
+    category = None
+
 
 class CategoryFilterForm(forms.Form):
     """Форма для фильтрации категорий"""
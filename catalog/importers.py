@@ -0,0 +1,230 @@
+"""
+Потоковый импорт товаров из CSV/JSONL.
+
+Файл читается построчно, строки проверяются по правилам ProductForm (поля
+формы создаются один раз), категории берутся из словаря имя -> id, а
+вставка идёт пачками через bulk_create, каждая пачка - в своей транзакции.
+В памяти одновременно находится не больше одной пачки. Сигналы не
+вызываются: журнал цен и журнал изменений пишутся пачкой в той же транзакции.
+"""
+import csv
+import json
+import time
+
+from django import forms
+from django.db import transaction
+from django.utils import timezone
+
+from . import changes
+from .cache import bump_version
+from .forms import ProductForm, clean_product_name
+from .models import CatalogChange, Category, Product
+from .price_history import PriceChange, record_price_changes
+from .stats import rebuild_category_stats
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+
+class ImportAborted(Exception):
+    """Импорт остановлен: слишком много некорректных строк"""
+
+
+def detect_format(path):
+    if str(path).lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'csv'
+
+
+def read_csv(path, delimiter=','):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for line_no, row in enumerate(csv.DictReader(f, delimiter=delimiter), start=2):
+            yield line_no, row
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = {'__error__': f'Некорректный JSON: {e}'}
+            yield line_no, row
+
+
+def read_rows(path, file_format=None, delimiter=','):
+    """Итератор (номер строки, dict) по файлу импорта"""
+    file_format = file_format or detect_format(path)
+    if file_format == 'jsonl':
+        return read_jsonl(path)
+    return read_csv(path, delimiter=delimiter)
+
+
+class CategoryResolver:
+    """Имя категории -> id по словарю в памяти (без запроса на каждую строку)"""
+
+    def __init__(self, create_missing=False):
+        self.create_missing = create_missing
+        self.ids = dict(Category.objects.values_list('name', 'id'))
+
+    def resolve(self, name):
+        name = (name or '').strip()
+        if not name:
+            raise forms.ValidationError('Категория обязательна для заполнения')
+        if name not in self.ids:
+            if not self.create_missing:
+                raise forms.ValidationError(f'Категория "{name}" не найдена')
+            self.ids[name] = Category.objects.get_or_create(name=name)[0].pk
+        return self.ids[name]
+
+
+class ProductRowValidator:
+    """Проверяет строку импорта по правилам ProductForm без создания формы на каждую строку"""
+
+    def __init__(self, categories):
+        fields = ProductForm.base_fields
+        self.name_field = fields['name']
+        self.description_field = fields['description']
+        self.price_field = fields['price']
+        self.categories = categories
+
+    def clean(self, row):
+        """Возвращает dict с очищенными значениями или бросает ValidationError"""
+        if '__error__' in row:
+            raise forms.ValidationError(row['__error__'])
+        errors = {}
+        cleaned = {}
+        checks = [
+            ('name', lambda: clean_product_name(self.name_field.clean(row.get('name')))),
+            ('description', lambda: self.description_field.clean(row.get('description') or '')),
+            ('price', lambda: self.price_field.clean(row.get('price'))),
+            ('category', lambda: self.categories.resolve(row.get('category'))),
+        ]
+        for name, check in checks:
+            try:
+                cleaned[name] = check()
+            except forms.ValidationError as e:
+                errors[name] = e.messages
+        if errors:
+            raise forms.ValidationError(errors)
+        return cleaned
+
+
+class ProductImporter:
+    """
+    Пакетный импорт товаров.
+
+    upsert=True обновляет существующие товары по естественному ключу
+    (категория, название) вместо создания дублей.
+    """
+
+    def __init__(self, batch_size=1000, upsert=False, create_categories=False,
+                 max_errors=100, progress=None):
+        self.batch_size = batch_size
+        self.upsert = upsert
+        self.max_errors = max_errors
+        self.progress = progress
+        self.validator = ProductRowValidator(CategoryResolver(create_missing=create_categories))
+
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.error_count = 0
+        self.touched_categories = set()
+        self.started = None
+
+    @property
+    def rate(self):
+        elapsed = time.monotonic() - self.started if self.started else 0
+        return self.processed / elapsed if elapsed else 0.0
+
+    def run(self, rows):
+        """Импортирует строки (итератор пар (номер строки, dict))"""
+        self.started = time.monotonic()
+        batch = []
+        try:
+            for line_no, row in rows:
+                self.processed += 1
+                try:
+                    batch.append(self.validator.clean(row))
+                except forms.ValidationError as e:
+                    self.add_error(line_no, e)
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+                    batch = []
+            if batch:
+                self.flush(batch)
+        finally:
+            self.finish()
+        return self
+
+    def add_error(self, line_no, error):
+        self.error_count += 1
+        # Храним ограниченное число ошибок, чтобы память не росла с размером файла
+        if len(self.errors) < 1000:
+            self.errors.append((line_no, error.message_dict if hasattr(error, 'error_dict') else error.messages))
+        if self.max_errors is not None and self.error_count > self.max_errors:
+            raise ImportAborted(f'Превышено допустимое число ошибок ({self.max_errors})')
+
+    def flush(self, batch):
+        """Записывает пачку в одной транзакции"""
+        now = timezone.now()
+        rows = {}
+        for data in batch:
+            # В пределах пачки побеждает последняя строка с тем же ключом
+            key = (data['category'], data['name']) if self.upsert else len(rows)
+            rows[key] = data
+
+        existing = {}
+        if self.upsert:
+            category_ids = {category_id for category_id, _ in rows}
+            names = {name for _, name in rows}
+            existing = {
+                (category_id, name): (pk, price)
+                for pk, category_id, name, price in Product.objects.filter(
+                    category_id__in=category_ids, name__in=names
+                ).values_list('pk', 'category_id', 'name', 'price')
+            }
+
+        to_create, to_update, price_changes = [], [], []
+        for key, data in rows.items():
+            product = Product(
+                name=data['name'],
+                description=data['description'],
+                price=data['price'],
+                category_id=data['category'],
+            )
+            if key in existing:
+                product.pk, old_price = existing[key]
+                product.updated_at = now
+                to_update.append(product)
+                price_changes.append(PriceChange(product.pk, product.category_id, old_price, product.price))
+            else:
+                to_create.append(product)
+
+        with transaction.atomic():
+            if to_create:
+                Product.objects.bulk_create(to_create, batch_size=self.batch_size)
+                price_changes += [PriceChange(p.pk, p.category_id, None, p.price) for p in to_create]
+            if to_update:
+                Product.objects.bulk_update(to_update, ['description', 'price', 'updated_at'],
+                                            batch_size=self.batch_size)
+            # Журнал цен - одной вставкой на пачку в той же транзакции
+            record_price_changes(price_changes, now)
+            changes.record(CatalogChange.PRODUCT, [p.pk for p in to_create], CatalogChange.CREATED)
+            changes.record(CatalogChange.PRODUCT, [p.pk for p in to_update], CatalogChange.UPDATED)
+
+        self.created += len(to_create)
+        self.updated += len(to_update)
+        self.touched_categories.update(data['category'] for data in rows.values())
+        if self.progress:
+            self.progress(self)
+
+    def finish(self):
+        """bulk-операции не вызывают сигналы: обновляем статистику и кэш затронутых категорий"""
+        if self.touched_categories:
+            rebuild_category_stats(self.touched_categories)
+            bump_version(self.touched_categories)
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.bulk import DEFAULT_CHUNK_SIZE, delete_products, move_products
+from catalog.forms import ProductFilterForm
+from catalog.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = ('Массовое удаление товаров или перенос в другую категорию пачками, '
+            'с фильтрами как в списке товаров')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['delete', 'move'])
+        parser.add_argument('--to', type=int, help='ID категории, в которую переносятся товары (для move)')
+        parser.add_argument('--q', help='Поисковый запрос')
+        parser.add_argument('--category', type=int, help='ID категории')
+        parser.add_argument('--min-price', help='Минимальная цена')
+        parser.add_argument('--max-price', help='Максимальная цена')
+        parser.add_argument('--all', action='store_true', help='Все товары (без фильтров)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Товаров в пачке')
+
+    def handle(self, *args, **options):
+        data = {
+            'q': options['q'],
+            'category': options['category'],
+            'min_price': options['min_price'],
+            'max_price': options['max_price'],
+        }
+        data = {k: v for k, v in data.items() if v is not None}
+        if not data and not options['all']:
+            raise CommandError('Укажите фильтры или --all')
+        form = ProductFilterForm(data)
+        if not form.is_valid():
+            raise CommandError(f'Некорректные фильтры: {form.errors.as_text()}')
+        queryset = form.filter_queryset(Product.objects.all())
+
+        if options['action'] == 'move':
+            if options['to'] is None:
+                raise CommandError('Для move укажите --to')
+            try:
+                target = Category.objects.get(pk=options['to'])
+            except Category.DoesNotExist:
+                raise CommandError(f'Категория {options["to"]} не найдена')
+            count = move_products(queryset, target, options['chunk_size'], self.progress)
+            self.stdout.write(self.style.SUCCESS(f'Товаров перенесено в «{target}»: {count}'))
+        else:
+            count = delete_products(queryset, options['chunk_size'], self.progress)
+            self.stdout.write(self.style.SUCCESS(f'Товаров удалено: {count}'))
+
+    def progress(self, done, total):
+        self.stdout.write(f'  {done} / {total}', ending='\r')
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.bulk import DEFAULT_CHUNK_SIZE, delete_category
+from catalog.models import Category
+
+
+class Command(BaseCommand):
+    help = 'Удаляет категорию, перенося её товары в другую категорию или удаляя их пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('category', type=int, help='ID удаляемой категории')
+        parser.add_argument('--reassign-to', type=int, help='ID категории, в которую переносятся товары')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Товаров в пачке')
+
+    def handle(self, *args, **options):
+        category = self.get_category(options['category'])
+        target = None
+        if options['reassign_to'] is not None:
+            if options['reassign_to'] == category.pk:
+                raise CommandError('Нельзя перенести товары в удаляемую категорию')
+            target = self.get_category(options['reassign_to'])
+
+        count = delete_category(category, reassign_to=target, chunk_size=options['chunk_size'], progress=self.progress)
+        if target is not None:
+            self.stdout.write(self.style.SUCCESS(f'Категория «{category}» удалена, товаров перенесено в «{target}»: {count}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Категория «{category}» удалена вместе с товарами: {count}'))
+
+    def get_category(self, pk):
+        try:
+            return Category.objects.get(pk=pk)
+        except Category.DoesNotExist:
+            raise CommandError(f'Категория {pk} не найдена')
+
+    def progress(self, done, total):
+        self.stdout.write(f'  {done} / {total}', ending='\r')
@@ -0,0 +1,90 @@
+import itertools
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from catalog.forms import ProductFilterForm
+from catalog.models import Category, Product
+from catalog.search import fts_available
+
+# Признаки полного сканирования таблицы товаров в плане запроса
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'^SCAN catalog_product(?: AS \w+)?$'),
+    'postgresql': re.compile(r'Seq Scan on catalog_product\b'),
+}
+SORT_PATTERNS = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY'),
+    'postgresql': re.compile(r'^\s*(?:->\s*)?Sort\b'),
+}
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для каждой комбинации фильтров/сортировок списка товаров '
+            'и завершается с ошибкой, если какая-то из них сканирует всю таблицу')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Печатать полный план каждого запроса')
+
+    def combinations(self):
+        category = Category.objects.order_by('pk').first()
+        # В пустой базе фильтр по несуществующей категории не прошёл бы проверку формы
+        category_values = [None, category.pk] if category else [None]
+        search_values = [None, 'смартфон'] if fts_available() else [None]
+        sort_values = [sort_by for sort_by, _ in ProductFilterForm.SORT_CHOICES]
+        for q, category_id, min_price, max_price, sort_by in itertools.product(
+            search_values, category_values, [None, '100'], [None, '10000'], sort_values
+        ):
+            data = {'sort_by': sort_by}
+            if q:
+                data['q'] = q
+            if category_id is not None:
+                data['category'] = category_id
+            if min_price:
+                data['min_price'] = min_price
+            if max_price:
+                data['max_price'] = max_price
+            yield data
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            # SQLite: (id, parent, notused, detail); PostgreSQL: (line,)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def handle(self, *args, **options):
+        if connection.vendor not in FULL_SCAN_PATTERNS:
+            raise CommandError(f'EXPLAIN для {connection.vendor} не поддерживается')
+        full_scan = FULL_SCAN_PATTERNS[connection.vendor]
+        sort_step = SORT_PATTERNS[connection.vendor]
+
+        failures = 0
+        for data in self.combinations():
+            form = ProductFilterForm(data)
+            queryset = form.filter_queryset(Product.objects.select_related('category'))
+            if not form.is_valid():
+                raise CommandError(f'Некорректные параметры фильтра: {data}')
+
+            # Страница списка и запрос для подсчёта (тот же WHERE без сортировки)
+            plans = {
+                'page': self.explain(queryset[:10]),
+                'count': self.explain(queryset.order_by().values('pk')),
+            }
+            label = ', '.join(f'{k}={v}' for k, v in data.items())
+            for kind, plan in plans.items():
+                scans = [line for line in plan if full_scan.search(line)]
+                sorts = [line for line in plan if sort_step.search(line)]
+                if scans:
+                    failures += 1
+                    self.stdout.write(self.style.ERROR(f'[{kind}] {label}: полное сканирование'))
+                elif sorts and kind == 'page':
+                    self.stdout.write(self.style.WARNING(f'[{kind}] {label}: сортировка без индекса'))
+                if options['verbose_plans'] or scans:
+                    for line in plan:
+                        self.stdout.write(f'    {line}')
+
+        if failures:
+            raise CommandError(f'Запросов с полным сканированием таблицы: {failures}')
+        self.stdout.write(self.style.SUCCESS('Все комбинации фильтров используют индексы'))
@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from catalog import changes
+
+
+class Command(BaseCommand):
+    help = ('Изменения товаров и категорий после курсора в JSONL (catalog/changes.py); '
+            'без --cursor выводит текущий номер журнала для начала синхронизации')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cursor', type=int, help='Номер последнего полученного изменения')
+        parser.add_argument('--limit', type=int, default=changes.DEFAULT_LIMIT,
+                            help=f'Записей журнала в пачке (по умолчанию {changes.DEFAULT_LIMIT})')
+        parser.add_argument('--all', action='store_true', help='Читать пачки до конца журнала')
+        parser.add_argument('--output', '-o', help='Файл для записи (по умолчанию - stdout)')
+
+    def handle(self, *args, **options):
+        cursor = options['cursor']
+        if cursor is None:
+            self.stdout.write(str(changes.head()))
+            return
+        if cursor < 0 or options['limit'] < 1:
+            raise CommandError('--cursor и --limit: ожидаются неотрицательный номер и положительный размер пачки')
+
+        out = open(options['output'], 'w', encoding='utf-8') if options['output'] else None
+        count = 0
+        try:
+            while True:
+                try:
+                    page = changes.read_changes(cursor, options['limit'])
+                except changes.CursorExpired as e:
+                    raise CommandError(f'{e}; нужна полная выгрузка каталога')
+                for change in page.changes:
+                    line = json.dumps({
+                        'seq': change['pk'],
+                        'type': change['kind'],
+                        'id': change['object_id'],
+                        'action': change['action'],
+                        'changed_at': change['changed_at'],
+                        'data': page.objects.get((change['kind'], change['object_id'])),
+                    }, cls=DjangoJSONEncoder, ensure_ascii=False)
+                    if out:
+                        out.write(line + '\n')
+                    else:
+                        self.stdout.write(line)
+                count += len(page.changes)
+                cursor = page.cursor
+                if not (options['all'] and page.has_more):
+                    break
+        finally:
+            if out:
+                out.close()
+        # Курсор - в stderr, чтобы не смешивать с выгрузкой в stdout
+        self.stderr.write(self.style.SUCCESS(f'Изменений: {count}, курсор: {cursor}'))
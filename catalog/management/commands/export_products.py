@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.exporters import available_formats, export_stream
+from catalog.forms import ProductFilterForm
+from catalog.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка товаров в CSV/JSONL/Parquet с фильтрами как в списке товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', default='csv', choices=['csv', 'jsonl', 'parquet'])
+        parser.add_argument('--output', '-o', help='Файл для записи (по умолчанию - stdout)')
+        parser.add_argument('--q', help='Поисковый запрос')
+        parser.add_argument('--category', type=int, help='ID категории')
+        parser.add_argument('--min-price', help='Минимальная цена')
+        parser.add_argument('--max-price', help='Максимальная цена')
+        parser.add_argument('--sort-by', choices=[value for value, _ in ProductFilterForm.SORT_CHOICES])
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Размер порции чтения из базы')
+
+    def handle(self, *args, **options):
+        file_format = options['format']
+        if file_format not in available_formats():
+            raise CommandError(f'Формат "{file_format}" недоступен (для Parquet установите pyarrow)')
+        if file_format == 'parquet' and not options['output']:
+            raise CommandError('Для Parquet укажите --output')
+
+        data = {
+            'q': options['q'],
+            'category': options['category'],
+            'min_price': options['min_price'],
+            'max_price': options['max_price'],
+            'sort_by': options['sort_by'],
+        }
+        form = ProductFilterForm({k: v for k, v in data.items() if v is not None})
+        if not form.is_valid():
+            raise CommandError(f'Некорректные фильтры: {form.errors.as_text()}')
+
+        queryset = form.filter_queryset(Product.objects.all())
+        chunks = export_stream(queryset, file_format, chunk_size=options['chunk_size'])
+
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        mode = 'wb' if file_format == 'parquet' else 'w'
+        encoding = None if file_format == 'parquet' else 'utf-8'
+        with open(options['output'], mode, encoding=encoding, newline='' if encoding else None) as f:
+            for chunk in chunks:
+                f.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Выгрузка записана в {options["output"]}'))
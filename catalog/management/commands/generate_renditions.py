@@ -0,0 +1,74 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from catalog import bulk
+from catalog.models import Product
+from catalog.renditions import generate_renditions
+
+
+def _init_worker():
+    # При запуске процессов через spawn Django в них ещё не настроен
+    django.setup()
+
+
+def _generate(image_name, force):
+    try:
+        return image_name, len(generate_renditions(image_name, force=force)), None
+    except Exception as e:  # битый или отсутствующий файл не должен останавливать пакет
+        return image_name, 0, str(e)
+
+
+def _windows(iterable, size):
+    window = []
+    for item in iterable:
+        window.append(item)
+        if len(window) >= size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии для уже загруженных изображений товаров (пул процессов)'
+    window_size = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Число процессов (по умолчанию - число CPU)')
+        parser.add_argument('--force', action='store_true', help='Пересоздать существующие копии')
+
+    def handle(self, *args, **options):
+        # Соединения с базой не должны наследоваться дочерними процессами
+        connections.close_all()
+
+        started = time.monotonic()
+        done = files = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            names = (
+                Product.objects.exclude(image='').exclude(image__isnull=True)
+                .order_by().values_list('image', flat=True).distinct().iterator()
+            )
+            # Отправляем задачи окнами, чтобы не держать в памяти список всех изображений
+            for window in _windows(names, self.window_size):
+                results = pool.map(_generate, window, [options['force']] * len(window), chunksize=16)
+                ready = []
+                for image_name, created, error in results:
+                    done += 1
+                    files += created
+                    if created:
+                        ready.append(image_name)
+                    if error:
+                        failed += 1
+                        self.stderr.write(f'{image_name}: {error}')
+                # Закэшированные карточки этих товаров ещё показывают оригинал
+                bulk.touch_products_by_image(ready)
+                self.stdout.write(f'  обработано изображений: {done}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {done}, создано файлов: {files}, ошибок: {failed} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
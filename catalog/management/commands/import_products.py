@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importers import IMPORT_FORMATS, ImportAborted, ProductImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Потоковый импорт товаров из CSV/JSONL (колонки: name, description, price, category)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу CSV или JSONL')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Формат файла (по умолчанию - по расширению)')
+        parser.add_argument('--delimiter', default=',', help='Разделитель CSV')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пачки bulk_create')
+        parser.add_argument('--upsert', action='store_true',
+                            help='Обновлять существующие товары по ключу (категория, название)')
+        parser.add_argument('--create-categories', action='store_true',
+                            help='Создавать отсутствующие категории')
+        parser.add_argument('--max-errors', type=int, default=100,
+                            help='Остановить импорт после указанного числа некорректных строк')
+
+    def handle(self, *args, **options):
+        importer = ProductImporter(
+            batch_size=options['batch_size'],
+            upsert=options['upsert'],
+            create_categories=options['create_categories'],
+            max_errors=options['max_errors'],
+            progress=self.report_progress,
+        )
+        self.progress_every = max(1, 50000 // options['batch_size'])
+        self.flushes = 0
+
+        rows = read_rows(options['path'], options['format'], options['delimiter'])
+        try:
+            importer.run(rows)
+        except OSError as e:
+            raise CommandError(f'Не удалось прочитать файл: {e}')
+        except ImportAborted as e:
+            self.print_errors(importer)
+            raise CommandError(str(e))
+
+        self.print_errors(importer)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {importer.processed}, создано: {importer.created}, '
+            f'обновлено: {importer.updated}, ошибок: {importer.error_count} '
+            f'({importer.rate:.0f} строк/с)'
+        ))
+
+    def report_progress(self, importer):
+        self.flushes += 1
+        if self.flushes % self.progress_every == 0:
+            self.stdout.write(f'  {importer.processed} строк, {importer.rate:.0f} строк/с')
+
+    def print_errors(self, importer):
+        for line_no, errors in importer.errors[:20]:
+            self.stderr.write(f'Строка {line_no}: {errors}')
+        if importer.error_count > 20:
+            self.stderr.write(f'... и ещё {importer.error_count - 20} ошибок')
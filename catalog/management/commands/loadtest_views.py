@@ -0,0 +1,93 @@
+import asyncio
+import math
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+
+from catalog.models import Category, Product
+
+# Пары (синхронное, асинхронное) представлений; аргументы URL подставляются из базы
+VIEW_PAIRS = {
+    'list': ('product_list', 'async_product_list', None),
+    'detail': ('product_detail', 'async_product_detail', 'product'),
+    'category': ('category_products', 'async_category_products', 'category'),
+    'analytics': ('analytics', 'async_analytics', None),
+    'api_list': ('api_product_list', 'async_api_product_list', None),
+    'api_detail': ('api_product_detail', 'async_api_product_detail', 'product'),
+    'api_analytics': ('api_analytics', 'async_api_analytics', None),
+}
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест под ASGI (в процессе, через AsyncClient): '
+            'пропускная способность синхронных и асинхронных представлений при фиксированной конкурентности')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--views', nargs='+', choices=sorted(VIEW_PAIRS), default=sorted(VIEW_PAIRS))
+        parser.add_argument('--concurrency', type=int, default=20, help='Одновременных запросов (по умолчанию 20)')
+        parser.add_argument('--requests', type=int, default=500, help='Запросов на представление (по умолчанию 500)')
+        parser.add_argument('--no-cache', action='store_true', help='Отключить кэш каталога на время теста')
+
+    def get_url(self, name, arg):
+        if arg is None:
+            return reverse(name)
+        model = Product if arg == 'product' else Category
+        pk = model.objects.order_by('pk').values_list('pk', flat=True).first()
+        if pk is None:
+            raise CommandError(f'Для {name} в базе нет объектов {model._meta.verbose_name_plural}')
+        return reverse(name, args=[pk])
+
+    async def run_load(self, url, concurrency, total):
+        client = AsyncClient()
+        latencies = []
+        errors = 0
+        remaining = iter(range(total))
+
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                started = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'rps': total / elapsed,
+            'p50': statistics.median(latencies) * 1000,
+            'p95': latencies[math.ceil(len(latencies) * 0.95) - 1] * 1000,
+            'errors': errors,
+        }
+
+    def handle(self, *args, **options):
+        # AsyncClient обращается к хосту testserver, как в тестах
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if options['no_cache']:
+            overrides['CATALOG_CACHE_ENABLED'] = False
+        settings_override = override_settings(**overrides)
+        settings_override.enable()
+        try:
+            urls = {
+                key: (self.get_url(sync_name, arg), self.get_url(async_name, arg))
+                for key, (sync_name, async_name, arg) in VIEW_PAIRS.items()
+                if key in options['views']
+            }
+            self.stdout.write(f'Конкурентность {options["concurrency"]}, запросов на представление {options["requests"]}')
+            self.stdout.write(f'{"представление":<15}{"режим":<7}{"запр/с":>9}{"p50, мс":>10}{"p95, мс":>10}{"ошибок":>8}')
+            for key, pair in urls.items():
+                for mode, url in zip(('sync', 'async'), pair):
+                    result = asyncio.run(self.run_load(url, options['concurrency'], options['requests']))
+                    self.stdout.write(
+                        f'{key:<15}{mode:<7}{result["rps"]:>9.1f}{result["p50"]:>10.1f}'
+                        f'{result["p95"]:>10.1f}{result["errors"]:>8}'
+                    )
+        finally:
+            settings_override.disable()
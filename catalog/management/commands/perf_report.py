@@ -0,0 +1,80 @@
+import json
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from catalog import perf
+from catalog.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = ('Отчёт по метрикам представлений: число SQL-запросов, время SQL, шаблона и ответа, '
+            'подозрения на N+1. Берёт данные с работающего сервера (--url) или прогоняет '
+            'страницы каталога в этом процессе')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Адрес внутренней страницы метрик, например http://127.0.0.1:8000/internal/perf/')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Страница для прогона в процессе (можно несколько раз); по умолчанию - основные страницы')
+        parser.add_argument('--repeat', type=int, default=5, help='Сколько раз запрашивать каждую страницу (по умолчанию 5)')
+        parser.add_argument('--json', action='store_true', help='Вывести метрики в JSON')
+
+    def default_paths(self):
+        paths = [reverse('home'), reverse('product_list'), reverse('category_list'),
+                 reverse('analytics'), reverse('api_product_list')]
+        product_pk = Product.objects.values_list('pk', flat=True).first()
+        if product_pk:
+            paths.append(reverse('product_detail', args=[product_pk]))
+        category_pk = Category.objects.values_list('pk', flat=True).first()
+        if category_pk:
+            paths.append(reverse('category_products', args=[category_pk]))
+        return paths
+
+    def collect_local(self, paths, repeat):
+        perf.registry.reset()
+        client = Client()
+        # Тестовый клиент обращается к хосту testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for path in paths:
+                for _ in range(repeat):
+                    client.get(path)
+        return perf.registry.snapshot()
+
+    def collect_remote(self, url):
+        try:
+            with urlopen(url, timeout=10) as response:
+                return json.load(response)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Не удалось получить метрики с {url}: {e}')
+
+    def handle(self, *args, **options):
+        if options['url']:
+            snapshot = self.collect_remote(options['url'])
+        else:
+            snapshot = self.collect_local(options['paths'] or self.default_paths(), options['repeat'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(snapshot, ensure_ascii=False, indent=2))
+            return
+        if not snapshot:
+            self.stdout.write('Метрик пока нет')
+            return
+
+        self.stdout.write(
+            f'{"представление":<28}{"запросов":>9}{"SQL p50":>9}{"SQL max":>9}'
+            f'{"SQL мс p95":>12}{"шаблон мс p95":>15}{"ответ мс p50":>14}{"ответ мс p95":>14}'
+        )
+        for name, metrics in snapshot.items():
+            self.stdout.write(
+                f'{name:<28}{metrics["requests"]:>9}{metrics["queries"]["p50"]:>9g}{metrics["queries"]["max"]:>9g}'
+                f'{metrics["sql_ms"]["p95"]:>12.1f}{metrics["template_ms"]["p95"]:>15.1f}'
+                f'{metrics["latency_ms"]["p50"]:>14.1f}{metrics["latency_ms"]["p95"]:>14.1f}'
+            )
+        for name, metrics in snapshot.items():
+            for item in metrics['nplusone']:
+                self.stdout.write(self.style.WARNING(
+                    f'Возможный N+1 в {name} ({item["requests"]} ответов): {item["sql"]}'
+                ))
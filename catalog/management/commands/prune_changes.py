@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from catalog import changes
+
+
+class Command(BaseCommand):
+    help = 'Удаляет старые записи журнала изменений каталога (по умолчанию старше CATALOG_CHANGES_RETENTION_DAYS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Хранить записи за последние N дней')
+
+    def handle(self, *args, **options):
+        deleted = changes.prune(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей журнала: {deleted}'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.facets import check_price_facets
+from catalog.stats import check_category_stats, rebuild_category_stats
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает материализованную статистику категорий и индекс фасетов цен '
+            'или проверяет их на расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить статистику; завершиться с ошибкой при расхождениях',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = check_category_stats() + check_price_facets()
+            for category_id, field, actual, expected in drift:
+                self.stdout.write(f'Категория {category_id}: {field} = {actual}, ожидалось {expected}')
+            if drift:
+                raise CommandError(f'Найдено расхождений: {len(drift)}')
+            self.stdout.write(self.style.SUCCESS('Статистика категорий и фасеты цен актуальны'))
+            return
+
+        count = rebuild_category_stats()
+        self.stdout.write(self.style.SUCCESS(f'Статистика и фасеты перестроены для {count} категорий'))
@@ -0,0 +1,103 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from catalog.benchmarks.cases import build_cases
+from catalog.benchmarks.data import generate_catalog, parse_size, reset_catalog
+from catalog.benchmarks.runner import (
+    BenchmarkRunner, compare_results, environment, load_results, save_results, write_import_file,
+)
+from catalog.models import Product
+
+
+class Command(BaseCommand):
+    help = ('Бенчмарки горячих путей каталога на тестовой базе с синтетическими данными; '
+            'результаты пишутся в JSON, два прогона можно сравнить')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', default='10k', help='Число товаров: 10k, 100k, 1m или число (по умолчанию 10k)')
+        parser.add_argument('--categories', type=int, default=50, help='Число категорий (по умолчанию 50)')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора данных (по умолчанию 42)')
+        parser.add_argument('--repeat', type=int, default=5, help='Прогонов каждого замера (по умолчанию 5)')
+        parser.add_argument('--only', help='Выполнить только замеры, в имени которых есть эта подстрока')
+        parser.add_argument('--output', '-o', help='Файл для результатов в JSON')
+        parser.add_argument('--compare', metavar='OLD_JSON', help='Сравнить результаты с прошлым прогоном')
+        parser.add_argument('--diff', nargs=2, metavar=('OLD_JSON', 'NEW_JSON'),
+                            help='Только сравнить два сохранённых прогона, без замеров')
+        parser.add_argument('--with-cache', action='store_true', help='Не отключать кэш каталога')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Не удалять тестовую базу (для SQLite нужен DATABASES TEST NAME)')
+
+    def handle(self, *args, **options):
+        if options['diff']:
+            self.print_diff(load_results(options['diff'][0]), load_results(options['diff'][1]))
+            return
+
+        products = parse_size(options['size'])
+        overrides = {
+            # Тестовый клиент обращается к хосту testserver
+            'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'],
+            'CATALOG_CACHE_ENABLED': options['with_cache'],
+        }
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            with override_settings(**overrides):
+                results = self.run_benchmarks(products, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        meta = environment(products, options['categories'], options['seed'])
+        if options['output']:
+            save_results(options['output'], meta, results)
+            self.stdout.write(f'Результаты записаны в {options["output"]}')
+        if options['compare']:
+            self.print_diff(load_results(options['compare']), {'meta': meta, 'results': results})
+
+        failed = [name for name, result in results.items() if not result['ok']]
+        if failed:
+            raise CommandError(f'Замеров с превышением бюджета запросов или ошибкой: {len(failed)}')
+
+    def run_benchmarks(self, products, options):
+        if Product.objects.count() != products:
+            reset_catalog()
+            self.stdout.write(f'Генерация {products} товаров...')
+            generate_catalog(products, options['categories'], options['seed'],
+                             progress=lambda done: self.stdout.write(f'  {done}', ending='\r'))
+            self.stdout.write('')
+
+        fd, import_path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        try:
+            write_import_file(import_path, 1000)
+            cases = build_cases(import_path)
+            if options['only']:
+                cases = [case for case in cases if options['only'] in case.name]
+            runner = BenchmarkRunner(Client(), repeat=options['repeat'])
+            self.stdout.write(f'{"замер":<36}{"медиана, мс":>12}{"p95, мс":>10}{"запросов":>10}')
+            return runner.run(cases, progress=self.print_result)
+        finally:
+            os.remove(import_path)
+
+    def print_result(self, name, result):
+        if 'error' in result:
+            self.stdout.write(self.style.ERROR(f'{name:<36}{result["error"]}'))
+            return
+        line = (f'{name:<36}{result["median_ms"]:>12.1f}{result["p95_ms"]:>10.1f}'
+                f'{result["queries"]:>6} / {result["max_queries"]:<3}')
+        self.stdout.write(line if result['ok'] else self.style.ERROR(line + ' превышен бюджет запросов'))
+
+    def print_diff(self, old, new):
+        self.stdout.write(f'{"замер":<36}{"было, мс":>10}{"стало, мс":>11}{"изменение":>11}{"запросов":>12}')
+        for name, old_ms, new_ms, change, old_queries, new_queries in compare_results(old, new):
+            old_text = f'{old_ms:.1f}' if old_ms is not None else '-'
+            new_text = f'{new_ms:.1f}' if new_ms is not None else '-'
+            change_text = f'{change:+.0f}%' if change is not None else ''
+            line = (f'{name:<36}{old_text:>10}{new_text:>11}{change_text:>11}'
+                    f'{old_queries if old_queries is not None else "-":>6} -> {new_queries if new_queries is not None else "-"}')
+            if change is not None and change > 10:
+                line = self.style.WARNING(line)
+            self.stdout.write(line)
@@ -0,0 +1,64 @@
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from catalog.tasks import claim_jobs, run_job
+
+
+def _init_process():
+    # При запуске процессов через spawn Django в них ещё не настроен
+    django.setup()
+
+
+def _run(pk):
+    # Соединения потоков пула живут между задачами, как между запросами веб-сервера
+    close_old_connections()
+    try:
+        return run_job(pk)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Обработчик фоновых задач каталога (catalog/tasks.py): пул потоков или процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Размер пула (по умолчанию 4)')
+        parser.add_argument('--processes', action='store_true', help='Пул процессов вместо потоков')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Пауза между опросами пустой очереди, с (по умолчанию 1)')
+        parser.add_argument('--once', action='store_true', help='Выполнить готовые задачи и завершиться')
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        workers = options['workers']
+        if options['processes']:
+            # Соединения с базой не должны наследоваться дочерними процессами
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_process)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers)
+
+        done = failed = 0
+        with pool:
+            try:
+                while True:
+                    # Пачка по размеру пула: задачи не ждут в памяти обработчика, пока их могут взять другие
+                    ids = claim_jobs(worker, workers)
+                    if not ids:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+                    for ok in pool.map(_run, ids):
+                        done += ok
+                        failed += not ok
+                    self.stdout.write(f'  выполнено: {done}, с ошибкой: {failed}')
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}, с ошибкой: {failed}'))
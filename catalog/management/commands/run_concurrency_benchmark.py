@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from catalog.benchmarks.concurrency import CONFIGURATIONS, run_concurrency_benchmark
+
+
+class Command(BaseCommand):
+    help = ('Конкурентные чтения и записи в SQLite из нескольких потоков: пропускная способность, '
+            'задержки и число ошибок "database is locked" для настроек по умолчанию и для WAL + BEGIN IMMEDIATE')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--configs', nargs='+', choices=sorted(CONFIGURATIONS), default=list(CONFIGURATIONS))
+        parser.add_argument('--threads', type=int, default=8, help='Потоков (по умолчанию 8)')
+        parser.add_argument('--operations', type=int, default=200, help='Операций на поток (по умолчанию 200)')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Доля записей (по умолчанию 0.2)')
+        parser.add_argument('--products', type=int, default=2000, help='Товаров в базе (по умолчанию 2000)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Потоков {options["threads"]}, операций на поток {options["operations"]}, '
+                          f'доля записей {options["write_ratio"]:.0%}')
+        self.stdout.write(f'{"конфигурация":<14}{"опер/с":>9}{"p50, мс":>10}{"p95, мс":>10}'
+                          f'{"locked чт.":>12}{"locked зап.":>13}{"доля":>8}')
+        results = run_concurrency_benchmark(
+            options['configs'], products=options['products'], threads=options['threads'],
+            operations=options['operations'], write_ratio=options['write_ratio'], seed=options['seed'],
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<14}{result["ops"]:>9.1f}{result["p50_ms"]:>10.1f}{result["p95_ms"]:>10.1f}'
+                f'{result["locked_reads"]:>12}{result["locked_writes"]:>13}{result["locked_share"]:>7.1f}%'
+            )
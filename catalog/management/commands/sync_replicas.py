@@ -0,0 +1,29 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from catalog.routers import PRIMARY
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик (CATALOG_DB_REPLICAS) через backup API; '
+            'для локальной проверки чтения с реплик')
+
+    def handle(self, *args, **options):
+        replicas = settings.CATALOG_READ_REPLICAS
+        if not replicas:
+            raise CommandError('Реплики не настроены: укажите CATALOG_DB_REPLICAS')
+        primary = connections[PRIMARY]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Реплики PostgreSQL обновляет репликация сервера')
+        primary.ensure_connection()
+        for alias in replicas:
+            connections[alias].close()
+            target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: {connections[alias].settings_dict["NAME"]}')
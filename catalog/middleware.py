@@ -0,0 +1,119 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+
+from . import perf, routers
+
+logger = logging.getLogger(__name__)
+
+
+class PerfMiddleware:
+    """
+    Число SQL-запросов, время SQL, время отрисовки шаблона и полное время
+    ответа по имени URL (catalog/perf.py). Работает и под WSGI, и под ASGI.
+
+    Время шаблона учитывается для TemplateResponse: отрисовка идёт после
+    process_template_response, окончание отмечает post-render callback.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not perf.is_enabled():
+            return self.get_response(request)
+        started, stats, token = self.start()
+        # Соединения этого потока могли открыться до подключения сигнала
+        for connection in connections.all():
+            perf.install(connection)
+        try:
+            response = self.get_response(request)
+        finally:
+            perf.finish_request(token)
+        self.finish(request, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        if not perf.is_enabled():
+            return await self.get_response(request)
+        started, stats, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            perf.finish_request(token)
+        self.finish(request, stats, started)
+        return response
+
+    def start(self):
+        stats, token = perf.start_request()
+        return time.perf_counter(), stats, token
+
+    def finish(self, request, stats, started):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match and match.view_name else '<unresolved>'
+        suspects = perf.registry.record(view_name, stats, time.perf_counter() - started)
+        for sql in suspects:
+            logger.warning('Возможный N+1 в %s: %s', view_name, sql)
+
+    def process_template_response(self, request, response):
+        stats = perf.current_stats()
+        if stats is not None:
+            render_started = time.perf_counter()
+
+            def rendered(response):
+                stats.template_time += time.perf_counter() - render_started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+
+class ReplicaMiddleware:
+    """
+    Разрешает чтение каталога с реплик для GET/HEAD без cookie недавней
+    записи; после запроса, который что-то записал, ставит эту cookie
+    (catalog/routers.py).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state, token = routers.start_request(self.use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.finish_request(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state, token = routers.start_request(self.use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.finish_request(token)
+        return self.finish(state, response)
+
+    def use_replica(self, request):
+        return request.method in ('GET', 'HEAD') and routers.STICKY_COOKIE not in request.COOKIES
+
+    def finish(self, state, response):
+        if state.wrote:
+            response.set_cookie(routers.STICKY_COOKIE, '1', max_age=routers.get_sticky_seconds(),
+                                httponly=True, samesite='Lax')
+        return response
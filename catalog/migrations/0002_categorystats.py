@@ -0,0 +1,52 @@
+# Generated by Django 4.2.26 on 2026-10-17 23:28
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, Min, Max
+import django.db.models.deletion
+
+
+def fill_category_stats(apps, schema_editor):
+    """Заполняет статистику по уже существующим товарам"""
+    Category = apps.get_model('catalog', 'Category')
+    CategoryStats = apps.get_model('catalog', 'CategoryStats')
+    rows = Category.objects.annotate(
+        product_count=Count('products'),
+        total_value=Sum('products__price'),
+        min_price=Min('products__price'),
+        max_price=Max('products__price'),
+    ).values('pk', 'product_count', 'total_value', 'min_price', 'max_price').order_by()
+    CategoryStats.objects.bulk_create([
+        CategoryStats(
+            category_id=row['pk'],
+            product_count=row['product_count'],
+            total_value=row['total_value'] or 0,
+            min_price=row['min_price'],
+            max_price=row['max_price'],
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryStats',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='catalog.category', verbose_name='Категория')),
+                ('product_count', models.PositiveIntegerField(default=0, verbose_name='Количество товаров')),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Общая стоимость')),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Мин. цена')),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Макс. цена')),
+            ],
+            options={
+                'verbose_name': 'Статистика категории',
+                'verbose_name_plural': 'Статистика категорий',
+            },
+        ),
+        migrations.RunPython(fill_category_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Полнотекстовый индекс товаров на SQLite FTS5 (на других СУБД не создаётся)
+
+from django.db import migrations
+
+
+def _normalized(column):
+    # Буква ё индексируется как е (remove_diacritics в unicode61 её не сворачивает)
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE catalog_product_fts USING fts5(
+        name,
+        description,
+        content='catalog_product',
+        content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2",
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER catalog_product_fts_ai AFTER INSERT ON catalog_product BEGIN
+        INSERT INTO catalog_product_fts(rowid, name, description)
+        VALUES (new.id, {_normalized('new.name')}, {_normalized('new.description')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER catalog_product_fts_ad AFTER DELETE ON catalog_product BEGIN
+        INSERT INTO catalog_product_fts(catalog_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, {_normalized('old.name')}, {_normalized('old.description')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER catalog_product_fts_au AFTER UPDATE OF name, description ON catalog_product BEGIN
+        INSERT INTO catalog_product_fts(catalog_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, {_normalized('old.name')}, {_normalized('old.description')});
+        INSERT INTO catalog_product_fts(rowid, name, description)
+        VALUES (new.id, {_normalized('new.name')}, {_normalized('new.description')});
+    END
+    """,
+    f"""
+    INSERT INTO catalog_product_fts(rowid, name, description)
+    SELECT id, {_normalized('name')}, {_normalized('description')} FROM catalog_product
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS catalog_product_fts_ai',
+    'DROP TRIGGER IF EXISTS catalog_product_fts_ad',
+    'DROP TRIGGER IF EXISTS catalog_product_fts_au',
+    'DROP TABLE IF EXISTS catalog_product_fts',
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_product_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.26 on 2026-10-17 23:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_product_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('change_count', models.PositiveIntegerField(default=0, verbose_name='Изменений цены')),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Сумма цен')),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Мин. цена')),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Макс. цена')),
+                ('day', models.DateField(verbose_name='День')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.category', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Сводка цен за день',
+                'verbose_name_plural': 'Сводки цен за день',
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Прежняя цена')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата изменения')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.category', verbose_name='Категория')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='catalog.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Изменение цены',
+                'verbose_name_plural': 'История цен',
+                'ordering': ['-changed_at'],
+                'indexes': [models.Index(fields=['product', 'changed_at'], name='pricehistory_product_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyPriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('change_count', models.PositiveIntegerField(default=0, verbose_name='Изменений цены')),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Сумма цен')),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Мин. цена')),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Макс. цена')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.category', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Сводка цен за месяц',
+                'verbose_name_plural': 'Сводки цен за месяц',
+                'indexes': [models.Index(fields=['month'], name='monthlypricerollup_month_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlypricerollup',
+            constraint=models.UniqueConstraint(fields=('category', 'month'), name='monthlypricerollup_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailypricerollup',
+            constraint=models.UniqueConstraint(fields=('category', 'day'), name='dailypricerollup_unique'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.26 on 2026-10-18 00:01
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_price_facets(apps, schema_editor):
+    """Заполняет индекс фасетов по уже существующим товарам"""
+    from catalog.facets import get_price_edges, index_bucket_count, index_bucket_expression
+
+    Category = apps.get_model('catalog', 'Category')
+    PriceFacet = apps.get_model('catalog', 'PriceFacet')
+    Product = apps.get_model('catalog', 'Product')
+    edges = get_price_edges()
+    counts = {
+        (row['category_id'], row['bucket']): row['count']
+        for row in Product.objects.values('category_id', bucket=index_bucket_expression(edges))
+        .annotate(count=Count('pk')).order_by()
+    }
+    PriceFacet.objects.bulk_create([
+        PriceFacet(category_id=category_id, bucket=bucket, product_count=counts.get((category_id, bucket), 0))
+        for category_id in Category.objects.values_list('pk', flat=True)
+        for bucket in range(index_bucket_count(edges))
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_price_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.PositiveSmallIntegerField(verbose_name='Ценовой диапазон')),
+                ('product_count', models.PositiveIntegerField(default=0, verbose_name='Количество товаров')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_facets', to='catalog.category', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Фасет цены',
+                'verbose_name_plural': 'Фасеты цен',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pricefacet',
+            constraint=models.UniqueConstraint(fields=('category', 'bucket'), name='pricefacet_unique'),
+        ),
+        migrations.RunPython(fill_price_facets, migrations.RunPython.noop),
+    ]
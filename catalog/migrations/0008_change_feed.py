@@ -0,0 +1,36 @@
+# Generated by Django 4.2.26 on 2026-10-18 00:22
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'Товар'), ('category', 'Категория')], max_length=10, verbose_name='Тип объекта')),
+                ('object_id', models.BigIntegerField(verbose_name='ID объекта')),
+                ('action', models.CharField(choices=[('created', 'Создание'), ('updated', 'Изменение'), ('deleted', 'Удаление')], max_length=10, verbose_name='Действие')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение каталога',
+                'verbose_name_plural': 'Журнал изменений каталога',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at'], name='product_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogchange',
+            index=models.Index(fields=['changed_at'], name='catalogchange_changed_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.26 on 2026-10-18 00:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChangePrune',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pruned_through', models.BigIntegerField(verbose_name='Последний удалённый номер')),
+                ('deleted', models.PositiveIntegerField(default=0, verbose_name='Удалено записей')),
+                ('pruned_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата очистки')),
+            ],
+            options={
+                'verbose_name': 'Очистка журнала изменений',
+                'verbose_name_plural': 'Очистки журнала изменений',
+            },
+        ),
+    ]
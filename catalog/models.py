@@ -50,6 +50,17 @@ class Product(models.Model):
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
         ordering = ['-created_at']
+        # Индексы под комбинации фильтров/сортировок ProductFilterForm.
+        # Индексы по возрастанию: обратный проход даёт порядок "-поле, -id" для keyset-пагинации.
+        indexes = [
+            models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+            models.Index(fields=['category', 'name'], name='product_category_name_idx'),
+            models.Index(fields=['category', 'created_at'], name='product_category_created_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),
+            models.Index(fields=['name'], name='product_name_idx'),
+            models.Index(fields=['created_at'], name='product_created_idx'),
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.price} руб."
@@ -62,3 +73,231 @@ class Product(models.Model):
     #     from django.core.exceptions import ValidationError
     #     if self.price < 0:
     #         raise ValidationError({'price': 'Цена не может быть отрицательной'})
+
+
+class CategoryStats(models.Model):
+    """Материализованная статистика по категории (обновляется инкрементально)"""
+    category = models.OneToOneField(
+        Category,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name="Категория"
+    )
+    product_count = models.PositiveIntegerField(default=0, verbose_name="Количество товаров")
+    total_value = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        verbose_name="Общая стоимость"
+    )
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Мин. цена")
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Макс. цена")
+
+    class Meta:
+        verbose_name = "Статистика категории"
+        verbose_name_plural = "Статистика категорий"
+
+    def __str__(self):
+        return f"{self.category_id}: {self.product_count} товаров"
+
+    @property
+    def avg_price(self):
+        if not self.product_count:
+            return None
+        return self.total_value / self.product_count
+
+
+class PriceFacet(models.Model):
+    """
+    Индекс фасетов: число товаров категории в ценовом диапазоне bucket
+    (границы - CATALOG_PRICE_BUCKETS), обновляется вместе с CategoryStats
+    """
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='price_facets',
+        verbose_name="Категория"
+    )
+    bucket = models.PositiveSmallIntegerField(verbose_name="Ценовой диапазон")
+    product_count = models.PositiveIntegerField(default=0, verbose_name="Количество товаров")
+
+    class Meta:
+        verbose_name = "Фасет цены"
+        verbose_name_plural = "Фасеты цен"
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'bucket'], name='pricefacet_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id} [{self.bucket}]: {self.product_count}"
+
+
+class PriceHistory(models.Model):
+    """Журнал цен товара: строка добавляется при создании товара и при каждом изменении цены"""
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='price_history',
+        verbose_name="Товар"
+    )
+    # Категория на момент изменения: сводки строятся по ней
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Категория"
+    )
+    old_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Прежняя цена")
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена")
+    changed_at = models.DateTimeField(default=timezone.now, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Изменение цены"
+        verbose_name_plural = "История цен"
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['product', 'changed_at'], name='pricehistory_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.old_price} -> {self.price}"
+
+
+class PriceRollup(models.Model):
+    """Сводка цен категории за период (обновляется инкрементально вместе с журналом)"""
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+', verbose_name="Категория")
+    change_count = models.PositiveIntegerField(default=0, verbose_name="Изменений цены")
+    price_sum = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Сумма цен")
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Мин. цена")
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Макс. цена")
+
+    class Meta:
+        abstract = True
+
+    @property
+    def avg_price(self):
+        if not self.change_count:
+            return None
+        return self.price_sum / self.change_count
+
+
+class DailyPriceRollup(PriceRollup):
+    day = models.DateField(verbose_name="День")
+
+    class Meta:
+        verbose_name = "Сводка цен за день"
+        verbose_name_plural = "Сводки цен за день"
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'day'], name='dailypricerollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id} {self.day}: {self.change_count}"
+
+
+class MonthlyPriceRollup(PriceRollup):
+    # Первое число месяца
+    month = models.DateField(verbose_name="Месяц")
+
+    class Meta:
+        verbose_name = "Сводка цен за месяц"
+        verbose_name_plural = "Сводки цен за месяц"
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'month'], name='monthlypricerollup_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['month'], name='monthlypricerollup_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id} {self.month:%Y-%m}: {self.change_count}"
+
+
+class Job(models.Model):
+    """Фоновая задача (catalog/tasks.py); выполненные удаляются, упавшие после всех попыток остаются"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name="Задача")
+    # Пока задача с таким ключом ждёт в очереди, повторная не добавляется
+    key = models.CharField(max_length=255, blank=True, verbose_name="Ключ")
+    args = models.JSONField(default=list, blank=True, verbose_name="Аргументы")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="Статус")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="Выполнить после")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взята в работу")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="Обработчик")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'], condition=models.Q(status='pending') & ~models.Q(key=''), name='job_pending_key_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} {self.key} [{self.status}]"
+
+
+class CatalogChange(models.Model):
+    """
+    Журнал изменений товаров и категорий для синхронизации (catalog/changes.py):
+    строка на каждое создание, изменение и удаление; id - номер в журнале
+    """
+    PRODUCT = 'product'
+    CATEGORY = 'category'
+    KIND_CHOICES = [
+        (PRODUCT, 'Товар'),
+        (CATEGORY, 'Категория'),
+    ]
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [
+        (CREATED, 'Создание'),
+        (UPDATED, 'Изменение'),
+        (DELETED, 'Удаление'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name="Тип объекта")
+    object_id = models.BigIntegerField(verbose_name="ID объекта")
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name="Действие")
+    changed_at = models.DateTimeField(default=timezone.now, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Изменение каталога"
+        verbose_name_plural = "Журнал изменений каталога"
+        indexes = [
+            models.Index(fields=['changed_at'], name='catalogchange_changed_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind} {self.object_id} {self.action}"
+
+
+class CatalogChangePrune(models.Model):
+    """Очистка журнала изменений: записи с номерами до pruned_through включительно удалены"""
+    pruned_through = models.BigIntegerField(verbose_name="Последний удалённый номер")
+    deleted = models.PositiveIntegerField(default=0, verbose_name="Удалено записей")
+    pruned_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата очистки")
+
+    class Meta:
+        verbose_name = "Очистка журнала изменений"
+        verbose_name_plural = "Очистки журнала изменений"
+
+    def __str__(self):
+        return f"#{self.pruned_through} ({self.pruned_at:%Y-%m-%d})"
@@ -0,0 +1,285 @@
+"""
+Keyset (курсорная) пагинация для списков товаров.
+
+В отличие от стандартного Paginator не выполняет COUNT(*) и не использует
+OFFSET: следующая страница выбирается условием по ключу сортировки
+последней строки и её pk, поэтому страница N стоит столько же, сколько первая.
+"""
+import asyncio
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    """Курсор не удалось разобрать или он не подходит к текущей сортировке"""
+
+
+def encode_cursor(payload):
+    """Упаковывает данные курсора в непрозрачный токен"""
+    raw = json.dumps(payload, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeError):
+        raise InvalidCursor(token)
+    if not isinstance(payload, dict):
+        raise InvalidCursor(token)
+    return payload
+
+
+class CursorPage:
+    """Страница keyset-пагинации (аналог django.core.paginator.Page без номеров)"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Пагинатор по ключу сортировки.
+
+    ordering - одно из значений ProductFilterForm.SORT_CHOICES ('name', '-price', ...).
+    Порядок всегда дополняется pk в том же направлении, чтобы ключ был уникальным.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = ordering
+        self.field_name = ordering.lstrip('-')
+        self.descending = ordering.startswith('-')
+        self.field = queryset.model._meta.get_field(self.field_name)
+        self.pk_name = queryset.model._meta.pk.attname
+
+    def _is_descending(self, backwards):
+        return self.descending != backwards
+
+    def _order_by(self, backwards):
+        prefix = '-' if self._is_descending(backwards) else ''
+        return [prefix + self.field_name, prefix + self.pk_name]
+
+    def _seek(self, value, pk, backwards):
+        """Условие "строго после (value, pk)" в направлении обхода"""
+        lookup = 'lt' if self._is_descending(backwards) else 'gt'
+        return (
+            Q(**{f'{self.field_name}__{lookup}': value})
+            | Q(**{self.field_name: value, f'{self.pk_name}__{lookup}': pk})
+        )
+
+    def _get(self, row, name):
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
+
+    def _make_cursor(self, row, direction):
+        return encode_cursor({
+            'o': self.ordering,
+            'd': direction,
+            'v': self._get(row, self.field_name),
+            'k': self._get(row, self.pk_name),
+        })
+
+    def _parse_cursor(self, token):
+        payload = decode_cursor(token)
+        if payload.get('o') != self.ordering or payload.get('d') not in ('n', 'p'):
+            raise InvalidCursor(token)
+        try:
+            value = self.field.to_python(payload['v'])
+            pk = int(payload['k'])
+        except (KeyError, TypeError, ValueError, ValidationError):
+            raise InvalidCursor(token)
+        return value, pk, payload['d'] == 'p'
+
+    def get_page_queryset(self, cursor=None):
+        """
+        Возвращает (queryset, backwards, has_cursor) для запрошенной страницы.
+        queryset выбирает per_page + 1 строк, лишняя строка говорит о наличии продолжения.
+        """
+        backwards = False
+        queryset = self.queryset
+        if cursor:
+            value, pk, backwards = self._parse_cursor(cursor)
+            queryset = queryset.filter(self._seek(value, pk, backwards))
+        queryset = queryset.order_by(*self._order_by(backwards))
+        return queryset[:self.per_page + 1], backwards, bool(cursor)
+
+    def build_page(self, rows, backwards, has_cursor):
+        """Собирает CursorPage из выбранных строк"""
+        rows = list(rows)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = has_cursor, has_more
+        else:
+            has_next, has_previous = has_more, has_cursor
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self._make_cursor(rows[-1], 'n')
+        if rows and has_previous:
+            previous_cursor = self._make_cursor(rows[0], 'p')
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+    def page(self, cursor=None):
+        """Страница после (или перед) курсором; без курсора - первая страница"""
+        queryset, backwards, has_cursor = self.get_page_queryset(cursor)
+        return self.build_page(queryset, backwards, has_cursor)
+
+    async def apage(self, cursor=None):
+        """page() через async ORM"""
+        queryset, backwards, has_cursor = self.get_page_queryset(cursor)
+        return self.build_page([row async for row in queryset], backwards, has_cursor)
+
+
+class RankedPaginator:
+    """
+    Страницы результатов поиска в порядке релевантности: у ранга нет ключа для
+    keyset-условия, поэтому курсор хранит смещение. Без COUNT(*), как KeysetPaginator.
+    """
+    ordering = 'rank'
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+
+    def _make_cursor(self, offset):
+        return encode_cursor({'o': self.ordering, 'n': offset})
+
+    def _parse_cursor(self, token):
+        payload = decode_cursor(token)
+        offset = payload.get('n')
+        if payload.get('o') != self.ordering or not isinstance(offset, int) or offset < 0:
+            raise InvalidCursor(token)
+        return offset
+
+    def get_page_queryset(self, cursor=None):
+        """Возвращает (queryset, смещение); queryset выбирает per_page + 1 строк"""
+        offset = self._parse_cursor(cursor) if cursor else 0
+        return self.queryset[offset:offset + self.per_page + 1], offset
+
+    def build_page(self, rows, offset):
+        rows = list(rows)
+        next_cursor = self._make_cursor(offset + self.per_page) if len(rows) > self.per_page else None
+        previous_cursor = self._make_cursor(max(offset - self.per_page, 0)) if offset else None
+        return CursorPage(rows[:self.per_page], next_cursor, previous_cursor)
+
+    def page(self, cursor=None):
+        queryset, offset = self.get_page_queryset(cursor)
+        return self.build_page(queryset, offset)
+
+    async def apage(self, cursor=None):
+        queryset, offset = self.get_page_queryset(cursor)
+        return self.build_page([row async for row in queryset], offset)
+
+
+class CachedPaginator(Paginator):
+    """Обычный постраничный Paginator, кэширующий COUNT(*) и содержимое страниц в CacheScope"""
+
+    def __init__(self, object_list, per_page, cache_scope, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_scope = cache_scope
+
+    @cached_property
+    def count(self):
+        return self.cache_scope.get_or_set({'part': 'count'}, lambda: Paginator.count.func(self))
+
+    def _page_bounds(self, number):
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        return bottom, top
+
+    def _page_part(self, number):
+        return {'part': 'page', 'page': number, 'per_page': self.per_page}
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom, top = self._page_bounds(number)
+        object_list = self.cache_scope.get_or_set(
+            self._page_part(number),
+            lambda: list(self.object_list[bottom:top]),
+        )
+        return self._get_page(object_list, number, self)
+
+    async def acount(self):
+        if 'count' not in self.__dict__:
+            self.count = await self.cache_scope.aget_or_set({'part': 'count'}, self.object_list.acount)
+        return self.count
+
+    async def apage(self, number):
+        """
+        page() для async-представлений. Без orphans границы страницы не зависят
+        от общего числа строк, поэтому COUNT(*) и строки страницы запрашиваются одновременно.
+        """
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+
+        async def rows():
+            if self.orphans:
+                await self.acount()
+                bottom, top = self._page_bounds(number)
+            else:
+                bottom, top = (number - 1) * self.per_page, number * self.per_page
+            return [obj async for obj in self.object_list[bottom:top]]
+
+        _, object_list = await asyncio.gather(
+            self.acount(), self.cache_scope.aget_or_set(self._page_part(number), rows),
+        )
+        # COUNT(*) уже известен: проверка номера страницы без запроса
+        number = self.validate_number(number)
+        return self._get_page(object_list, number, self)
+
+
+class CappedCountPaginator(Paginator):
+    """
+    Paginator для больших таблиц в админке: вместо полного COUNT(*) - известное
+    число строк (known_count, например из CategoryStats) или COUNT по первым
+    limit строкам. Страницы дальше limit-й строки недоступны, пока фильтр не
+    сузит выборку.
+    """
+
+    def __init__(self, object_list, per_page, known_count=None, limit=10000, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = known_count
+        self.limit = limit
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        # COUNT(*) по подзапросу с LIMIT: читается не больше limit строк индекса
+        return self.object_list[:self.limit].count()
@@ -0,0 +1,183 @@
+"""
+Метрики производительности представлений в памяти процесса.
+
+Для каждого имени URL (product_list, analytics, ...) копятся гистограммы
+числа SQL-запросов, времени SQL, времени отрисовки шаблона и полного
+времени ответа. Данные собирает PerfMiddleware (catalog/middleware.py),
+читаются они через snapshot() - внутренней страницей и командой perf_report.
+"""
+import bisect
+import contextvars
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+# Верхние границы корзин гистограмм
+TIME_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf')]
+COUNT_BUCKETS = [0, 1, 2, 3, 5, 10, 20, 50, 100, 200, float('inf')]
+
+# Сколько одинаковых запросов (с разными параметрами) за один ответ считать N+1
+DEFAULT_NPLUSONE_THRESHOLD = 5
+
+_current = contextvars.ContextVar('catalog_perf_request', default=None)
+
+
+def is_enabled():
+    return getattr(settings, 'CATALOG_PERF_ENABLED', True)
+
+
+def get_nplusone_threshold():
+    return getattr(settings, 'CATALOG_PERF_NPLUSONE_THRESHOLD', DEFAULT_NPLUSONE_THRESHOLD)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: счётчики, сумма, максимум, оценка перцентилей"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction):
+        """Верхняя граница корзины, в которую попадает перцентиль (не больше максимума)"""
+        if not self.total:
+            return 0
+        rank = fraction * self.total
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.total,
+            'mean': self.sum / self.total if self.total else 0,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'max': self.max,
+            'buckets': {
+                ('inf' if bound == float('inf') else bound): count
+                for bound, count in zip(self.buckets, self.counts) if count
+            },
+        }
+
+
+class ViewMetrics:
+    """Метрики одного представления"""
+
+    def __init__(self):
+        self.queries = Histogram(COUNT_BUCKETS)
+        self.sql_ms = Histogram(TIME_BUCKETS_MS)
+        self.template_ms = Histogram(TIME_BUCKETS_MS)
+        self.latency_ms = Histogram(TIME_BUCKETS_MS)
+        # SQL -> число ответов, в которых он повторялся подозрительно часто
+        self.nplusone = Counter()
+
+    def as_dict(self):
+        return {
+            'requests': self.latency_ms.total,
+            'queries': self.queries.as_dict(),
+            'sql_ms': self.sql_ms.as_dict(),
+            'template_ms': self.template_ms.as_dict(),
+            'latency_ms': self.latency_ms.as_dict(),
+            'nplusone': [{'sql': sql, 'requests': count} for sql, count in self.nplusone.most_common()],
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, view_name, stats, latency):
+        suspects = stats.nplusone_suspects()
+        with self.lock:
+            metrics = self.views.setdefault(view_name, ViewMetrics())
+            metrics.queries.add(stats.queries)
+            metrics.sql_ms.add(stats.sql_time * 1000)
+            metrics.template_ms.add(stats.template_time * 1000)
+            metrics.latency_ms.add(latency * 1000)
+            metrics.nplusone.update(suspects)
+        return suspects
+
+    def snapshot(self):
+        with self.lock:
+            return {name: metrics.as_dict() for name, metrics in sorted(self.views.items())}
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+registry = Registry()
+
+# Литералы в тексте запроса (на случай SQL, собранного без параметров)
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+class RequestStats:
+    """Счётчики одного запроса"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        # Текст запроса -> различные наборы параметров, с которыми он выполнялся
+        self.statements = defaultdict(set)
+
+    def nplusone_suspects(self):
+        """Запросы, повторённые с разными параметрами не меньше порога раз"""
+        threshold = get_nplusone_threshold()
+        return [sql for sql, params in self.statements.items() if len(params) >= threshold]
+
+
+def current_stats():
+    return _current.get()
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def install(connection):
+    """
+    Ставит record_query на соединение навсегда. Соединения привязаны к потокам, а
+    под ASGI запросы к базе идут из рабочего потока, поэтому обёртка ставится при
+    открытии каждого соединения (сигнал connection_created), а текущий ответ
+    определяется через contextvar, который sync_to_async переносит в поток.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка выполнения запроса: время и текст каждого запроса текущего ответа"""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_time += time.perf_counter() - started
+        stats.queries += 1
+        # Одинаковый текст с разными параметрами - признак N+1
+        stats.statements[_LITERAL_RE.sub('?', sql)].add(repr(params))
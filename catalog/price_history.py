@@ -0,0 +1,212 @@
+"""
+Журнал цен товаров и сводки по категориям за день и за месяц.
+
+Журнал только дополняется: строка пишется при создании товара и при каждом
+изменении цены. Сводки (число изменений, сумма, минимум и максимум цен)
+обновляются в той же транзакции: изменения пачки группируются по
+(категория, период) и добавляются к строкам сводок одним INSERT ... ON
+CONFLICT DO UPDATE, поэтому импорт пачки товаров стоит одну вставку в
+журнал и по одной - в каждую сводку. График цен по месяцам читает только
+MonthlyPriceRollup, не сканируя журнал.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import F, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from .models import DailyPriceRollup, MonthlyPriceRollup, PriceHistory
+
+PriceChange = namedtuple('PriceChange', 'product_id category_id old_price price')
+
+# Модель сводки -> поле периода и функция, переводящая дату изменения в период
+ROLLUPS = [
+    (DailyPriceRollup, 'day', lambda day: day),
+    (MonthlyPriceRollup, 'month', lambda day: day.replace(day=1)),
+]
+
+
+def _price_value(price):
+    return Value(price, output_field=PriceHistory._meta.get_field('price'))
+
+
+def _group(changes, day, period_of):
+    """{(category_id, период): [число, сумма, минимум, максимум]}"""
+    buckets = {}
+    period = period_of(day)
+    for change in changes:
+        bucket = buckets.get((change.category_id, period))
+        if bucket is None:
+            buckets[(change.category_id, period)] = [1, change.price, change.price, change.price]
+        else:
+            bucket[0] += 1
+            bucket[1] += change.price
+            bucket[2] = min(bucket[2], change.price)
+            bucket[3] = max(bucket[3], change.price)
+    return buckets
+
+
+# Одна вставка с ON CONFLICT DO UPDATE на пачку: функции минимума/максимума двух значений
+UPSERT_FUNCTIONS = {
+    'sqlite': ('MIN', 'MAX'),
+    'postgresql': ('LEAST', 'GREATEST'),
+}
+UPSERT_SQL = (
+    'INSERT INTO {table} (category_id, {field}, change_count, price_sum, min_price, max_price) '
+    'VALUES {values} '
+    'ON CONFLICT (category_id, {field}) DO UPDATE SET '
+    'change_count = {table}.change_count + excluded.change_count, '
+    'price_sum = {table}.price_sum + excluded.price_sum, '
+    'min_price = COALESCE({least}({table}.min_price, excluded.min_price), excluded.min_price), '
+    'max_price = COALESCE({greatest}({table}.max_price, excluded.max_price), excluded.max_price)'
+)
+UPSERT_BATCH_SIZE = 100
+
+
+def _upsert(connection, model, field, buckets):
+    least, greatest = UPSERT_FUNCTIONS[connection.vendor]
+    table = connection.ops.quote_name(model._meta.db_table)
+    rows = [(*key, *bucket) for key, bucket in buckets.items()]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            sql = UPSERT_SQL.format(
+                table=table, field=connection.ops.quote_name(field),
+                values=', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(batch)),
+                least=least, greatest=greatest,
+            )
+            cursor.execute(sql, [value for row in batch for value in row])
+
+
+def _apply(model, field, key, bucket, using):
+    category_id, period = key
+    count, total, low, high = bucket
+    low, high = _price_value(low), _price_value(high)
+    return model.objects.using(using).filter(category_id=category_id, **{field: period}).update(
+        change_count=F('change_count') + count,
+        price_sum=F('price_sum') + _price_value(total),
+        min_price=Coalesce(Least(F('min_price'), low), low),
+        max_price=Coalesce(Greatest(F('max_price'), high), high),
+    )
+
+
+def _update_or_create(model, field, buckets, using):
+    """Без ON CONFLICT: UPDATE на каждую группу, недостающие строки периода создаются пустыми"""
+    missing = [key for key, bucket in buckets.items() if not _apply(model, field, key, bucket, using)]
+    if missing:
+        model.objects.using(using).bulk_create(
+            [model(category_id=category_id, **{field: period}) for category_id, period in missing],
+            ignore_conflicts=True,
+        )
+        for key in missing:
+            _apply(model, field, key, buckets[key], using)
+
+
+def _add_to_rollups(model, field, buckets, using):
+    connection = connections[using]
+    if connection.vendor in UPSERT_FUNCTIONS:
+        _upsert(connection, model, field, buckets)
+    else:
+        _update_or_create(model, field, buckets, using)
+
+
+def update_rollups(changes, day, using='default'):
+    """Добавляет изменения цен за день day в дневные и месячные сводки"""
+    for model, field, period_of in ROLLUPS:
+        _add_to_rollups(model, field, _group(changes, day, period_of), using)
+
+
+def reassign_category(source_id, target_id, using='default'):
+    """
+    Переносит журнал цен и сводки категории source_id в target_id (перед удалением
+    source_id с переносом товаров): сводки за один и тот же период складываются
+    """
+    with transaction.atomic(using=using, savepoint=False):
+        PriceHistory.objects.using(using).filter(category_id=source_id).update(category_id=target_id)
+        for model, field, _ in ROLLUPS:
+            rollups = model.objects.using(using).filter(category_id=source_id)
+            buckets = {
+                (target_id, period): [count, total, low, high]
+                for period, count, total, low, high in rollups.filter(change_count__gt=0).values_list(
+                    field, 'change_count', 'price_sum', 'min_price', 'max_price',
+                )
+            }
+            if buckets:
+                _add_to_rollups(model, field, buckets, using)
+            rollups.delete()
+
+
+def record_price_changes(changes, changed_at=None):
+    """
+    Записывает пачку изменений цен (PriceChange): одна вставка в журнал и
+    одна вставка с ON CONFLICT в каждую сводку (на других СУБД - UPDATE на
+    каждую пару (категория, период))
+    """
+    to_price = PriceHistory._meta.get_field('price').to_python
+    changes = [
+        change._replace(price=to_price(change.price))
+        for change in changes if change.old_price is None or to_price(change.price) != change.old_price
+    ]
+    if not changes:
+        return 0
+    changed_at = changed_at or timezone.now()
+    using = router.db_for_write(PriceHistory)
+    # Журнал и сводки - вместе; внутри транзакции вызывающего кода без точки сохранения
+    with transaction.atomic(using=using, savepoint=False):
+        PriceHistory.objects.using(using).bulk_create([
+            PriceHistory(
+                product_id=change.product_id,
+                category_id=change.category_id,
+                old_price=change.old_price,
+                price=change.price,
+                changed_at=changed_at,
+            )
+            for change in changes
+        ], batch_size=1000)
+        update_rollups(changes, timezone.localdate(changed_at), using)
+    return len(changes)
+
+
+def _months_ago(months):
+    """Первое число месяца, отстоящего на months - 1 месяцев от текущего"""
+    first = timezone.localdate().replace(day=1)
+    for _ in range(months - 1):
+        first = (first - timedelta(days=1)).replace(day=1)
+    return first
+
+
+def price_trends_queryset(months=12, category_id=None):
+    rollups = MonthlyPriceRollup.objects.filter(month__gte=_months_ago(months))
+    if category_id is not None:
+        rollups = rollups.filter(category_id=category_id)
+    return rollups.values('month').annotate(
+        change_count=Sum('change_count'),
+        price_sum=Sum('price_sum'),
+        min_price=Min('min_price'),
+        max_price=Max('max_price'),
+    ).order_by('month')
+
+
+def _add_avg_price(rows):
+    for row in rows:
+        price_sum = row.pop('price_sum')
+        row['avg_price'] = price_sum / row['change_count'] if row['change_count'] else None
+    # Высота столбца графика: доля от наибольшей средней цены за период
+    top = max((row['avg_price'] for row in rows if row['avg_price']), default=None)
+    for row in rows:
+        row['avg_share'] = round(row['avg_price'] / top * 100) if top and row['avg_price'] else 0
+    return rows
+
+
+def get_price_trends(months=12, category_id=None):
+    """
+    Цены по месяцам за последние months месяцев (один запрос по MonthlyPriceRollup):
+    [{'month', 'change_count', 'avg_price', 'min_price', 'max_price', 'avg_share'}, ...]
+    """
+    return _add_avg_price(list(price_trends_queryset(months, category_id)))
+
+
+async def aget_price_trends(months=12, category_id=None):
+    return _add_avg_price([row async for row in price_trends_queryset(months, category_id)])
@@ -0,0 +1,88 @@
+"""
+Предгенерированные уменьшенные копии изображений товаров.
+
+Для каждого исходника products/<имя>.<ext> создаются JPEG и WebP нужных
+размеров в products/renditions/<имя>_<размер>.<формат>. Шаблоны просят
+копию по имени размера ({% product_image product 'card' %}) и получают
+оригинал, только если копии ещё нет.
+"""
+import io
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Имя размера -> (ширина, высота); изображение обрезается по центру до точного размера
+DEFAULT_RENDITIONS = {
+    'card': (400, 300),
+    'thumb': (150, 150),
+}
+
+# Формат -> (расширение, параметры сохранения Pillow)
+FORMATS = {
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+}
+
+RENDITIONS_DIR = 'renditions'
+
+
+def get_renditions():
+    return getattr(settings, 'CATALOG_IMAGE_RENDITIONS', DEFAULT_RENDITIONS)
+
+
+def rendition_name(image_name, size, image_format):
+    """'products/photo.png', 'card', 'webp' -> 'products/renditions/photo_card.webp'"""
+    directory, filename = posixpath.split(str(image_name))
+    stem = posixpath.splitext(filename)[0]
+    extension = FORMATS[image_format][0]
+    return posixpath.join(directory, RENDITIONS_DIR, f'{stem}_{size}.{extension}')
+
+
+def generate_renditions(image_name, force=False, storage=None):
+    """Создаёт все размеры и форматы для исходника; возвращает список созданных файлов"""
+    storage = storage or default_storage
+    created = []
+    with storage.open(image_name, 'rb') as f:
+        original = ImageOps.exif_transpose(Image.open(f))
+        original = original.convert('RGB')
+
+    for size, dimensions in get_renditions().items():
+        resized = None
+        for image_format, (_, save_options) in FORMATS.items():
+            name = rendition_name(image_name, size, image_format)
+            if storage.exists(name):
+                if not force:
+                    continue
+                storage.delete(name)
+            if resized is None:
+                resized = ImageOps.fit(original, dimensions, Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, **save_options)
+            created.append(storage.save(name, ContentFile(buffer.getvalue())))
+    return created
+
+
+def delete_renditions(image_name, storage=None):
+    storage = storage or default_storage
+    for size in get_renditions():
+        for image_format in FORMATS:
+            name = rendition_name(image_name, size, image_format)
+            if storage.exists(name):
+                storage.delete(name)
+
+
+def get_rendition_urls(image, size):
+    """{'jpeg': url, 'webp': url} для готовых копий или None, если их ещё нет"""
+    if not image:
+        return None
+    storage = image.storage
+    # Оба формата создаются вместе, достаточно проверить один файл
+    if not storage.exists(rendition_name(image.name, size, 'jpeg')):
+        return None
+    return {
+        image_format: storage.url(rendition_name(image.name, size, image_format))
+        for image_format in FORMATS
+    }
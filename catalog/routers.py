@@ -0,0 +1,85 @@
+"""
+Чтение каталога с реплик.
+
+ReplicaRouter отправляет чтения моделей catalog на одну из реплик
+(CATALOG_READ_REPLICAS) только внутри запросов, для которых
+ReplicaMiddleware разрешила реплику: GET/HEAD без недавней записи.
+Запись всегда идёт в основную базу; после первой записи в каталог чтения до конца
+запроса тоже идут в основную базу, а браузер получает cookie, по которой
+основная база используется ещё CATALOG_REPLICA_STICKY_SECONDS секунд -
+так редирект после создания товара показывает новый товар, даже если
+реплика отстаёт.
+
+Вне запросов (команды, импорт, сигналы из команд) и для моделей других
+приложений (сессии, пользователи, журнал админки) реплики не используются.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+
+PRIMARY = 'default'
+STICKY_COOKIE = 'catalog_primary'
+DEFAULT_STICKY_SECONDS = 15
+
+_current = contextvars.ContextVar('catalog_db_routing', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'CATALOG_READ_REPLICAS', [])
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'CATALOG_REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+
+
+class RoutingState:
+    """Маршрутизация текущего запроса; изменяемый объект, чтобы запись из потока sync_to_async была видна"""
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+def start_request(use_replica):
+    state = RoutingState(use_replica and bool(get_replicas()))
+    return state, _current.set(state)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if state is None or not state.use_replica or model._meta.app_label != 'catalog':
+            return PRIMARY
+        return random.choice(get_replicas())
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        # Только запись каталога: сессия, вход или журнал админки не должны
+        # закреплять чтения каталога за основной базой
+        if state is not None and model._meta.app_label == 'catalog':
+            state.wrote = True
+            state.use_replica = False
+        # Объект, прочитанный с реплики, сохраняется в основную базу; в остальных
+        # случаях база выбирается как без роутера (в том числе явный using())
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in get_replicas():
+            return PRIMARY
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему на реплики переносит репликация (для SQLite - sync_replicas)
+        if db in get_replicas():
+            return False
+        return None
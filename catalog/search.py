@@ -0,0 +1,55 @@
+"""
+Полнотекстовый поиск товаров.
+
+На SQLite используется FTS5-таблица catalog_product_fts (миграция 0004),
+которая синхронизируется с catalog_product триггерами - в том числе при
+bulk_create и queryset.update(). Каждое слово запроса ищется как префикс,
+результаты ранжируются по bm25. На других СУБД - icontains по названию
+и описанию.
+
+Внимание: при пересоздании таблицы catalog_product миграцией на SQLite
+(AlterField и т.п.) триггеры удаляются вместе со старой таблицей и их
+нужно создать заново.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+FTS_TABLE = 'catalog_product_fts'
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize_text(text):
+    """Приводит текст к виду, в котором он лежит в индексе (ё -> е)"""
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def build_match_query(text):
+    """'Смартф самс' -> '"Смартф"* "самс"*': все слова обязательны, каждое - как префикс"""
+    words = WORD_RE.findall(normalize_text(text))
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def fts_available(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def search_products(queryset, text, ranked=True):
+    """Фильтрует товары по поисковому запросу; ranked=True - сортировка по релевантности"""
+    match = build_match_query(text)
+    if not match:
+        return queryset
+
+    if not fts_available(queryset.db):
+        return queryset.filter(Q(name__icontains=text) | Q(description__icontains=text))
+
+    product_table = queryset.model._meta.db_table
+    queryset = queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {product_table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+    )
+    if ranked:
+        queryset = queryset.extra(select={'search_rank': f'{FTS_TABLE}.rank'}, order_by=['search_rank'])
+    return queryset
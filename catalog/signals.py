@@ -0,0 +1,126 @@
+"""Сигналы каталога: статистика категорий, история цен, версии кэша, журнал изменений, задачи копий изображений, метрики SQL"""
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from . import changes, facets, perf, stats, tasks
+from .cache import CATEGORY_LIST, bump_version
+from .models import CatalogChange, Category, CategoryStats, Product
+from .price_history import PriceChange, record_price_changes
+
+
+def _loaded_state(instance):
+    # Через __dict__, чтобы не подгружать отложенные (.only/.defer) поля
+    return instance.__dict__.get('category_id'), instance.__dict__.get('price')
+
+
+def _image_name(instance):
+    return str(instance.__dict__.get('image') or '')
+
+
+@receiver(post_init, sender=Product)
+def remember_product_state(sender, instance, **kwargs):
+    """Запоминаем категорию и цену, с которыми товар был загружен из базы"""
+    instance._loaded_state = _loaded_state(instance) if instance.pk else (None, None)
+    instance._loaded_image = _image_name(instance)
+
+
+@receiver(post_save, sender=Product)
+def record_price_history(sender, instance, created, raw=False, **kwargs):
+    """Новая цена - в журнал цен (до update_stats_on_product_save, который обновляет _loaded_state)"""
+    if raw:
+        return
+    old_price = None if created else getattr(instance, '_loaded_state', (None, None))[1]
+    if created or (old_price is not None and old_price != instance.price):
+        record_price_changes([PriceChange(instance.pk, instance.category_id, old_price, instance.price)])
+
+
+@receiver(post_save, sender=Product)
+def update_stats_on_product_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_category_id, old_price = getattr(instance, '_loaded_state', (None, None))
+    new_category_id, new_price = instance.category_id, instance.price
+
+    if created:
+        stats.product_added(new_category_id, new_price)
+    elif old_category_id is None or old_price is None:
+        # Исходное состояние неизвестно - пересчитываем затронутую категорию
+        stats.rebuild_category_stats([new_category_id])
+    elif old_category_id != new_category_id:
+        # Товар перенесён в другую категорию
+        stats.product_removed(old_category_id, old_price)
+        stats.product_added(new_category_id, new_price)
+    elif old_price != new_price:
+        stats.product_price_changed(new_category_id, old_price, new_price)
+
+    bump_version([old_category_id, new_category_id])
+    instance._loaded_state = (new_category_id, new_price)
+
+
+@receiver(post_delete, sender=Product)
+def update_stats_on_product_delete(sender, instance, **kwargs):
+    category_id, price = getattr(instance, '_loaded_state', (None, None))
+    if category_id is None or price is None:
+        category_id, price = instance.category_id, instance.price
+    stats.product_removed(category_id, price)
+    bump_version([category_id])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def record_change_on_save(sender, instance, created, raw=False, using=None, **kwargs):
+    """Создание или изменение - в журнал изменений (catalog/changes.py)"""
+    if not raw:
+        kind = CatalogChange.PRODUCT if sender is Product else CatalogChange.CATEGORY
+        changes.record(kind, [instance.pk], CatalogChange.CREATED if created else CatalogChange.UPDATED, using)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def record_change_on_delete(sender, instance, using=None, **kwargs):
+    kind = CatalogChange.PRODUCT if sender is Product else CatalogChange.CATEGORY
+    changes.record(kind, [instance.pk], CatalogChange.DELETED, using)
+
+
+@receiver(post_save, sender=Product)
+def update_renditions_on_image_change(sender, instance, raw=False, **kwargs):
+    """Новое изображение - задачи на создание уменьшенных копий и удаление старых (catalog/tasks.py)"""
+    if raw:
+        return
+    old_image, new_image = getattr(instance, '_loaded_image', ''), _image_name(instance)
+    if old_image == new_image:
+        return
+    if old_image:
+        tasks.enqueue('delete_renditions', old_image, key=f'delete_renditions:{old_image}')
+    if new_image:
+        tasks.enqueue('generate_renditions', new_image, key=f'generate_renditions:{new_image}')
+    instance._loaded_image = new_image
+
+
+@receiver(post_delete, sender=Product)
+def delete_renditions_on_product_delete(sender, instance, **kwargs):
+    """Удалённый товар - задача на удаление копий его изображения (массовое удаление - в catalog/bulk.py)"""
+    image = _image_name(instance)
+    if image:
+        tasks.enqueue('delete_renditions', image, key=f'delete_renditions:{image}')
+
+
+@receiver(post_save, sender=Category)
+def create_category_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        CategoryStats.objects.get_or_create(category=instance)
+        facets.create_price_facets(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_version([instance.pk, CATEGORY_LIST])
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Учёт SQL-запросов в метриках представлений (catalog/perf.py)"""
+    perf.install(connection)
@@ -0,0 +1,159 @@
+"""
+Инкрементальное обслуживание таблицы CategoryStats и индекса фасетов цен.
+
+Каждое изменение товара превращается в одно UPDATE по строке категории
+(F-выражения, без чтения) и одно UPDATE строки PriceFacet, если товар
+попал в другой ценовой диапазон. Минимум/максимум пересчитываются
+подзапросом только тогда, когда удалённая цена была границей диапазона.
+Массовые операции (catalog/bulk.py) применяют так же сводку пачки товаров.
+"""
+from django.db import transaction
+from django.db.models import Count, Sum, Min, Max, F, Value, Subquery
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from . import facets
+from .models import Category, CategoryStats, Product
+
+
+def _price_value(price):
+    return Value(price, output_field=CategoryStats._meta.get_field('min_price'))
+
+
+def _total_value(total):
+    return Value(total, output_field=CategoryStats._meta.get_field('total_value'))
+
+
+def _refresh_bounds(category_id, removed_min, removed_max=None):
+    """Пересчитывает min/max, если удалённые цены (от removed_min до removed_max) были границей диапазона"""
+    removed_max = removed_min if removed_max is None else removed_max
+    prices = Product.objects.filter(category_id=category_id).values('price')
+    CategoryStats.objects.filter(category_id=category_id, min_price__gte=removed_min).update(
+        min_price=Subquery(prices.order_by('price')[:1])
+    )
+    CategoryStats.objects.filter(category_id=category_id, max_price__lte=removed_max).update(
+        max_price=Subquery(prices.order_by('-price')[:1])
+    )
+
+
+def product_added(category_id, price):
+    """Товар добавлен в категорию"""
+    value = _price_value(price)
+    updated = CategoryStats.objects.filter(category_id=category_id).update(
+        product_count=F('product_count') + 1,
+        total_value=F('total_value') + value,
+        min_price=Coalesce(Least(F('min_price'), value), value),
+        max_price=Coalesce(Greatest(F('max_price'), value), value),
+    )
+    if not updated:
+        rebuild_category_stats([category_id])
+        return
+    facets.product_added(category_id, price)
+
+
+def product_removed(category_id, price):
+    """Товар удалён из категории (удаление или перенос в другую категорию)"""
+    updated = CategoryStats.objects.filter(category_id=category_id).update(
+        product_count=F('product_count') - 1,
+        total_value=F('total_value') - _price_value(price),
+    )
+    # Строки может не быть, если категория удаляется каскадом вместе с товарами
+    if updated:
+        _refresh_bounds(category_id, price)
+        facets.product_removed(category_id, price)
+
+
+def product_price_changed(category_id, old_price, new_price):
+    """Цена товара изменилась в пределах категории"""
+    value = _price_value(new_price)
+    updated = CategoryStats.objects.filter(category_id=category_id).update(
+        total_value=F('total_value') + value - _price_value(old_price),
+        min_price=Coalesce(Least(F('min_price'), value), value),
+        max_price=Coalesce(Greatest(F('max_price'), value), value),
+    )
+    if not updated:
+        rebuild_category_stats([category_id])
+        return
+    _refresh_bounds(category_id, old_price)
+    facets.product_price_changed(category_id, old_price, new_price)
+
+
+def products_added(category_id, batch):
+    """Пачка товаров перенесена в категорию (catalog/bulk.py)"""
+    low, high = _price_value(batch.min_price), _price_value(batch.max_price)
+    updated = CategoryStats.objects.filter(category_id=category_id).update(
+        product_count=F('product_count') + batch.count,
+        total_value=F('total_value') + _total_value(batch.total),
+        min_price=Coalesce(Least(F('min_price'), low), low),
+        max_price=Coalesce(Greatest(F('max_price'), high), high),
+    )
+    if not updated:
+        rebuild_category_stats([category_id])
+        return
+    facets.products_added(category_id, batch.buckets)
+
+
+def products_removed(category_id, batch):
+    """Пачка товаров удалена из категории или перенесена из неё (catalog/bulk.py)"""
+    updated = CategoryStats.objects.filter(category_id=category_id).update(
+        product_count=F('product_count') - batch.count,
+        total_value=F('total_value') - _total_value(batch.total),
+    )
+    if updated:
+        _refresh_bounds(category_id, batch.min_price, batch.max_price)
+        facets.products_removed(category_id, batch.buckets)
+
+
+def compute_category_stats(category_ids=None):
+    """Считает статистику заново по таблице товаров: {category_id: CategoryStats}"""
+    categories = Category.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(pk__in=category_ids)
+    rows = categories.annotate(
+        product_count=Count('products'),
+        total_value=Sum('products__price'),
+        min_price=Min('products__price'),
+        max_price=Max('products__price'),
+    ).values('pk', 'product_count', 'total_value', 'min_price', 'max_price').order_by()
+
+    return {
+        row['pk']: CategoryStats(
+            category_id=row['pk'],
+            product_count=row['product_count'],
+            total_value=row['total_value'] or 0,
+            min_price=row['min_price'],
+            max_price=row['max_price'],
+        )
+        for row in rows
+    }
+
+
+def rebuild_category_stats(category_ids=None):
+    """Перестраивает статистику и индекс фасетов с нуля (для всех категорий или для указанных)"""
+    with transaction.atomic():
+        stats = compute_category_stats(category_ids)
+        existing = CategoryStats.objects.all()
+        if category_ids is not None:
+            existing = existing.filter(category_id__in=category_ids)
+        existing.delete()
+        CategoryStats.objects.bulk_create(stats.values(), batch_size=500)
+        facets.rebuild_price_facets(list(stats))
+    return len(stats)
+
+
+def check_category_stats():
+    """Сравнивает материализованную статистику с расчётом по товарам, возвращает расхождения"""
+    expected = compute_category_stats()
+    actual = {s.category_id: s for s in CategoryStats.objects.all()}
+    fields = ['product_count', 'total_value', 'min_price', 'max_price']
+
+    drift = []
+    for category_id, want in expected.items():
+        have = actual.get(category_id)
+        if have is None:
+            drift.append((category_id, 'missing', None, None))
+            continue
+        for field in fields:
+            got, exp = getattr(have, field), getattr(want, field)
+            if got != exp:
+                drift.append((category_id, field, got, exp))
+    return drift
@@ -0,0 +1,153 @@
+"""
+Очередь фоновых задач в таблице Job.
+
+Задача - функция, зарегистрированная декоратором @task, с аргументами,
+сериализуемыми в JSON. enqueue() добавляет строку в текущей транзакции:
+обработчик увидит задачу только после коммита, а при откате её не будет.
+Задача с непустым ключом не дублируется, пока такая же ждёт в очереди.
+
+Обработчики (manage.py run_catalog_worker) забирают пачки задач, переводя
+их в running, и выполняют в пуле потоков или процессов. Выполненная задача
+удаляется; упавшая повторяется с растущей задержкой, после
+CATALOG_TASKS_MAX_ATTEMPTS попыток остаётся со статусом failed. Задача,
+которая выполняется дольше CATALOG_TASKS_TIMEOUT (обработчик упал),
+возвращается в очередь.
+
+С CATALOG_TASKS_EAGER = True задачи выполняются сразу после коммита в том
+же процессе - для разработки без обработчика.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import bulk
+from .models import Job
+from .renditions import delete_renditions, generate_renditions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_DELAY = 10
+DEFAULT_TIMEOUT = 10 * 60
+
+registry = {}
+
+
+def is_eager():
+    return getattr(settings, 'CATALOG_TASKS_EAGER', False)
+
+
+def get_max_attempts():
+    return getattr(settings, 'CATALOG_TASKS_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+
+
+def get_retry_delay(attempts):
+    """Задержка перед повтором: базовая, удваивается с каждой попыткой"""
+    return getattr(settings, 'CATALOG_TASKS_RETRY_DELAY', DEFAULT_RETRY_DELAY) * 2 ** (attempts - 1)
+
+
+def get_timeout():
+    return getattr(settings, 'CATALOG_TASKS_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def task(name):
+    def register(func):
+        registry[name] = func
+        return func
+    return register
+
+
+def enqueue(name, *args, key='', delay=0):
+    """Добавляет задачу в очередь (один INSERT; дубликат по ключу пропускается)"""
+    if name not in registry:
+        raise KeyError(f'Неизвестная задача: {name}')
+    if is_eager():
+        transaction.on_commit(lambda: registry[name](*args))
+        return
+    Job.objects.bulk_create(
+        [Job(name=name, key=key, args=list(args), run_at=timezone.now() + timedelta(seconds=delay))],
+        ignore_conflicts=True,
+    )
+
+
+def enqueue_many(name, calls, delay=0):
+    """enqueue() для нескольких задач одной вставкой; calls - [(args, key), ...]"""
+    if name not in registry:
+        raise KeyError(f'Неизвестная задача: {name}')
+    calls = list(calls)
+    if is_eager():
+        for args, _ in calls:
+            transaction.on_commit(lambda args=args: registry[name](*args))
+        return
+    if calls:
+        run_at = timezone.now() + timedelta(seconds=delay)
+        Job.objects.bulk_create(
+            [Job(name=name, key=key, args=list(args), run_at=run_at) for args, key in calls],
+            ignore_conflicts=True,
+        )
+
+
+def claim_jobs(worker, limit):
+    """Забирает до limit готовых задач и возвращает их id"""
+    now = timezone.now()
+    with transaction.atomic():
+        # Задачи упавших обработчиков
+        Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=get_timeout())).update(
+            status=Job.PENDING, locked_at=None, locked_by=''
+        )
+        # На PostgreSQL обработчики не ждут строк друг друга; SQLite сериализует
+        # транзакции целиком (BEGIN IMMEDIATE), и FOR UPDATE там не нужен
+        ids = list(
+            Job.objects.filter(status=Job.PENDING, run_at__lte=now).order_by('run_at')
+            .select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit]
+        )
+        if ids:
+            Job.objects.filter(pk__in=ids).update(
+                status=Job.RUNNING, locked_at=now, locked_by=worker, attempts=F('attempts') + 1
+            )
+    return ids
+
+
+def run_job(pk):
+    """Выполняет забранную задачу; True - успешно"""
+    job = Job.objects.get(pk=pk, status=Job.RUNNING)
+    try:
+        registry[job.name](*job.args)
+    except Exception as e:
+        logger.exception('Задача %s (%s) упала, попытка %s', job.name, job.key, job.attempts)
+        _failed(job, e)
+        return False
+    job.delete()
+    return True
+
+
+def _failed(job, error):
+    job.last_error = f'{type(error).__name__}: {error}'
+    job.locked_at, job.locked_by = None, ''
+    if job.attempts >= get_max_attempts():
+        job.status = Job.FAILED
+    else:
+        # Повторная задача с тем же ключом уже могла попасть в очередь
+        if job.key and Job.objects.filter(key=job.key, status=Job.PENDING).exists():
+            job.delete()
+            return
+        job.status = Job.PENDING
+        job.run_at = timezone.now() + timedelta(seconds=get_retry_delay(job.attempts))
+    job.save(update_fields=['status', 'run_at', 'locked_at', 'locked_by', 'last_error'])
+
+
+# Задачи каталога
+
+@task('generate_renditions')
+def generate_renditions_task(image_name):
+    if generate_renditions(image_name):
+        bulk.touch_products_by_image([image_name])
+
+
+@task('delete_renditions')
+def delete_renditions_task(image_name):
+    delete_renditions(image_name)
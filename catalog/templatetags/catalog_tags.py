@@ -0,0 +1,15 @@
+from django import template
+
+from catalog.renditions import get_rendition_urls
+
+register = template.Library()
+
+
+@register.inclusion_tag('catalog/includes/product_image.html')
+def product_image(product, size='card', css_class=''):
+    """Изображение товара нужного размера: WebP + JPEG, оригинал - если копий ещё нет"""
+    return {
+        'product': product,
+        'urls': get_rendition_urls(product.image, size),
+        'css_class': css_class,
+    }
@@ -1,3 +1,1400 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, router, transaction
+from django.http import HttpResponse
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import bulk, changes, facets, perf, price_history, routers, tasks
+from .benchmarks.cases import build_cases
+from .benchmarks.concurrency import run_concurrency_benchmark
+from .benchmarks.data import generate_catalog, reset_catalog
+from .benchmarks.runner import BenchmarkRunner, compare_results, write_import_file
+from .facets import check_price_facets, get_facets, get_price_edges
+from .forms import ProductFilterForm, ProductForm
+from .middleware import ReplicaMiddleware
+from .models import (
+    CatalogChange, Category, CategoryStats, DailyPriceRollup, Job, MonthlyPriceRollup, PriceHistory, Product,
+)
+from .pagination import KeysetPaginator
+from .price_history import PriceChange, get_price_trends, record_price_changes
+from .stats import check_category_stats
+
+
+class CatalogTestCase(TestCase):
+    """Базовый класс тестов: каждый тест начинается с пустого кэша"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class KeysetPaginationTests(CatalogTestCase):
+    """Курсорная пагинация списка товаров"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Книги')
+        # Повторяющиеся цены и названия проверяют добивку ключа по pk
+        for i in range(23):
+            Product.objects.create(
+                name=f'Товар {i % 5}',
+                price=Decimal(100 + i % 4),
+                category=cls.category,
+            )
+
+    def walk(self, ordering):
+        paginator = KeysetPaginator(Product.objects.all(), 5, ordering)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return paginator, pages
+
+    def test_every_sort_choice_visits_each_product_once(self):
+        for ordering, _ in ProductFilterForm.SORT_CHOICES:
+            with self.subTest(ordering=ordering):
+                _, pages = self.walk(ordering)
+                seen = [p.pk for page in pages for p in page]
+                prefix = '-' if ordering.startswith('-') else ''
+                expected = list(Product.objects.order_by(ordering, prefix + 'pk').values_list('pk', flat=True))
+                self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        paginator, pages = self.walk('-price')
+        back = paginator.page(pages[2].previous_cursor)
+        self.assertEqual([p.pk for p in back], [p.pk for p in pages[1]])
+
+    def test_list_view_cursor_mode_skips_count(self):
+        url = reverse('product_list') + '?sort_by=price&cursor='
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        # Страница + варианты категорий; фасеты - два запроса по индексу PriceFacet
+        self.assertEqual(len(ctx.captured_queries), 4)
+        self.assertFalse(any('"catalog_product"' in q['sql'] and 'COUNT(' in q['sql'] for q in ctx.captured_queries))
+        self.assertTrue(response.context['cursor_mode'])
+        self.assertEqual(len(response.context['products']), 10)
+
+    def test_list_view_rejects_foreign_cursor(self):
+        _, pages = self.walk('name')
+        url = reverse('product_list') + f'?sort_by=price&cursor={pages[0].next_cursor}'
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class AnalyticsQueryCountTests(CatalogTestCase):
+    """Бенчмарк числа запросов: статистика не должна расти с числом категорий"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for c in range(6):
+            category = Category.objects.create(name=f'Категория {c}')
+            for i in range(c):
+                Product.objects.create(name=f'Товар {c}-{i}', price=Decimal(10 * (i + 1)), category=category)
+
+    def test_home_view_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['total_products'], 15)
+        self.assertEqual(response.context['total_categories'], 6)
+        self.assertEqual(response.context['total_value'], Decimal(350))
+
+    def test_analytics_view_two_queries(self):
+        with self.assertNumQueries(2):  # CategoryStats + сводки цен по месяцам
+            response = self.client.get(reverse('analytics'), {'sort_by': '-product_count'})
+        context = response.context
+        self.assertEqual(context['total_products'], 15)
+        self.assertEqual(context['min_price'], Decimal(10))
+        self.assertEqual(context['max_price'], Decimal(50))
+        self.assertEqual(context['avg_price'], Decimal(350) / 15)
+        self.assertEqual(context['categories_stats'][0].product_count, 5)
+        [month] = context['price_trends']
+        self.assertEqual(month['change_count'], 15)
+        self.assertEqual(month['avg_price'], Decimal(350) / 15)
+
+
+class CategoryStatsTests(CatalogTestCase):
+    """Инкрементальное обслуживание CategoryStats"""
+
+    def setUp(self):
+        super().setUp()
+        self.books = Category.objects.create(name='Книги')
+        self.sport = Category.objects.create(name='Спорт')
+
+    def assertStatsInSync(self):
+        self.assertEqual(check_category_stats(), [])
+
+    def test_create_update_delete_keep_stats_in_sync(self):
+        cheap = Product.objects.create(name='Мяч', price=Decimal('5.00'), category=self.sport)
+        Product.objects.create(name='Гантели', price=Decimal('20.00'), category=self.sport)
+        self.assertStatsInSync()
+
+        cheap.price = Decimal('30.00')
+        cheap.save()
+        self.assertStatsInSync()
+        self.assertEqual(CategoryStats.objects.get(pk=self.sport.pk).min_price, Decimal('20.00'))
+
+        Product.objects.get(pk=cheap.pk).delete()
+        self.assertStatsInSync()
+
+    def test_product_moved_between_categories(self):
+        product = Product.objects.create(name='Учебник', price=Decimal('15.00'), category=self.books)
+        product = Product.objects.get(pk=product.pk)
+        product.category = self.sport
+        product.price = Decimal('12.00')
+        product.save()
+        self.assertStatsInSync()
+
+    def test_category_delete_cascades(self):
+        Product.objects.create(name='Учебник', price=Decimal('15.00'), category=self.books)
+        self.books.delete()
+        self.assertStatsInSync()
+
+    def test_category_list_reads_stats(self):
+        Product.objects.create(name='Мяч', price=Decimal('5.00'), category=self.sport)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('category_list'), {'sort_by': '-product_count'})
+        categories = list(response.context['categories'])
+        self.assertEqual((categories[0], categories[0].product_count), (self.sport, 1))
+
+
+class BulkOperationsTests(CatalogTestCase):
+    """Массовые операции пачками: статистика и фасеты обновляются сводкой пачки"""
+
+    def setUp(self):
+        super().setUp()
+        self.books = Category.objects.create(name='Книги')
+        self.sport = Category.objects.create(name='Спорт')
+        for i in range(7):
+            Product.objects.create(name=f'Книга {i}', price=Decimal(100 * i + 50), category=self.books)
+        Product.objects.create(name='Мяч', price=Decimal('500.00'), category=self.sport)
+
+    def assertInSync(self):
+        self.assertEqual(check_category_stats(), [])
+        self.assertEqual(check_price_facets(), [])
+
+    def test_delete_products_in_chunks(self):
+        progress = []
+        deleted = bulk.delete_products(Product.objects.filter(price__lt=400), chunk_size=2,
+                                       progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(deleted, 4)
+        self.assertEqual(progress, [(2, 4), (4, 4)])
+        self.assertEqual(Product.objects.count(), 4)
+        self.assertFalse(PriceHistory.objects.filter(product__isnull=True).exists())
+        self.assertEqual(PriceHistory.objects.count(), 4)
+        self.assertInSync()
+
+    def test_query_count_does_not_grow_with_chunk(self):
+        def queries(chunk_size):
+            for price in range(1, chunk_size + 1):
+                Product.objects.create(name='Новый', price=Decimal(price), category=self.sport)
+            with CaptureQueriesContext(connection) as ctx:
+                bulk.delete_products(Product.objects.filter(name='Новый'), chunk_size=chunk_size)
+            return len(ctx)
+
+        self.assertEqual(queries(3), queries(30))
+
+    def test_move_products(self):
+        book = Product.objects.get(name='Книга 0')
+        moved = bulk.move_products(Product.objects.filter(price__gte=500), self.sport, chunk_size=2)
+        self.assertEqual(moved, 2)  # Мяч уже в категории
+        self.assertEqual(self.sport.products.count(), 3)
+        self.assertEqual(Product.objects.get(name='Книга 0').updated_at, book.updated_at)
+        self.assertGreater(Product.objects.get(name='Книга 6').updated_at, book.updated_at)
+        self.assertInSync()
+
+    def test_delete_category_with_reassign(self):
+        self.assertEqual(bulk.delete_category(self.books, reassign_to=self.sport, chunk_size=3), 7)
+        self.assertEqual(self.sport.products.count(), 8)
+        self.assertFalse(Category.objects.filter(name='Книги').exists())
+        self.assertInSync()
+        # Журнал цен перенесённых товаров и сводки категории переходят в новую категорию
+        self.assertEqual(PriceHistory.objects.filter(category=self.sport).count(), 8)
+        for model in (DailyPriceRollup, MonthlyPriceRollup):
+            rollup = model.objects.get(category=self.sport)
+            self.assertEqual((rollup.change_count, rollup.price_sum, rollup.min_price, rollup.max_price),
+                             (8, Decimal('2950.00'), Decimal('50.00'), Decimal('650.00')))
+        self.assertEqual(get_price_trends(category_id=self.sport.pk)[0]['change_count'], 8)
+
+    def test_category_delete_view_reassigns_products(self):
+        url = reverse('category_delete', args=[self.books.pk])
+        response = self.client.get(url)
+        self.assertContains(response, 'Перенести товары в категорию')
+        # Удаляемая категория не предлагается для переноса
+        self.assertContains(response, f'<option value="{self.sport.pk}">Спорт</option>')
+        self.assertNotContains(response, f'<option value="{self.books.pk}">')
+        self.assertIn('reassign_to', self.client.post(url, {'reassign_to': self.books.pk}).context['form'].errors)
+        response = self.client.post(url, {'reassign_to': self.sport.pk}, follow=True)
+        self.assertContains(response, 'Товаров перенесено в «Спорт»: 7')
+        self.assertEqual(self.sport.products.count(), 8)
+
+        response = self.client.post(reverse('category_delete', args=[self.sport.pk]), {}, follow=True)
+        self.assertContains(response, 'Категория успешно удалена!')
+        self.assertFalse(Product.objects.exists())
+        self.assertInSync()
+
+    def test_product_delete_view_message(self):
+        product = Product.objects.get(name='Мяч')
+        response = self.client.post(reverse('product_delete', args=[product.pk]), follow=True)
+        self.assertContains(response, 'Товар успешно удален!')
+
+    def test_admin_actions(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        changelist = reverse('admin:catalog_product_changelist')
+        cheap = list(Product.objects.filter(price__lt=300).values_list('pk', flat=True))
+        self.client.post(changelist, {
+            'action': 'move_to_category', '_selected_action': cheap, 'target_category': self.sport.pk,
+        })
+        self.assertEqual(self.sport.products.count(), 4)
+
+        response = self.client.post(changelist, {
+            'action': 'delete_selected', '_selected_action': cheap, 'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.sport.products.count(), 1)
+
+        self.client.post(reverse('admin:catalog_category_changelist'), {
+            'action': 'delete_moving_products', '_selected_action': [self.books.pk], 'target_category': self.sport.pk,
+        })
+        self.assertEqual(list(Category.objects.all()), [self.sport])
+        self.assertEqual(self.sport.products.count(), 5)
+        self.assertInSync()
+
+    @override_settings(CATALOG_CATEGORY_CHOICES_LIMIT=1)
+    def test_admin_action_target_uses_autocomplete(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        for url in (reverse('admin:catalog_product_changelist'), reverse('admin:catalog_category_changelist')):
+            response = self.client.get(url)
+            self.assertContains(response, 'admin-autocomplete')
+            self.assertContains(response, 'admin/js/autocomplete.js')
+            self.assertNotContains(response, '>Спорт</option>')
+
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'Спо', 'app_label': 'catalog', 'model_name': 'product', 'field_name': 'category',
+        })
+        self.assertEqual(response.json()['results'], [{'id': str(self.sport.pk), 'text': 'Спорт'}])
+
+    def test_commands(self):
+        call_command('bulk_products', 'move', category=self.books.pk, min_price='500', to=self.sport.pk,
+                     stdout=StringIO())
+        self.assertEqual(self.sport.products.count(), 3)
+        with self.assertRaises(CommandError):
+            call_command('bulk_products', 'delete', stdout=StringIO())
+        call_command('delete_category', self.sport.pk, reassign_to=self.books.pk, stdout=StringIO())
+        self.assertEqual(self.books.products.count(), 8)
+        self.assertInSync()
+
+
+class AdminPerformanceTests(CatalogTestCase):
+    """Список товаров в админке без полного COUNT(*)"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.books = Category.objects.create(name='Книги')
+        self.sport = Category.objects.create(name='Спорт')
+        for i in range(5):
+            Product.objects.create(name=f'Учебник {i}', price=Decimal('10.00'), category=self.books)
+        Product.objects.create(name='Мяч', price=Decimal('5.00'), category=self.sport)
+        self.url = reverse('admin:catalog_product_changelist')
+
+    def get(self, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, 200)
+        product_counts = [q['sql'] for q in ctx.captured_queries
+                          if q['sql'].startswith('SELECT COUNT(*)') and 'catalog_product' in q['sql']]
+        return response.context['cl'], product_counts
+
+    def test_counts_from_category_stats(self):
+        cl, counts = self.get()
+        self.assertEqual((cl.result_count, cl.full_result_count, counts), (6, None, []))
+        cl, counts = self.get({'category': self.books.pk, 'o': '1'})
+        self.assertEqual((cl.result_count, counts), (5, []))
+
+    @override_settings(CATALOG_ADMIN_COUNT_LIMIT=3)
+    def test_other_filters_count_up_to_limit(self):
+        cl, counts = self.get({'q': 'учебник'})
+        self.assertEqual(cl.result_count, 3)
+        self.assertEqual(len(counts), 1)
+        self.assertIn('LIMIT 3', counts[0])
+
+    @override_settings(CATALOG_ADMIN_PERFORMANCE_MODE=False)
+    def test_exact_counts_without_performance_mode(self):
+        cl, counts = self.get({'q': 'учебник'})
+        self.assertEqual((cl.result_count, cl.full_result_count, len(counts)), (5, 6, 2))
+
+    def test_category_filter_lists_only_selected(self):
+        response = self.client.get(self.url, {'category': self.sport.pk})
+        self.assertContains(response, 'data-autocomplete-url')
+        self.assertContains(response, '>Спорт</a>')
+        self.assertNotContains(response, '>Книги</a>')
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_invalid_category_filter_is_rejected(self):
+        response = self.client.get(self.url, {'category': 'abc'})
+        self.assertRedirects(response, f'{self.url}?e=1', fetch_redirect_response=False)
+
+
+class PriceHistoryTests(CatalogTestCase):
+    """Журнал цен и сводки за день и месяц"""
+
+    def setUp(self):
+        super().setUp()
+        self.books = Category.objects.create(name='Книги')
+        self.sport = Category.objects.create(name='Спорт')
+
+    def rollup(self, model, category):
+        return model.objects.values_list('change_count', 'price_sum', 'min_price', 'max_price').get(category=category)
+
+    def test_price_changes_written_and_rolled_up(self):
+        product = Product.objects.create(name='Мяч', price=Decimal('10.00'), category=self.sport)
+        product.price = Decimal('30.00')
+        product.save()
+        product.name = 'Футбольный мяч'
+        product.save()  # цена не изменилась - в журнал не пишем
+
+        self.assertEqual(
+            list(PriceHistory.objects.order_by('pk').values_list('old_price', 'price')),
+            [(None, Decimal('10.00')), (Decimal('10.00'), Decimal('30.00'))],
+        )
+        expected = (2, Decimal('40.00'), Decimal('10.00'), Decimal('30.00'))
+        self.assertEqual(self.rollup(DailyPriceRollup, self.sport), expected)
+        self.assertEqual(self.rollup(MonthlyPriceRollup, self.sport), expected)
+        self.assertEqual(MonthlyPriceRollup.objects.get().month, timezone.localdate().replace(day=1))
+
+    def test_batch_costs_constant_queries(self):
+        changes = [
+            PriceChange(None, category.pk, None, Decimal(i + 1))
+            for i, category in enumerate([self.books, self.sport] * 50)
+        ]
+        products = Product.objects.bulk_create(
+            [Product(name=f'Товар {i}', price=c.price, category_id=c.category_id) for i, c in enumerate(changes)]
+        )
+        changes = [change._replace(product_id=p.pk) for change, p in zip(changes, products)]
+        # Журнал одной вставкой + по одной вставке с ON CONFLICT в каждую сводку
+        with self.assertNumQueries(3):
+            self.assertEqual(record_price_changes(changes), 100)
+        self.assertEqual(self.rollup(MonthlyPriceRollup, self.books),
+                         (50, Decimal(sum(range(1, 100, 2))), Decimal(1), Decimal(99)))
+
+    def test_rollups_without_upsert_match(self):
+        changes = [PriceChange(None, self.books.pk, None, Decimal(price)) for price in ('5', '15', '10')]
+        day = timezone.localdate()
+        buckets = price_history._group(changes, day, lambda d: d)
+        price_history._update_or_create(DailyPriceRollup, 'day', buckets, 'default')
+        price_history._update_or_create(DailyPriceRollup, 'day', buckets, 'default')
+        self.assertEqual(self.rollup(DailyPriceRollup, self.books),
+                         (6, Decimal('60.00'), Decimal('5.00'), Decimal('15.00')))
+
+    def test_import_writes_history_per_batch(self):
+        Product.objects.create(name='Роман', price=Decimal('100.00'), category=self.books)
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write('name,price,category\nРоман,150,Книги\nМяч,20,Спорт\n')
+        self.addCleanup(os.remove, path)
+        call_command('import_products', path, upsert=True, stdout=StringIO())
+
+        self.assertEqual(
+            list(PriceHistory.objects.order_by('pk').values_list('product__name', 'old_price', 'price')),
+            [('Роман', None, Decimal('100.00')), ('Роман', Decimal('100.00'), Decimal('150.00')),
+             ('Мяч', None, Decimal('20.00'))],
+        )
+        self.assertEqual(get_price_trends()[0]['change_count'], 3)
+
+
+class FacetTests(CatalogTestCase):
+    """Фасеты списка товаров и индекс PriceFacet"""
+
+    def setUp(self):
+        super().setUp()
+        self.books = Category.objects.create(name='Книги')
+        self.sport = Category.objects.create(name='Спорт')
+        for price, category in [('50', self.books), ('100', self.books), ('499.99', self.books),
+                                ('500', self.sport), ('700', self.sport), ('5000', self.sport), ('60000', self.sport)]:
+            Product.objects.create(name=f'Товар {price}', price=Decimal(price), category=category)
+
+    def counts(self, facets):
+        return ({item['name']: item['count'] for item in facets['categories']},
+                [item['count'] for item in facets['prices']])
+
+    def test_index_kept_in_sync(self):
+        product = Product.objects.get(price=Decimal('700'))
+        product.price = Decimal('1000')  # ровно граница диапазона
+        product.save()
+        product.category = self.books
+        product.save()
+        Product.objects.get(price=Decimal('50')).delete()
+        self.assertEqual(check_price_facets(), [])
+
+    def test_facets_exclude_own_filter(self):
+        facets = get_facets(category=self.sport, min_price=Decimal('100'), max_price=Decimal('5000'))
+        categories, prices = self.counts(facets)
+        # Категории - с учётом цены (100..5000 включительно), гистограмма - только по категории
+        self.assertEqual(categories, {'Спорт': 3, 'Книги': 2})
+        self.assertEqual(prices, [0, 0, 2, 0, 1, 0, 1])
+        self.assertTrue(facets['categories'][0]['selected'])
+
+    def test_index_matches_grouped_query(self):
+        edges = get_price_edges()
+        for min_price, max_price in [(None, None), (Decimal('500'), None), (Decimal('100'), Decimal('999.99')),
+                                     (None, Decimal('5000')), (Decimal('500.01'), Decimal('50000'))]:
+            with self.subTest(min_price=min_price, max_price=max_price):
+                with self.assertNumQueries(2):
+                    indexed = get_facets(min_price=min_price, max_price=max_price)
+                scanned = facets._from_products(None, None, min_price, max_price, edges)
+                self.assertEqual(self.counts(indexed), ({name: n for _, name, n in scanned[0]}, scanned[1]))
+
+    def test_unaligned_range_and_search_use_one_query(self):
+        with self.assertNumQueries(1):
+            categories, prices = self.counts(get_facets(min_price=Decimal('60'), max_price=Decimal('600')))
+        self.assertEqual(categories, {'Книги': 2, 'Спорт': 1})
+        self.assertEqual(prices, [1, 2, 2, 0, 1, 0, 1])
+
+        categories, _ = self.counts(get_facets(q='товар', category=self.books))
+        self.assertEqual(categories, {'Спорт': 4, 'Книги': 3})
+
+    def test_list_view_facet_links(self):
+        response = self.client.get(reverse('product_list'), {'category': self.books.pk, 'page': 1})
+        facets = response.context['facets']
+        books = next(item for item in facets['categories'] if item['id'] == self.books.pk)
+        self.assertEqual(books['query'], '')  # повторный выбор снимает фильтр
+        self.assertEqual(facets['prices'][2]['query'], f'category={self.books.pk}&min_price=500&max_price=999.99')
+
+        response = self.client.get(reverse('product_list') + '?' + facets['prices'][2]['query'])
+        self.assertTrue(response.context['facets']['prices'][2]['selected'])
+        self.assertEqual(response.context['paginator'].count, 0)
+
+
+class VersionedCacheTests(CatalogTestCase):
+    """Read-through кэш с инвалидацией по версиям"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Книги')
+        cls.product = Product.objects.create(name='Война и мир', price=Decimal('899.00'), category=cls.category)
+
+    def test_repeat_reads_hit_cache(self):
+        self.client.get(reverse('analytics'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('analytics'))
+        self.client.get(reverse('product_detail', args=[self.product.pk]))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('product_detail', args=[self.product.pk]))
+
+    def test_product_change_invalidates_list_and_detail(self):
+        list_url = reverse('product_list') + f'?category={self.category.pk}'
+        detail_url = reverse('product_detail', args=[self.product.pk])
+        self.client.get(list_url)
+        self.client.get(detail_url)
+
+        self.product.name = 'Анна Каренина'
+        self.product.save()
+
+        self.assertEqual(self.client.get(list_url).context['products'][0].name, 'Анна Каренина')
+        self.assertEqual(self.client.get(detail_url).context['product'].name, 'Анна Каренина')
+
+    def test_equivalent_filter_params_share_key(self):
+        self.client.get(reverse('product_list'), {'min_price': '10'})
+        with self.assertNumQueries(0):  # список категорий в форме фильтра тоже из кэша
+            self.client.get(reverse('product_list'), {'min_price': '10.00', 'sort_by': '-created_at'})
+
+    def test_other_category_change_keeps_category_page_cached(self):
+        other = Category.objects.create(name='Спорт')
+        url = reverse('category_products', args=[self.category.pk])
+        self.client.get(url)
+        Product.objects.create(name='Мяч', price=Decimal('10.00'), category=other)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+
+class IndexUsageTests(CatalogTestCase):
+    """Ни одна комбинация фильтров/сортировок не должна сканировать всю таблицу"""
+
+    def test_explain_catalog_queries(self):
+        Category.objects.create(name='Книги')
+        call_command('explain_catalog_queries', stdout=StringIO())
+
+    def test_explain_on_empty_database(self):
+        call_command('explain_catalog_queries', stdout=StringIO())
+
+
+class SearchTests(CatalogTestCase):
+    """Полнотекстовый поиск (FTS5)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Электроника')
+        cls.phone = Product.objects.create(
+            name='Смартфон Samsung', description='Современный смартфон с ёмким аккумулятором',
+            price=Decimal('29999.99'), category=cls.category,
+        )
+        cls.laptop = Product.objects.create(
+            name='Ноутбук HP', description='Мощный ноутбук, заряжается как смартфон',
+            price=Decimal('54999.50'), category=cls.category,
+        )
+
+    def search(self, text, **params):
+        response = self.client.get(reverse('product_list'), {'q': text, **params})
+        return [p.pk for p in response.context['products']]
+
+    def test_prefix_case_insensitive_cyrillic(self):
+        self.assertEqual(self.search('СМАРТ'), [self.phone.pk, self.laptop.pk])
+        self.assertEqual(self.search('ноут мощ'), [self.laptop.pk])
+        self.assertEqual(self.search('емким'), [self.phone.pk])
+
+    def test_cursor_mode_keeps_relevance_order(self):
+        # Курсор упорядочил бы по дате (сначала новые) - при поиске по релевантности страницы идут по номеру
+        response = self.client.get(reverse('product_list'), {'q': 'смарт', 'cursor': ''})
+        self.assertFalse(response.context['cursor_mode'])
+        self.assertEqual([p.pk for p in response.context['products']], [self.phone.pk, self.laptop.pk])
+        self.assertEqual(self.search('смарт', sort_by='-created_at', cursor=''), [self.laptop.pk, self.phone.pk])
+
+    def test_api_keeps_relevance_order(self):
+        url = reverse('api_product_list')
+        first = self.client.get(url, {'q': 'смарт', 'fields': 'id', 'limit': 1}).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in first['results'] + second['results']], [self.phone.pk, self.laptop.pk])
+        self.assertIsNone(second['next'])
+        self.assertEqual(self.client.get(second['previous']).json()['results'], first['results'])
+        data = self.client.get(url, {'q': 'смарт', 'fields': 'id', 'sort_by': '-created_at'}).json()
+        self.assertEqual([row['id'] for row in data['results']], [self.laptop.pk, self.phone.pk])
+
+    def test_explicit_sort_overrides_rank(self):
+        self.assertEqual(self.search('смартфон', sort_by='-price'), [self.laptop.pk, self.phone.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.laptop.name = 'Планшет'
+        self.laptop.description = ''
+        self.laptop.save()
+        self.assertEqual(self.search('ноутбук'), [])
+        self.assertEqual(self.search('планшет'), [self.laptop.pk])
+        self.phone.delete()
+        self.assertEqual(self.search('samsung'), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('"смарт* OR (NEAR'), [])
+
+
+class ImportProductsTests(CatalogTestCase):
+    """Пакетный импорт товаров"""
+
+    def setUp(self):
+        super().setUp()
+        self.books = Category.objects.create(name='Книги')
+
+    def write_file(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_csv_import_in_batches(self):
+        rows = ''.join(f'Книга {i},Описание,{100 + i},Книги\n' for i in range(25))
+        path = self.write_file('.csv', 'name,description,price,category\n' + rows)
+        call_command('import_products', path, batch_size=10, stdout=StringIO())
+        self.assertEqual(Product.objects.filter(category=self.books).count(), 25)
+        self.assertEqual(CategoryStats.objects.get(pk=self.books.pk).product_count, 25)
+        self.assertEqual(check_category_stats(), [])
+
+    def test_jsonl_upsert_by_natural_key(self):
+        Product.objects.create(name='Война и мир', price=Decimal('899.00'), category=self.books)
+        path = self.write_file('.jsonl', '\n'.join([
+            '{"name": "Война и мир", "price": "999.00", "category": "Книги"}',
+            '{"name": "Гантели", "price": "1999", "category": "Спорт"}',
+        ]))
+        call_command('import_products', path, upsert=True, create_categories=True, stdout=StringIO())
+        self.assertEqual(Product.objects.get(name='Война и мир').price, Decimal('999.00'))
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(check_category_stats(), [])
+
+    def test_invalid_rows_use_product_form_rules(self):
+        path = self.write_file('.csv', 'name,price,category\n ,10,Книги\nКнига,-5,Книги\nКнига,7,Нет такой\n')
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('import_products', path, max_errors=2, stdout=StringIO(), stderr=err)
+        self.assertIn('Строка 2', err.getvalue())
+        self.assertIn('Цена не может быть отрицательной', err.getvalue())
+        self.assertEqual(Product.objects.count(), 0)
+
+
+class ExportProductsTests(CatalogTestCase):
+    """Потоковая выгрузка каталога"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = Category.objects.create(name='Книги')
+        cls.sport = Category.objects.create(name='Спорт')
+        Product.objects.create(name='Война и мир', price=Decimal('899.00'), category=cls.books)
+        Product.objects.create(name='Мяч', price=Decimal('2499.00'), category=cls.sport)
+
+    def test_csv_stream_with_filters(self):
+        response = self.client.get(reverse('product_export'), {'category': self.books.pk})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,name,description,price,category,created_at,updated_at')
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Война и мир,,899.00,Книги', lines[1])
+
+    def test_invalid_filters_are_rejected(self):
+        response = self.client.get(reverse('product_export'), {'min_price': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('min_price', response.content.decode())
+
+    def test_jsonl_stream(self):
+        response = self.client.get(reverse('product_export'), {'format': 'jsonl', 'sort_by': 'price'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['Война и мир', 'Мяч'])
+
+    def test_unknown_format_rejected(self):
+        self.assertEqual(self.client.get(reverse('product_export'), {'format': 'xml'}).status_code, 400)
+
+    def test_command_output_can_be_imported_back(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        call_command('export_products', output=path, stderr=StringIO())
+        call_command('import_products', path, upsert=True, stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 2)
+
+
+def make_image(name='photo.png', size=(800, 600)):
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class RenditionTests(CatalogTestCase):
+    """Уменьшенные копии изображений товаров"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.category = Category.objects.create(name='Электроника')
+
+    def test_upload_generates_renditions_and_card_uses_them(self):
+        from PIL import Image
+        from .renditions import rendition_name
+        product = Product.objects.create(name='Смартфон', price=Decimal('10.00'),
+                                         category=self.category, image=make_image())
+        # Копии создаются фоновой задачей
+        card = rendition_name(product.image.name, 'card', 'webp')
+        self.assertFalse(default_storage.exists(card))
+        # Карточка без копий попадает в кэш с оригиналом
+        self.assertNotIn('_card.webp', self.client.get(reverse('product_list')).content.decode())
+        for pk in tasks.claim_jobs('test', 10):
+            self.assertTrue(tasks.run_job(pk))
+        with default_storage.open(card) as f:
+            self.assertEqual(Image.open(f).size, (400, 300))
+
+        html = self.client.get(reverse('product_list')).content.decode()
+        self.assertIn('_card.webp', html)
+
+    def test_deleting_products_removes_renditions(self):
+        from .renditions import rendition_name
+        products = [Product.objects.create(name=f'Смартфон {i}', price=Decimal('10.00'),
+                                           category=self.category, image=make_image()) for i in range(3)]
+        for pk in tasks.claim_jobs('test', 10):
+            tasks.run_job(pk)
+        cards = [rendition_name(product.image.name, 'card', 'jpeg') for product in products]
+        self.assertTrue(all(default_storage.exists(card) for card in cards))
+
+        products[0].delete()
+        bulk.delete_products(Product.objects.all(), chunk_size=1)
+        self.assertEqual(Job.objects.filter(name='delete_renditions').count(), 3)
+        for pk in tasks.claim_jobs('test', 10):
+            self.assertTrue(tasks.run_job(pk))
+        self.assertFalse(any(default_storage.exists(card) for card in cards))
+
+    def test_backfill_command(self):
+        from .renditions import rendition_name
+        product = Product.objects.create(name='Смартфон', price=Decimal('10.00'),
+                                         category=self.category, image=make_image())
+        self.assertFalse(default_storage.exists(rendition_name(product.image.name, 'thumb', 'jpeg')))
+        self.client.get(reverse('product_list'))
+        call_command('generate_renditions', workers=1, stdout=StringIO())
+        self.assertTrue(default_storage.exists(rendition_name(product.image.name, 'thumb', 'jpeg')))
+        self.assertIn('_card.webp', self.client.get(reverse('product_list')).content.decode())
+
+
+class TaskQueueTests(CatalogTestCase):
+    """Очередь фоновых задач: дедупликация, повторы, возврат зависших задач"""
+
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+        tasks.task('test_record')(self.calls.append)
+        tasks.task('test_fail')(self.fail_task)
+        self.addCleanup(tasks.registry.pop, 'test_record')
+        self.addCleanup(tasks.registry.pop, 'test_fail')
+
+    def fail_task(self, value):
+        raise ValueError(value)
+
+    def run_ready(self):
+        return [tasks.run_job(pk) for pk in tasks.claim_jobs('test', 10)]
+
+    def test_dedup_by_key_while_pending(self):
+        with self.assertNumQueries(1):
+            tasks.enqueue('test_record', 'a', key='k')
+        tasks.enqueue('test_record', 'b', key='k')
+        tasks.enqueue('test_record', 'c')
+        self.assertEqual(Job.objects.count(), 2)
+
+        self.assertEqual(self.run_ready(), [True, True])
+        self.assertEqual(sorted(self.calls), ['a', 'c'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_retry_with_backoff_then_failed(self):
+        tasks.enqueue('test_fail', 'boom', key='f')
+        with override_settings(CATALOG_TASKS_MAX_ATTEMPTS=2, CATALOG_TASKS_RETRY_DELAY=60), \
+                self.assertLogs('catalog.tasks', 'ERROR'):
+            self.assertEqual(self.run_ready(), [False])
+            job = Job.objects.get()
+            self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+            self.assertGreater(job.run_at, timezone.now() + timezone.timedelta(seconds=50))
+            self.assertEqual(self.run_ready(), [])
+
+            Job.objects.update(run_at=timezone.now())
+            self.assertEqual(self.run_ready(), [False])
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts, job.last_error), (Job.FAILED, 2, 'ValueError: boom'))
+
+    def test_stale_running_job_is_reclaimed(self):
+        tasks.enqueue('test_record', 'x')
+        self.assertEqual(len(tasks.claim_jobs('crashed', 10)), 1)
+        self.assertEqual(tasks.claim_jobs('other', 10), [])
+        Job.objects.update(locked_at=timezone.now() - timezone.timedelta(hours=1))
+        self.assertEqual(self.run_ready(), [True])
+
+    def test_eager_mode_runs_after_commit(self):
+        with override_settings(CATALOG_TASKS_EAGER=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                tasks.enqueue('test_record', 'now')
+        self.assertEqual(self.calls, ['now'])
+        self.assertFalse(Job.objects.exists())
+
+
+class WorkerCommandTests(TransactionTestCase):
+    """run_catalog_worker в пуле потоков видит задачи после коммита"""
+
+    def test_worker_runs_committed_jobs(self):
+        calls = []
+        tasks.task('test_record')(calls.append)
+        self.addCleanup(tasks.registry.pop, 'test_record')
+        for value in range(5):
+            tasks.enqueue('test_record', value)
+        call_command('run_catalog_worker', workers=2, once=True, stdout=StringIO())
+        self.assertEqual(sorted(calls), list(range(5)))
+        self.assertFalse(Job.objects.exists())
+
+
+class JsonApiTests(CatalogTestCase):
+    """JSON API только для чтения"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = Category.objects.create(name='Книги')
+        cls.sport = Category.objects.create(name='Спорт')
+        for i in range(5):
+            Product.objects.create(name=f'Книга {i}', price=Decimal(100 + i), category=cls.books)
+        Product.objects.create(name='Мяч', price=Decimal('2499.00'), category=cls.sport)
+
+    def test_sparse_fields_without_join(self):
+        url = reverse('api_product_list')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'fields': 'id,price', 'sort_by': 'price', 'limit': 2})
+        data = response.json()
+        self.assertEqual(data['results'], [
+            {'id': Product.objects.get(name='Книга 0').pk, 'price': '100.00'},
+            {'id': Product.objects.get(name='Книга 1').pk, 'price': '101.00'},
+        ])
+        self.assertFalse(any('catalog_category' in q['sql'] for q in ctx.captured_queries))
+
+        second = self.client.get(data['next']).json()
+        self.assertEqual([row['price'] for row in second['results']], ['102.00', '103.00'])
+
+    def test_filters_and_validation(self):
+        data = self.client.get(reverse('api_product_list'), {'category': self.sport.pk}).json()
+        self.assertEqual([row['category_name'] for row in data['results']], ['Спорт'])
+        data = self.client.get(reverse('api_product_list'), {'q': 'мяч', 'fields': 'name'}).json()
+        self.assertEqual(data['results'], [{'name': 'Мяч'}])
+        for url in (reverse('api_product_list'), reverse('async_api_product_list')):
+            for params in ({'fields': 'secret'}, {'limit': 'x'}, {'min_price': 'abc'}, {'cursor': 'abc'}):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                # Валидаторы - только у успешных ответов
+                self.assertNotIn('ETag', response)
+
+    def test_conditional_get(self):
+        url = reverse('api_product_list')
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        # Удаление не меняет max(updated_at): Last-Modified у списков не отдаётся
+        self.assertNotIn('Last-Modified', response)
+        self.assertNotIn('Last-Modified', self.client.get(reverse('api_category_list')))
+
+        Product.objects.filter(name='Мяч').delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_detail_and_categories(self):
+        product = Product.objects.get(name='Мяч')
+        url = reverse('api_product_detail', args=[product.pk])
+        response = self.client.get(url, {'fields': 'name'})
+        self.assertEqual(response.json(), {'name': 'Мяч'})
+        self.assertEqual(
+            self.client.get(url, {'fields': 'name'}, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code,
+            304,
+        )
+        self.assertEqual(self.client.get(reverse('api_product_detail', args=[0])).status_code, 404)
+
+        # Переименование категории меняет category_name: 304 больше не отдаётся
+        list_response = self.client.get(reverse('api_product_list'), {'fields': 'id,category_name'})
+        detail_response = self.client.get(url)
+        self.sport.name = 'Спорттовары'
+        self.sport.save()
+        self.assertEqual(self.client.get(reverse('api_product_list'), {'fields': 'id,category_name'},
+                                         HTTP_IF_NONE_MATCH=list_response['ETag']).status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=detail_response['ETag']).status_code, 200)
+
+        categories = self.client.get(reverse('api_category_list'),
+                                     {'fields': 'name,product_count', 'sort_by': '-product_count'}).json()
+        self.assertEqual(categories['results'][0], {'name': 'Книги', 'product_count': 5})
+
+        analytics = self.client.get(reverse('api_analytics')).json()
+        self.assertEqual(analytics['total_products'], 6)
+        self.assertEqual(len(analytics['categories']), 2)
+
+
+class ChangeFeedTests(CatalogTestCase):
+    """Журнал изменений и выдача изменений после курсора"""
+
+    def setUp(self):
+        super().setUp()
+        self.books = Category.objects.create(name='Книги')
+        self.url = reverse('api_changes')
+        self.cursor = self.client.get(self.url).json()['cursor']
+
+    def feed(self, **params):
+        return self.client.get(self.url, {'cursor': self.cursor, **params}).json()
+
+    def test_changes_after_cursor(self):
+        sport = Category.objects.create(name='Спорт')
+        kept = Product.objects.create(name='Мяч', price=Decimal('500.00'), category=sport)
+        kept.price = Decimal('450.00')
+        kept.save()
+        Product.objects.create(name='Удаляемый', price=1, category=sport).delete()
+
+        data = self.feed()
+        self.assertFalse(data['has_more'])
+        # Два изменения товара в одной пачке сворачиваются в последнее
+        self.assertEqual([(row['type'], row['action']) for row in data['results']], [
+            ('category', 'created'), ('product', 'updated'), ('product', 'deleted'),
+        ])
+        self.assertEqual(data['results'][1]['data']['price'], '450.00')
+        self.assertEqual(data['results'][1]['data']['category'], sport.pk)
+        self.assertIsNone(data['results'][2]['data'])
+
+        following = self.client.get(data['next']).json()
+        self.assertEqual(following['results'], [])
+        self.assertEqual(following['cursor'], data['cursor'])
+
+    def test_batches_follow_cursor(self):
+        for i in range(5):
+            Product.objects.create(name=f'Книга {i}', price=100 + i, category=self.books)
+        first = self.feed(limit=3)
+        self.assertTrue(first['has_more'])
+        second = self.client.get(first['next']).json()
+        self.assertFalse(second['has_more'])
+        self.assertEqual(
+            [row['data']['name'] for row in first['results'] + second['results']],
+            [f'Книга {i}' for i in range(5)],
+        )
+
+    def test_bulk_operations_and_import_are_recorded(self):
+        products = [Product.objects.create(name=f'Книга {i}', price=100, category=self.books) for i in range(3)]
+        sport = Category.objects.create(name='Спорт')
+        self.cursor = changes.head()
+
+        bulk.move_products(Product.objects.filter(pk=products[0].pk), sport)
+        bulk.delete_products(Product.objects.filter(pk=products[1].pk))
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write('name,price,category\nКнига 2,150,Книги\nНовая,10,Книги\n')
+        self.addCleanup(os.remove, path)
+        call_command('import_products', path, upsert=True, stdout=StringIO())
+
+        results = {(row['id'], row['action']) for row in self.feed()['results']}
+        self.assertEqual(results, {
+            (products[0].pk, 'updated'), (products[1].pk, 'deleted'), (products[2].pk, 'updated'),
+            (Product.objects.get(name='Новая').pk, 'created'),
+        })
+
+    def test_pruned_cursor_is_rejected(self):
+        Product.objects.create(name='Старый', price=1, category=self.books)
+        Product.objects.create(name='Новый', price=2, category=self.books)
+        old = CatalogChange.objects.filter(pk__lte=self.cursor + 1).update(changed_at=timezone.now() - timezone.timedelta(days=60))
+        self.assertEqual(changes.prune(days=30), old)
+
+        response = self.client.get(self.url, {'cursor': self.cursor})
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(len(self.feed(cursor=self.cursor + 1)['results']), 1)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'abc'}).status_code, 400)
+
+    def test_gap_without_prune_is_not_expired(self):
+        # Откаченная транзакция оставляет пропуск в номерах - это не очистка журнала
+        Product.objects.create(name='Откачен', price=1, category=self.books)
+        Product.objects.create(name='Новый', price=2, category=self.books)
+        CatalogChange.objects.filter(pk=self.cursor + 1).delete()
+        self.assertEqual(len(self.feed()['results']), 1)
+        self.assertEqual(self.client.get(self.url, {'cursor': 0}).status_code, 200)
+
+    def test_head_after_full_prune(self):
+        Product.objects.create(name='Старый', price=1, category=self.books)
+        CatalogChange.objects.update(changed_at=timezone.now() - timezone.timedelta(days=60))
+        changes.prune(days=30)
+        self.assertEqual(changes.head(), self.cursor + 1)
+        self.assertEqual(self.client.get(self.url, {'cursor': changes.head()}).status_code, 200)
+
+    def test_export_changes_command(self):
+        Product.objects.create(name='Мяч', price=1, category=self.books)
+        out, err = StringIO(), StringIO()
+        call_command('export_changes', cursor=self.cursor, stdout=out, stderr=err)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([(row['type'], row['action'], row['data']['name']) for row in rows],
+                         [('product', 'created', 'Мяч')])
+        self.assertIn(f'курсор: {changes.head()}', err.getvalue())
+
+
+class AsyncViewsTests(CatalogTestCase):
+    """Асинхронные представления отдают то же, что синхронные"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = Category.objects.create(name='Книги')
+        for i in range(12):
+            Product.objects.create(name=f'Книга {i:02}', price=Decimal(100 + i), category=cls.books)
+
+    async def test_product_list_matches_sync(self):
+        for params in ({'sort_by': 'price', 'page': 2}, {'sort_by': '-name', 'cursor': ''}):
+            sync_response = await sync_to_async(self.client.get)(reverse('product_list'), params)
+            async_response = await self.async_client.get(reverse('async_product_list'), params)
+            self.assertEqual(
+                [p.pk for p in async_response.context['products']],
+                [p.pk for p in sync_response.context['products']],
+            )
+        response = await self.async_client.get(reverse('async_product_list'), {'page': 99})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_detail_and_category_products(self):
+        product = await Product.objects.afirst()
+        response = await self.async_client.get(reverse('async_product_detail', args=[product.pk]))
+        self.assertEqual(response.context['product'], product)
+        response = await self.async_client.get(reverse('async_product_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+        response = await self.async_client.get(reverse('async_category_products', args=[self.books.pk]))
+        self.assertEqual(len(response.context['products']), 10)
+        self.assertEqual(response.context['paginator'].count, 12)
+        response = await self.async_client.get(reverse('async_category_products', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_conditional_get(self):
+        product = await Product.objects.afirst()
+        for url in (reverse('async_product_list'), reverse('async_product_detail', args=[product.pk]),
+                    reverse('async_category_products', args=[self.books.pk])):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response['Cache-Control'], 'public, no-cache')
+                response = await self.async_client.get(url, headers={'if-none-match': response['ETag']})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+
+    async def test_json_reads(self):
+        url = reverse('async_api_product_list')
+        response = await self.async_client.get(url, {'fields': 'name', 'sort_by': 'name', 'limit': 3})
+        self.assertEqual([row['name'] for row in response.json()['results']], ['Книга 00', 'Книга 01', 'Книга 02'])
+        response = await self.async_client.get(url, {'fields': 'name', 'sort_by': 'name', 'limit': 3},
+                                               headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual((await self.async_client.post(url)).status_code, 405)
+
+        response = await self.async_client.get(reverse('async_api_analytics'))
+        self.assertEqual(response.json()['total_products'], 12)
+        response = await self.async_client.get(reverse('async_analytics'))
+        self.assertEqual(response.context['total_products'], 12)
+
+
+class PerfMiddlewareTests(CatalogTestCase):
+    """Метрики запросов по представлениям"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = Category.objects.create(name='Книги')
+        for i in range(6):
+            Product.objects.create(name=f'Книга {i}', price=Decimal(100 + i), category=cls.books)
+
+    def setUp(self):
+        super().setUp()
+        perf.registry.reset()
+
+    def test_records_queries_and_template_time_per_view(self):
+        self.client.get(reverse('product_list'))
+        self.client.get(reverse('analytics'))
+        snapshot = perf.registry.snapshot()
+        self.assertEqual(set(snapshot), {'product_list', 'analytics'})
+        self.assertGreater(snapshot['product_list']['queries']['max'], 0)
+        self.assertGreater(snapshot['product_list']['template_ms']['max'], 0)
+        self.assertEqual(snapshot['product_list']['nplusone'], [])
+
+    async def test_async_views_are_recorded(self):
+        await self.async_client.get(reverse('async_product_list'))
+        snapshot = perf.registry.snapshot()
+        self.assertGreater(snapshot['async_product_list']['queries']['max'], 0)
+
+    def test_nplusone_detection(self):
+        stats, token = perf.start_request()
+        try:
+            for product in Product.objects.all():
+                Product.objects.filter(pk=product.pk).values_list('name').first()
+        finally:
+            perf.finish_request(token)
+        self.assertEqual(stats.queries, 7)
+        self.assertEqual(len(stats.nplusone_suspects()), 1)
+
+    def test_internal_endpoint_and_report(self):
+        self.assertEqual(self.client.get(reverse('perf_metrics')).status_code, 404)
+        with override_settings(DEBUG=True):
+            data = self.client.get(reverse('perf_metrics')).json()
+        self.assertIn('perf_metrics', data)
+
+        out = StringIO()
+        call_command('perf_report', path=[reverse('product_list')], repeat=2, stdout=out)
+        self.assertIn('product_list', out.getvalue())
+
+
+class BenchmarkSuiteTests(CatalogTestCase):
+    """Генератор данных и прогон замеров"""
+
+    def test_generator_is_deterministic(self):
+        generate_catalog(300, categories=5, seed=7, batch_size=100)
+        first = list(Product.objects.order_by('name').values_list('name', 'price', 'category__name'))
+        # Сброс - по DELETE на таблицу, без загрузки товаров и сигналов на каждую строку
+        with CaptureQueriesContext(connection) as ctx:
+            reset_catalog()
+        self.assertLess(len(ctx), 30)
+        self.assertFalse(Product.objects.exists())
+        self.assertEqual(check_category_stats(), [])
+        generate_catalog(300, categories=5, seed=7, batch_size=100)
+        second = list(Product.objects.order_by('name').values_list('name', 'price', 'category__name'))
+        self.assertEqual(first, second)
+        self.assertEqual(check_category_stats(), [])
+        # Даты задаются генератором, а не auto_now_add
+        self.assertGreater(Product.objects.values('created_at').distinct().count(), 1)
+
+    def test_cases_run_within_query_budgets(self):
+        generate_catalog(200, categories=5, seed=1)
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        write_import_file(path, 50)
+
+        cases = [case for case in build_cases(path) if not case.name.startswith('list/')]
+        with override_settings(CATALOG_CACHE_ENABLED=False):
+            results = BenchmarkRunner(self.client, repeat=1, warmup=0).run(cases)
+        self.assertEqual({name: r for name, r in results.items() if not r['ok']}, {})
+
+        rows = compare_results({'results': results}, {'results': results})
+        self.assertTrue(all(change == 0 for _, _, _, change, _, _ in rows))
+
+    def test_concurrency_benchmark(self):
+        results = run_concurrency_benchmark(['default', 'tuned'], products=50, threads=2, operations=10)
+        self.assertEqual(results['tuned']['locked_writes'], 0)
+        self.assertEqual(set(results), {'default', 'tuned'})
+
+
+class SqliteBackendTests(CatalogTestCase):
+    """PRAGMA и режим транзакций бэкенда catalog.backends.sqlite3"""
+
+    def test_pragmas_applied_on_connect(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+
+class SqliteTransactionModeTests(TransactionTestCase):
+    """Вне транзакции теста: atomic() начинается с BEGIN IMMEDIATE"""
+
+    def test_immediate_transactions(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with transaction.atomic():
+                Category.objects.create(name='Новая')
+        self.assertIn('BEGIN IMMEDIATE', [query['sql'] for query in ctx.captured_queries])
+
+
+class ReplicaRoutingTests(CatalogTestCase):
+    """Чтение каталога с реплик и возврат к основной базе после записи"""
+
+    def route_read(self, request):
+        seen = []
+
+        def get_response(request):
+            seen.append(router.db_for_read(Product))
+            return HttpResponse()
+
+        response = ReplicaMiddleware(get_response)(request)
+        return seen[0], response
+
+    @override_settings(CATALOG_READ_REPLICAS=['replica_1'])
+    def test_reads_go_to_replica_until_write(self):
+        state, token = routers.start_request(use_replica=True)
+        self.addCleanup(routers.finish_request, token)
+        self.assertEqual(router.db_for_read(Product), 'replica_1')
+        self.assertEqual(router.db_for_read(Session), 'default')
+
+        product = Product(name='С реплики', price=1)
+        product._state.db = 'replica_1'
+        self.assertEqual(router.db_for_write(Product, instance=product), 'default')
+        self.assertTrue(state.wrote)
+        self.assertEqual(router.db_for_read(Product), 'default')
+
+    @override_settings(CATALOG_READ_REPLICAS=['replica_1'])
+    def test_non_catalog_write_keeps_replica(self):
+        state, token = routers.start_request(use_replica=True)
+        self.addCleanup(routers.finish_request, token)
+        self.assertEqual(router.db_for_write(Session), 'default')
+        self.assertFalse(state.wrote)
+        self.assertEqual(router.db_for_read(Product), 'replica_1')
+
+    @override_settings(CATALOG_READ_REPLICAS=['replica_1'])
+    def test_middleware_uses_replica_for_safe_requests(self):
+        factory = RequestFactory()
+        self.assertEqual(self.route_read(factory.get('/products/'))[0], 'replica_1')
+        self.assertEqual(self.route_read(factory.post('/products/create/'))[0], 'default')
+
+        request = factory.get('/products/')
+        request.COOKIES[routers.STICKY_COOKIE] = '1'
+        self.assertEqual(self.route_read(request)[0], 'default')
+        # Вне запроса - основная база
+        self.assertEqual(router.db_for_read(Product), 'default')
+
+    @override_settings(CATALOG_READ_REPLICAS=['default'])
+    def test_write_sets_sticky_cookie(self):
+        category = Category.objects.create(name='Книги')
+        response = self.client.post(reverse('product_create'), {
+            'name': 'Новый', 'description': '', 'price': '10.00', 'category': category.pk,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.cookies[routers.STICKY_COOKIE]['max-age'], 15)
+
+        self.client.cookies.pop(routers.STICKY_COOKIE)
+        response = self.client.get(reverse('product_list'))
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+
+class CategoryProductsTests(CatalogTestCase):
+    """Постраничный список товаров категории"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = Category.objects.create(name='Книги')
+        cls.sport = Category.objects.create(name='Спорт')
+        for i in range(25):
+            Product.objects.create(name=f'Книга {i:02}', price=Decimal(100 + i), category=cls.books)
+        Product.objects.create(name='Мяч', price=Decimal('10.00'), category=cls.sport)
+
+    def test_paginated_with_stats_count_and_card_columns(self):
+        url = reverse('category_products', args=[self.books.pk])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'sort_by': 'price'})
+        # Заголовок с числом товаров + строки страницы, без COUNT(*)
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+
+        products = list(response.context['products'])
+        self.assertEqual([p.name for p in products], [f'Книга {i:02}' for i in range(10)])
+        self.assertEqual(response.context['paginator'].num_pages, 3)
+        self.assertEqual(response.context['category'].product_count, 25)
+        self.assertIn('Товаров в этой категории: 25', response.content.decode())
+
+    def test_filters_and_cursor_mode(self):
+        url = reverse('category_products', args=[self.books.pk])
+        response = self.client.get(url, {'min_price': '120', 'sort_by': '-price'})
+        self.assertEqual([p.name for p in response.context['products']],
+                         ['Книга 24', 'Книга 23', 'Книга 22', 'Книга 21', 'Книга 20'])
+        self.assertEqual(response.context['paginator'].count, 5)
+
+        # Чужие товары в категорию не попадают даже с параметром category
+        response = self.client.get(url, {'category': self.sport.pk, 'cursor': ''})
+        self.assertNotIn('Мяч', [p.name for p in response.context['products']])
+        self.assertTrue(response.context['page_obj'].has_next())
+
+        self.assertEqual(self.client.get(reverse('category_products', args=[0])).status_code, 404)
+
+
+class ConditionalGetTests(CatalogTestCase):
+    """ETag/Last-Modified страниц каталога и ответ 304 без отрисовки шаблона"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = Category.objects.create(name='Книги')
+        cls.product = Product.objects.create(name='Война и мир', price=Decimal('899.00'), category=cls.books)
+        Product.objects.create(name='Анна Каренина', price=Decimal('599.00'), category=cls.books)
+
+    def assertNotModified(self, url, params=None, **headers):
+        response = self.client.get(url, params or {}, **headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+        return response
+
+    def test_product_detail(self):
+        url = reverse('product_detail', args=[self.product.pk])
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        self.assertNotModified(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertNotModified(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+
+        # Название категории выводится на странице товара
+        self.books.name = 'Романы'
+        self.books.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_product_list(self):
+        url = reverse('product_list')
+        for params in [{}, {'category': self.books.pk, 'sort_by': 'price'}, {'cursor': ''}]:
+            with self.subTest(params=params):
+                etag = self.client.get(url, params)['ETag']
+                self.assertNotIn('Last-Modified', self.client.get(url, params))
+                self.assertNotModified(url, params, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(self.client.get(url, {**params, 'page': 1}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(url)['ETag']
+        Product.objects.get(name='Анна Каренина').delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_category_products(self):
+        url = reverse('category_products', args=[self.books.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, HTTP_IF_NONE_MATCH=etag)
+        self.product.price = Decimal('999.00')
+        self.product.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_page_with_message_is_not_cached(self):
+        response = self.client.post(reverse('product_update', args=[self.product.pk]), {
+            'name': 'Война и мир', 'description': '', 'price': '799.00', 'category': self.books.pk,
+        }, follow=True)
+        self.assertContains(response, 'Товар успешно обновлен!')
+        self.assertNotIn('ETag', response)
+        self.assertIn('no-store', response['Cache-Control'])
+
+    @override_settings(CATALOG_HTTP_CACHE_CONTROL={'public': True, 'max_age': 0, 's_maxage': 30})
+    def test_cache_control_setting(self):
+        response = self.client.get(reverse('product_detail', args=[self.product.pk]))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=0, s-maxage=30')
+
+
+class CategoryChoicesTests(CatalogTestCase):
+    """Варианты категорий в формах: кэш и автодополнение"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [Category.objects.create(name=f'Категория {i:02}') for i in range(5)]
+
+    def test_choices_cached_until_category_changes(self):
+        self.client.get(reverse('product_list'))
+        Product.objects.create(name='Мяч', price=Decimal('10.00'), category=self.categories[0])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('product_create'))
+        self.assertFalse(any('"catalog_category"' in q['sql'] for q in ctx.captured_queries))
+
+        Category.objects.create(name='Новая')
+        response = self.client.get(reverse('product_create'))
+        self.assertContains(response, '>Новая</option>')
+
+    @override_settings(CATALOG_CATEGORY_CHOICES_LIMIT=3)
+    def test_large_category_set_renders_selected_only(self):
+        selected = self.categories[4]
+        response = self.client.get(reverse('product_list'), {'category': selected.pk})
+        field = response.context['filter_form']['category']
+        html = str(field)
+        self.assertIn(f'data-autocomplete-url="{reverse("api_category_autocomplete")}"', html)
+        self.assertIn(f'<option value="{selected.pk}" selected>Категория 04</option>', html)
+        self.assertNotIn('Категория 00', html)
+
+        # Проверка выбранной категории по-прежнему идёт по queryset
+        form = ProductForm(data={'name': 'Мяч', 'price': '10', 'category': self.categories[0].pk})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertNotIn('Категория 01', str(form['category']))
+
+    def test_autocomplete(self):
+        url = reverse('api_category_autocomplete')
+        data = self.client.get(url, {'q': 'ория 0', 'limit': 2}).json()
+        self.assertEqual(data['results'], [
+            {'id': self.categories[0].pk, 'name': 'Категория 00'},
+            {'id': self.categories[1].pk, 'name': 'Категория 01'},
+        ])
+        self.assertEqual(self.client.get(url, {'q': 'нет такой'}).json(), {'results': []})
+        self.assertEqual(self.client.get(url, {'limit': 'x'}).status_code, 400)
+
+
+class ProductCardCacheTests(CatalogTestCase):
+    """Кэш фрагментов карточек товаров"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Книги')
+        cls.product = Product.objects.create(name='Роман', price=Decimal('100.00'), category=cls.category)
+
+    def card_key(self, product):
+        product.refresh_from_db()
+        return make_template_fragment_key(
+            'product_card', [product.pk, product.updated_at, product.category.updated_at]
+        )
+
+    def test_card_cached_by_updated_at(self):
+        self.client.get(reverse('product_list'))
+        self.assertIn('Роман', cache.get(self.card_key(self.product)))
+
+        self.product.name = 'Повесть'
+        self.product.save()
+        self.assertIsNone(cache.get(self.card_key(self.product)))
+        self.assertContains(self.client.get(reverse('product_list')), 'Повесть')
+
+        # Переименование категории меняет ключ карточки с её названием
+        self.category.name = 'Художественная литература'
+        self.category.save()
+        self.assertContains(self.client.get(reverse('product_list')), 'Художественная литература')
+
+    @override_settings(CATALOG_CACHE_ENABLED=False)
+    def test_cards_not_cached_when_cache_disabled(self):
+        self.client.get(reverse('product_list'))
+        self.assertIsNone(cache.get(self.card_key(self.product)))
+
+    def test_cached_template_loader(self):
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertIsInstance(loader, CachedLoader)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, async_views, views
 
 urlpatterns = [
     # Главная страница
@@ -9,6 +9,7 @@ urlpatterns = [
     path('', views.ProductListView.as_view(), name='product_list'),
     path('products/', views.ProductListView.as_view(), name='product_list'),
     path('products/create/', views.ProductCreateView.as_view(), name='product_create'),
+    path('products/export/', views.export_products_view, name='product_export'),
     path('products/<int:pk>/', views.ProductDetailView.as_view(), name='product_detail'),
     path('products/<int:pk>/update/', views.ProductUpdateView.as_view(), name='product_update'),
     path('products/<int:pk>/delete/', views.ProductDeleteView.as_view(), name='product_delete'),
@@ -22,4 +23,24 @@ urlpatterns = [
     
     # Analytics URLs
     path('analytics/', views.analytics_view, name='analytics'),
-]
\ No newline at end of file
+
+    # JSON API (только чтение)
+    path('api/products/', api.product_list_api, name='api_product_list'),
+    path('api/products/<int:pk>/', api.product_detail_api, name='api_product_detail'),
+    path('api/categories/', api.category_list_api, name='api_category_list'),
+    path('api/categories/autocomplete/', api.category_autocomplete_api, name='api_category_autocomplete'),
+    path('api/analytics/', api.analytics_api, name='api_analytics'),
+    path('api/changes/', api.change_feed_api, name='api_changes'),
+
+    # Метрики производительности (внутренняя страница)
+    path('internal/perf/', views.perf_metrics_view, name='perf_metrics'),
+
+    # Асинхронные версии представлений чтения (для запуска под ASGI)
+    path('async/products/', async_views.AsyncProductListView.as_view(), name='async_product_list'),
+    path('async/products/<int:pk>/', async_views.AsyncProductDetailView.as_view(), name='async_product_detail'),
+    path('async/categories/<int:pk>/products/', async_views.category_products_view, name='async_category_products'),
+    path('async/analytics/', async_views.analytics_view, name='async_analytics'),
+    path('async/api/products/', async_views.product_list_api, name='async_api_product_list'),
+    path('async/api/products/<int:pk>/', async_views.product_detail_api, name='async_api_product_detail'),
+    path('async/api/analytics/', async_views.analytics_api, name='async_api_analytics'),
+]
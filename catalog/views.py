@@ -1,73 +1,250 @@
-from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Count, Sum, Avg, Min, Max
+from django.shortcuts import get_object_or_404, redirect
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from django.contrib import messages
-from django.http import JsonResponse
+from django.contrib.messages import get_messages
+from django.conf import settings
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.utils.cache import add_never_cache_headers, get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
 from .models import Product, Category
-from .forms import ProductForm, CategoryForm, ProductFilterForm, CategoryFilterForm, AnalyticsFilterForm
+from .forms import (
+    ProductForm, CategoryForm, CategoryDeleteForm, ProductFilterForm, CategoryFilterForm, AnalyticsFilterForm,
+    CategoryProductFilterForm,
+)
+from .pagination import KeysetPaginator, CachedPaginator, InvalidCursor
+from .analytics import get_catalog_summary, get_catalog_totals
+from .cache import CATEGORY_LIST, CacheScope, get_card_timeout, get_version
+from .facets import PRICE_STEP
+from .exporters import CONTENT_TYPES, available_formats, export_stream
+from . import api, bulk, perf
+
+# Cache-Control страниц с условным GET: public + no-cache - прокси хранит страницу,
+# но каждый раз проверяет её условным запросом и при 304 отдаёт сохранённую
+DEFAULT_CACHE_CONTROL = {'public': True, 'no_cache': True}
+
+
+def get_cache_control():
+    return getattr(settings, 'CATALOG_HTTP_CACHE_CONTROL', DEFAULT_CACHE_CONTROL)
+
+
+class ConditionalGetMixin:
+    """
+    Условный GET до отрисовки шаблона. TemplateResponse отрисовывается после
+    get(), поэтому ETag и Last-Modified считаются по данным контекста - уже
+    выбранным строкам страницы - и на совпадающий If-None-Match или
+    If-Modified-Since отдаётся 304 без отрисовки. В отличие от
+    ConditionalGetMiddleware, которому для ETag нужно готовое тело ответа.
+    Async-версии представлений (async_views.py) вызывают make_conditional() в потоке.
+    """
+
+    def get_conditional_state(self, context):
+        """(Last-Modified или None, части ETag) или None - без условных заголовков"""
+        return None
+
+    def get(self, request, *args, **kwargs):
+        return self.make_conditional(request, super().get(request, *args, **kwargs))
+
+    def make_conditional(self, request, response):
+        """Заголовки кэширования для ещё не отрисованного TemplateResponse или 304 вместо него"""
+        if len(get_messages(request)):
+            # Страница с сообщением после действия - для одного пользователя: не кэшируется
+            add_never_cache_headers(response)
+            return response
+
+        state = self.get_conditional_state(response.context_data)
+        etag = timestamp = None
+        if state is not None:
+            last_modified, parts = state
+            etag = quote_etag(api.make_etag(*parts, request.GET.urlencode()))
+            response.headers['ETag'] = etag
+            if last_modified:
+                timestamp = int(last_modified.timestamp())
+                response.headers['Last-Modified'] = http_date(timestamp)
+        patch_cache_control(response, **get_cache_control())
+        # 304 переносит ETag и Cache-Control из ответа; шаблон так и не отрисовывается
+        return get_conditional_response(request, etag=etag, last_modified=timestamp, response=response)
 
-from django.shortcuts import render
-from django.db.models import Count, Sum
-from .models import Product, Category
 
 def home_view(request):
     """Главная страница с общей статистикой"""
-    total_products = Product.objects.count()
-    total_categories = Category.objects.count()
-    total_value = Product.objects.aggregate(total=Sum('price'))['total'] or 0
-    
-    context = {
-        'total_products': total_products,
-        'total_categories': total_categories,
-        'total_value': total_value,
-    }
-    return render(request, 'catalog/home.html', context)
+    context = CacheScope('home').get_or_set({}, get_catalog_totals)
+    return TemplateResponse(request, 'catalog/home.html', context)
 
 # Product CRUD Views
-class ProductListView(ListView):
+class ProductListView(ConditionalGetMixin, ListView):
     """Список товаров с фильтрацией и сортировкой"""
     model = Product
     template_name = 'catalog/product_list.html'
     context_object_name = 'products'
     paginate_by = 10
+    filter_form_class = ProductFilterForm
+    # Параметр запроса, включающий курсорную (keyset) пагинацию
+    cursor_param = 'cursor'
+    # Счётчики категорий и гистограмма цен над списком
+    show_facets = True
+
+    def get_filter_form(self):
+        if not hasattr(self, '_filter_form'):
+            self._filter_form = self.filter_form_class(self.request.GET)
+        return self._filter_form
 
     def get_queryset(self):
         queryset = Product.objects.select_related('category').all()
-        
+
         # Применяем фильтры
-        form = ProductFilterForm(self.request.GET)
-        if form.is_valid():
-            category = form.cleaned_data.get('category')
-            min_price = form.cleaned_data.get('min_price')
-            max_price = form.cleaned_data.get('max_price')
-            sort_by = form.cleaned_data.get('sort_by') or '-created_at'
-
-            if category:
-                queryset = queryset.filter(category=category)
-            if min_price:
-                queryset = queryset.filter(price__gte=min_price)
-            if max_price:
-                queryset = queryset.filter(price__lte=max_price)
-            
-            queryset = queryset.order_by(sort_by)
-        
-        return queryset
+        return self.get_filter_form().filter_queryset(queryset)
+
+    def is_cursor_mode(self):
+        """Курсорный режим включается параметром ?cursor= или настройкой CATALOG_PAGINATION"""
+        if self.get_filter_form().is_relevance_ordered():
+            # Ключ курсора - поле сортировки; у ранга поиска его нет, поэтому страницы - по номеру
+            return False
+        if self.cursor_param in self.request.GET:
+            return True
+        return getattr(settings, 'CATALOG_PAGINATION', 'offset') == 'cursor'
+
+    def get_cache_params(self):
+        form = self.get_filter_form()
+        params = dict(form.cleaned_data) if form.is_valid() else {}
+        params['sort_by'] = form.get_sort_by()
+        return params
+
+    def get_cache_scope(self):
+        """Ключи кэша по нормализованным параметрам фильтра; при фильтре по категории - её версия"""
+        params = self.get_cache_params()
+        category = params.get('category')
+        return CacheScope('product_list', params, category_id=category.pk if category else None)
+
+    def get_facets(self):
+        """Фасеты текущих фильтров (из кэша) со ссылками, включающими и снимающими фильтр"""
+        if not hasattr(self, '_facets'):
+            params = self.get_cache_params()
+            params.pop('sort_by')
+            facets = CacheScope('product_facets', params).get_or_set({}, self.get_filter_form().get_facets)
+            self._facets = {
+                'categories': [
+                    {**item, 'query': self.facet_query(category=None if item['selected'] else item['id'])}
+                    for item in facets['categories']
+                ],
+                'prices': [
+                    {**item, 'query': self.facet_query(
+                        min_price=None if item['selected'] else item['min'],
+                        max_price=None if item['selected'] or item['max'] is None else item['max'] - PRICE_STEP,
+                    )}
+                    for item in facets['prices']
+                ],
+            }
+        return self._facets
+
+    def facet_query(self, **changes):
+        """Строка запроса с изменёнными фильтрами (None - снять фильтр), с первой страницы"""
+        params = self.request.GET.copy()
+        params.pop(self.page_kwarg, None)
+        if self.cursor_param in params:
+            params[self.cursor_param] = ''
+        for name, value in changes.items():
+            if value is None:
+                params.pop(name, None)
+            else:
+                params[name] = value
+        return params.urlencode()
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        return CachedPaginator(
+            queryset, per_page, self.get_cache_scope(),
+            orphans=orphans, allow_empty_first_page=allow_empty_first_page, **kwargs
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.is_cursor_mode():
+            return super().paginate_queryset(queryset, page_size)
+
+        # Без COUNT(*) и OFFSET: страница выбирается по ключу сортировки
+        paginator = KeysetPaginator(queryset, page_size, self.get_filter_form().get_sort_by())
+        cursor = self.request.GET.get(self.cursor_param)
+        try:
+            page = self.get_cache_scope().get_or_set(
+                {'part': 'cursor', 'cursor': cursor, 'per_page': page_size},
+                lambda: paginator.page(cursor),
+            )
+        except InvalidCursor:
+            raise Http404('Некорректный курсор страницы')
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_page_state(self, context):
+        """Число товаров под фильтром и товары страницы: изменение, добавление или удаление меняет ETag"""
+        page = context['page_obj']
+        count = None if context['cursor_mode'] else page.paginator.count
+        return [count, [(product.pk, product.updated_at) for product in page.object_list]]
+
+    def get_conditional_state(self, context):
+        """
+        Last-Modified не отдаётся: удаление товара не меняет max(updated_at).
+        Названия категорий - в карточках (updated_at категории) и в вариантах формы (версия списка категорий).
+        """
+        categories = {product.category_id: product.category.updated_at for product in context['page_obj'].object_list}
+        parts = self.get_page_state(context) + [sorted(categories.items()), get_version(CATEGORY_LIST)]
+        if self.show_facets:
+            parts.append(context['facets'])
+        return None, parts
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['filter_form'] = ProductFilterForm(self.request.GET)
-        context['categories'] = Category.objects.all()
+        context['filter_form'] = self.get_filter_form()
+        context['cursor_mode'] = self.is_cursor_mode()
+        context['card_cache_timeout'] = get_card_timeout()
+        if self.show_facets:
+            context['facets'] = self.get_facets()
+        page = context.get('page_obj')
+        if page is not None and not context['cursor_mode']:
+            # Номера страниц с пропусками: разметка не растёт с числом страниц
+            context['page_range'] = page.paginator.get_elided_page_range(page.number)
+
+        # Параметры фильтров для ссылок пагинации
+        params = self.request.GET.copy()
+        params.pop(self.page_kwarg, None)
+        params.pop(self.cursor_param, None)
+        context['query_string'] = params.urlencode()
         return context
 
 
-class ProductDetailView(DetailView):
+def export_products_view(request):
+    """Потоковая выгрузка товаров с фильтрами ProductFilterForm (?format=csv|jsonl|parquet)"""
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in available_formats():
+        return HttpResponseBadRequest(f'Формат "{file_format}" недоступен')
+
+    form = ProductFilterForm(request.GET)
+    if not form.is_valid():
+        # Иначе неверный фильтр отбрасывается и выгружается весь каталог
+        return HttpResponseBadRequest(f'Некорректные фильтры: {form.errors.as_text()}')
+    queryset = form.filter_queryset(Product.objects.all())
+    response = StreamingHttpResponse(export_stream(queryset, file_format), content_type=CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="products.{file_format}"'
+    return response
+
+
+class ProductDetailView(ConditionalGetMixin, DetailView):
     """Детальная информация о товаре"""
     model = Product
+    queryset = Product.objects.select_related('category')
     template_name = 'catalog/product_detail.html'
     context_object_name = 'product'
 
+    def get_object(self, queryset=None):
+        scope = CacheScope('product_detail', {'pk': self.kwargs.get(self.pk_url_kwarg)})
+        return scope.get_or_set({}, lambda: super(ProductDetailView, self).get_object(queryset))
+
+    def get_conditional_state(self, context):
+        product = context['product']
+        last_modified = max(product.updated_at, product.category.updated_at)
+        return last_modified, [product.pk, last_modified]
+
 
 class ProductCreateView(CreateView):
     """Создание нового товара"""
@@ -100,24 +277,12 @@ class ProductDeleteView(DeleteView):
     success_url = reverse_lazy('product_list')
     context_object_name = 'product'
 
-    def delete(self, request, *args, **kwargs):
+    def form_valid(self, form):
         messages.success(self.request, 'Товар успешно удален!')
-        return super().delete(request, *args, **kwargs)
+        return super().form_valid(form)
 
 
 # Category CRUD Views
-class CategoryListView(ListView):
-    """Список категорий"""
-    model = Category
-    template_name = 'catalog/category_list.html'
-    context_object_name = 'categories'
-
-    def get_queryset(self):
-        return Category.objects.annotate(
-            product_count=Count('products')
-        ).order_by('name')
-
-
 class CategoryCreateView(CreateView):
     """Создание новой категории"""
     model = Category
@@ -148,52 +313,81 @@ class CategoryDeleteView(DeleteView):
     template_name = 'catalog/category_confirm_delete.html'
     success_url = reverse_lazy('category_list')
     context_object_name = 'category'
+    form_class = CategoryDeleteForm
+
+    def get_queryset(self):
+        return Category.objects.select_related('stats')
+
+    def get_form_kwargs(self):
+        return {**super().get_form_kwargs(), 'category': self.object}
 
-    def delete(self, request, *args, **kwargs):
-        messages.success(self.request, 'Категория успешно удалена!')
-        return super().delete(request, *args, **kwargs)
+    def form_valid(self, form):
+        # Товары удаляются или переносятся пачками (catalog/bulk.py), а не через Collector
+        reassign_to = form.cleaned_data['reassign_to']
+        count = bulk.delete_category(self.object, reassign_to=reassign_to)
+        if reassign_to is not None:
+            messages.success(self.request, f'Категория успешно удалена! Товаров перенесено в «{reassign_to}»: {count}')
+        else:
+            messages.success(self.request, 'Категория успешно удалена!')
+        return redirect(self.get_success_url())
 
 
-# Analytics Views
-def analytics_view(request):
-    """Страница аналитики с агрегатными данными"""
-    # Общая статистика по всем товарам
-    total_products = Product.objects.count()
-    total_value = Product.objects.aggregate(total=Sum('price'))['total'] or 0
-    avg_price = Product.objects.aggregate(avg=Avg('price'))['avg'] or 0
-    min_price = Product.objects.aggregate(min=Min('price'))['min'] or 0
-    max_price = Product.objects.aggregate(max=Max('price'))['max'] or 0
-
-    # Статистика по категориям
-    categories_stats = Category.objects.annotate(
-        product_count=Count('products'),
-        total_value=Sum('products__price'),
-        avg_price=Avg('products__price'),
-        min_price=Min('products__price'),
-        max_price=Max('products__price')
-    ).order_by('name')
-
-    context = {
-        'total_products': total_products,
-        'total_value': total_value,
-        'avg_price': avg_price,
-        'min_price': min_price,
-        'max_price': max_price,
-        'categories_stats': categories_stats,
-    }
-    return render(request, 'catalog/analytics.html', context)
-
-
-def category_products_view(request, pk):
-    """Товары конкретной категории"""
-    category = get_object_or_404(Category, pk=pk)
-    products = category.products.all()
-    
-    context = {
-        'category': category,
-        'products': products,
-    }
-    return render(request, 'catalog/category_products.html', context)
+class CategoryProductsView(ProductListView):
+    """
+    Товары категории: тот же движок, что у списка товаров (фильтры, сортировка,
+    обычная и курсорная пагинация, кэш), но выбираются только колонки карточки.
+    """
+    template_name = 'catalog/category_products.html'
+    filter_form_class = CategoryProductFilterForm
+    show_facets = False
+    # Колонки, которые использует карточка товара
+    card_fields = ['id', 'name', 'description', 'price', 'image', 'category_id', 'created_at', 'updated_at']
+
+    def get(self, request, *args, **kwargs):
+        self.category = self.get_category()
+        return super().get(request, *args, **kwargs)
+
+    def get_category_queryset(self):
+        return Category.objects.annotate(product_count=Coalesce(F('stats__product_count'), 0))
+
+    def get_category(self):
+        """Заголовок: категория и число её товаров из CategoryStats одним запросом"""
+        pk = self.kwargs['pk']
+        return CacheScope('category_products', category_id=pk).get_or_set(
+            {'part': 'category'}, lambda: get_object_or_404(self.get_category_queryset(), pk=pk)
+        )
+
+    def get_queryset(self):
+        queryset = Product.objects.filter(category_id=self.kwargs['pk']).only(*self.card_fields)
+        return self.get_filter_form().filter_queryset(queryset)
+
+    def is_filtered(self):
+        form = self.get_filter_form()
+        return form.is_valid() and any(form.cleaned_data.get(name) for name in ('q', 'min_price', 'max_price'))
+
+    def get_cache_scope(self):
+        return CacheScope('category_products', self.get_cache_params(), category_id=self.kwargs['pk'])
+
+    def get_conditional_state(self, context):
+        """Товары страницы и заголовок: название категории и число её товаров"""
+        category = self.category
+        return None, self.get_page_state(context) + [category.updated_at, category.name, category.product_count]
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+        if not self.is_filtered():
+            # Без фильтров число товаров известно из CategoryStats - COUNT(*) не нужен
+            paginator.count = self.category.product_count
+        return paginator
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['category'] = self.category
+        return context
+
+
+category_products_view = CategoryProductsView.as_view()
+
 
 class CategoryListView(ListView):
     """Список категорий с фильтрацией и сортировкой"""
@@ -204,7 +398,7 @@ class CategoryListView(ListView):
     def get_queryset(self):
         """Аннотируем категории количеством товаров и применяем сортировку"""
         queryset = Category.objects.annotate(
-            product_count=Count('products')
+            product_count=Coalesce(F('stats__product_count'), 0)
         )
         
         # Применяем фильтры из формы
@@ -226,35 +420,22 @@ def analytics_view(request):
     """
     Страница аналитики с агрегатными данными и фильтрацией
     """
-    # Общая статистика по всем товарам
-    total_products = Product.objects.count()
-    total_value = Product.objects.aggregate(total=Sum('price'))['total'] or 0
-    avg_price = Product.objects.aggregate(avg=Avg('price'))['avg'] or 0
-    min_price = Product.objects.aggregate(min=Min('price'))['min'] or 0
-    max_price = Product.objects.aggregate(max=Max('price'))['max'] or 0
-
-    # Статистика по категориям с использованием аннотаций
-    categories_stats = Category.objects.annotate(
-        product_count=Count('products'),
-        total_value=Sum('products__price'),
-        avg_price=Avg('products__price'),
-        min_price=Min('products__price'),
-        max_price=Max('products__price')
-    )
-
     # Применяем сортировку
     form = AnalyticsFilterForm(request.GET)
+    sort_by = 'name'
     if form.is_valid():
         sort_by = form.cleaned_data.get('sort_by') or 'name'
-        categories_stats = categories_stats.order_by(sort_by)
-
-    context = {
-        'total_products': total_products,
-        'total_value': total_value,
-        'avg_price': avg_price,
-        'min_price': min_price,
-        'max_price': max_price,
-        'categories_stats': categories_stats,
-        'filter_form': form,
-    }
-    return render(request, 'catalog/analytics.html', context)
\ No newline at end of file
+
+    # Общая статистика и статистика по категориям одним запросом
+    context = CacheScope('analytics', {'sort_by': sort_by}).get_or_set(
+        {}, lambda: get_catalog_summary(sort_by)
+    )
+    context['filter_form'] = form
+    return TemplateResponse(request, 'catalog/analytics.html', context)
+
+
+def perf_metrics_view(request):
+    """Внутренняя страница: метрики представлений этого процесса (DEBUG или сотрудники)"""
+    if not (settings.DEBUG or request.user.is_staff):
+        raise Http404
+    return JsonResponse(perf.registry.snapshot(), json_dumps_params={'ensure_ascii': False})
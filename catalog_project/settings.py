@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'catalog.middleware.PerfMiddleware',  # метрики запросов по представлениям (catalog/perf.py)
+    'catalog.middleware.ReplicaMiddleware',  # чтение каталога с реплик (catalog/routers.py)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,7 +61,6 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],  # Добавляем эту строку
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -65,6 +68,13 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Шаблоны компилируются один раз на процесс (вместо APP_DIRS)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -75,13 +85,74 @@ WSGI_APPLICATION = 'catalog_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# Настраивается переменными окружения CATALOG_DB_*; по умолчанию - SQLite в
+# BASE_DIR. Подключения переиспользуются между запросами (CONN_MAX_AGE) и
+# проверяются перед повторным использованием (CONN_HEALTH_CHECKS).
+CATALOG_DB_ENGINE = os.environ.get('CATALOG_DB_ENGINE', 'sqlite')
+CATALOG_DB_CONN_MAX_AGE = int(os.environ.get('CATALOG_DB_CONN_MAX_AGE', 60))
+
+# SQLite для конкурентных запросов (catalog/backends/sqlite3): WAL - чтение не
+# ждёт записи, BEGIN IMMEDIATE - пишущие транзакции ждут друг друга
+# busy_timeout миллисекунд вместо ошибки "database is locked"
+CATALOG_SQLITE_OPTIONS = {
+    'pragmas': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('CATALOG_SQLITE_BUSY_TIMEOUT', 5000)),
+        'mmap_size': int(os.environ.get('CATALOG_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    },
+    'transaction_mode': 'IMMEDIATE',
 }
 
+if CATALOG_DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('CATALOG_DB_NAME', 'catalog'),
+            'USER': os.environ.get('CATALOG_DB_USER', ''),
+            'PASSWORD': os.environ.get('CATALOG_DB_PASSWORD', ''),
+            'HOST': os.environ.get('CATALOG_DB_HOST', ''),
+            'PORT': os.environ.get('CATALOG_DB_PORT', ''),
+            'CONN_MAX_AGE': CATALOG_DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('CATALOG_DB_CONNECT_TIMEOUT', 5)),
+            },
+            # За PgBouncer в режиме transaction серверные курсоры (iterator()
+            # экспорта) не переживают границу транзакции
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('CATALOG_DB_POOLER') == 'pgbouncer',
+        }
+    }
+elif CATALOG_DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'catalog.backends.sqlite3',
+            'NAME': os.environ.get('CATALOG_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': CATALOG_DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': CATALOG_SQLITE_OPTIONS,
+        }
+    }
+else:
+    raise ImproperlyConfigured(f'CATALOG_DB_ENGINE: ожидается sqlite или postgresql, получено {CATALOG_DB_ENGINE!r}')
+
+# Реплики для чтения каталога (catalog/routers.py): CATALOG_DB_REPLICAS - через
+# запятую хосты PostgreSQL или файлы SQLite (копии основной базы, обновляются
+# командой sync_replicas). В тестах реплики совпадают с основной базой.
+CATALOG_READ_REPLICAS = []
+for number, replica in enumerate(filter(None, os.environ.get('CATALOG_DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST' if CATALOG_DB_ENGINE == 'postgresql' else 'NAME': replica.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    CATALOG_READ_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['catalog.routers.ReplicaRouter']
+# Сколько секунд после записи браузер читает из основной базы (задержка репликации)
+CATALOG_REPLICA_STICKY_SECONDS = 15
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -131,3 +202,70 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Медиа файлы
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Настройки каталога
+# Режим пагинации списка товаров: 'offset' (номера страниц) или 'cursor' (keyset, без COUNT(*))
+CATALOG_PAGINATION = 'offset'
+
+# Кэш. По умолчанию - память процесса (подходит для одного процесса и тестов);
+# для нескольких воркеров укажите CATALOG_CACHE_DIR, чтобы использовать общий файловый кэш.
+CATALOG_CACHE_DIR = os.environ.get('CATALOG_CACHE_DIR')
+if CATALOG_CACHE_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CATALOG_CACHE_DIR,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'productflow',
+        }
+    }
+
+# Версионированный кэш страниц каталога (catalog/cache.py)
+CATALOG_CACHE_ENABLED = True
+CATALOG_CACHE_TIMEOUT = 300
+# Карточки товаров в сетках ({% cache %} по pk и updated_at): ключ меняется
+# вместе с товаром, поэтому время хранения может быть большим
+CATALOG_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Границы ценовых диапазонов гистограммы в фильтре товаров (catalog/facets.py);
+# после изменения нужно перестроить индекс: manage.py rebuild_category_stats
+CATALOG_PRICE_BUCKETS = [100, 500, 1000, 5000, 10000, 50000]
+
+# Сколько категорий выводить в выпадающих списках форм; при большем числе
+# выводится только выбранная, остальные ищутся через /api/categories/autocomplete/
+CATALOG_CATEGORY_CHOICES_LIMIT = 500
+
+# Фоновые задачи (catalog/tasks.py, обработчик - manage.py run_catalog_worker).
+# CATALOG_TASKS_EAGER=1 - выполнять задачи в процессе веб-сервера после коммита (без обработчика)
+CATALOG_TASKS_EAGER = os.environ.get('CATALOG_TASKS_EAGER') == '1'
+CATALOG_TASKS_MAX_ATTEMPTS = 5
+# Задержка перед повтором упавшей задачи, с; удваивается с каждой попыткой
+CATALOG_TASKS_RETRY_DELAY = 10
+# Задача в работе дольше этого времени (обработчик упал) возвращается в очередь, с
+CATALOG_TASKS_TIMEOUT = 10 * 60
+
+# Списки товаров и категорий в админке без полного COUNT(*): число строк из
+# CategoryStats или подсчёт не дальше CATALOG_ADMIN_COUNT_LIMIT строк
+CATALOG_ADMIN_PERFORMANCE_MODE = True
+CATALOG_ADMIN_COUNT_LIMIT = 10000
+
+# Журнал изменений каталога (catalog/changes.py, /api/changes/, manage.py export_changes).
+# Записи моложе CATALOG_CHANGES_DELAY секунд не отдаются: на PostgreSQL транзакция с меньшим
+# номером может закоммититься позже; SQLite выполняет записи по очереди
+CATALOG_CHANGES_DELAY = 5 if CATALOG_DB_ENGINE == 'postgresql' else 0
+# manage.py prune_changes удаляет записи старше этого срока, дней
+CATALOG_CHANGES_RETENTION_DAYS = 30
+
+# Cache-Control страниц товаров и категорий с ETag (аргументы patch_cache_control):
+# прокси хранит страницу и проверяет её условным запросом; s_maxage=N - отдавать без проверки N секунд
+CATALOG_HTTP_CACHE_CONTROL = {'public': True, 'no_cache': True}
+
+# Метрики представлений: число SQL-запросов, время SQL/шаблона/ответа (catalog/perf.py)
+CATALOG_PERF_ENABLED = True
+# Запрос, повторённый за один ответ с разными параметрами столько раз, считается N+1
+CATALOG_PERF_NPLUSONE_THRESHOLD = 5